@@ -53,11 +53,38 @@ export default function App() {
     }
 
     setActiveTab('results');
-    await Promise.all([
-      handleAnalyze('summarize'),
-      handleAnalyze('sentiment'),
-      handleAnalyze('insights')
-    ]);
+    const allTasks = { summarize: true, sentiment: true, insights: true };
+    setLoading(prev => ({ ...prev, ...allTasks }));
+
+    try {
+      // One request (and one LLM call) for all three analyses
+      const response = await fetch('https://ai-journal-backend-production.up.railway.app/api/ai/analyze', {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+          text: journalText
+        })
+      });
+
+      if (response.ok) {
+        const result = await response.json();
+        setAiResults(prev => ({
+          ...prev,
+          summarize: result.summarize,
+          sentiment: result.sentiment,
+          insights: result.insights
+        }));
+      } else {
+        Alert.alert('Error', 'Failed to process text');
+      }
+    } catch (error) {
+      Alert.alert('Error', 'Error connecting to AI service');
+      console.error(error);
+    }
+
+    setLoading(prev => ({ ...prev, summarize: false, sentiment: false, insights: false }));
   };
 
   const renderTabBar = () => (
@@ -0,0 +1,27 @@
+from chunking import chunk_text
+from token_planner import count_tokens
+
+def test_short_text_is_one_chunk():
+    assert chunk_text("A short entry.", 100) == ["A short entry."]
+
+def test_chunks_follow_paragraphs_and_fit_the_budget():
+    paragraphs = [f"Paragraph {i}. " + "Some words about the day. " * 5 for i in range(6)]
+    chunks = chunk_text("\n\n".join(paragraphs), 80)
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk) <= 80 for chunk in chunks)
+    assert all(chunk.startswith("Paragraph") for chunk in chunks)
+    assert "\n\n".join(chunks).split() == "\n\n".join(paragraphs).split()
+
+def test_oversized_paragraph_splits_on_sentences_then_words():
+    paragraph = " ".join(f"Sentence number {i} is here." for i in range(40))
+    chunks = chunk_text(paragraph, 20)
+    assert all(chunk.endswith(".") for chunk in chunks)
+    assert " ".join(chunks) == paragraph
+    words = chunk_text("word " * 200, 10)
+    assert all(count_tokens(chunk) <= 10 for chunk in words)
+
+def test_appending_keeps_earlier_chunks_identical():
+    paragraphs = [f"Paragraph {i}. " + "Some words about the day. " * 5 for i in range(6)]
+    before = chunk_text("\n\n".join(paragraphs), 80)
+    after = chunk_text("\n\n".join(paragraphs + ["A new paragraph added later."]), 80)
+    assert after[:len(before) - 1] == before[:-1]
@@ -0,0 +1,42 @@
+import time
+from circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+
+def test_trips_on_error_rate_and_recovers_after_probe():
+    breaker = CircuitBreaker("test", min_calls=4, failure_rate=0.5, open_seconds=0)
+    breaker.record_success()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    assert breaker.allow() is True
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow() is False
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert [t["to"] for t in breaker.stats()["recent_transitions"]] == [OPEN, HALF_OPEN, CLOSED]
+
+def test_trips_on_timeouts_and_short_circuits():
+    breaker = CircuitBreaker("test", min_calls=50, timeout_threshold=2, open_seconds=60)
+    breaker.record_failure(timeout=True)
+    breaker.record_failure(timeout=True)
+    assert breaker.state == OPEN
+    assert breaker.allow() is False
+    assert breaker.stats()["short_circuited"] == 1
+
+def test_failed_probe_reopens():
+    breaker = CircuitBreaker("test", min_calls=1, open_seconds=0)
+    breaker.record_failure()
+    assert breaker.allow() is True
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+def test_probe_without_an_outcome_expires():
+    breaker = CircuitBreaker("test", min_calls=1, open_seconds=0, probe_seconds=0.05)
+    breaker.record_failure()
+    assert breaker.allow() is True
+    assert breaker.allow() is False
+    time.sleep(0.06)
+    assert breaker.allow() is True
+    assert breaker.state == HALF_OPEN and breaker.probes_in_flight == 1
@@ -0,0 +1,59 @@
+import asyncio
+import pytest
+from deadlines import (
+    Deadline, budget_allows, budget_exhausted, current_deadline, deadline_scope, detached, parse_budget_ms,
+    remaining_budget, within_budget
+)
+
+def test_no_deadline_leaves_everything_unbounded():
+    assert current_deadline() is None and remaining_budget() is None
+    assert within_budget(30.0) == 30.0
+    assert budget_allows(1000) and not budget_exhausted()
+
+def test_scope_bounds_waits_and_restores_on_exit():
+    with deadline_scope(2000) as deadline:
+        assert 1.9 < remaining_budget() <= 2.0
+        assert within_budget(30.0) <= 2.0 and within_budget(0.5) == 0.5
+        assert budget_allows(1.0) and not budget_allows(5.0)
+        report = deadline.report(degraded=True)
+        assert report["budget_ms"] == 2000 and 0 < report["remaining_ms"] <= 2000 and report["degraded"]
+    assert current_deadline() is None
+
+def test_inner_scope_cannot_extend_the_outer_deadline():
+    with deadline_scope(500):
+        with deadline_scope(60000) as inner:
+            assert inner.budget <= 0.5
+        with deadline_scope(100) as inner:
+            assert inner.budget == 0.1
+        with deadline_scope(None) as same:
+            assert same is current_deadline()
+
+def test_detached_work_runs_without_the_callers_deadline():
+    async def budget_inside():
+        return remaining_budget()
+
+    async def run():
+        with deadline_scope(500) as deadline:
+            assert await detached(budget_inside()) is None
+            assert current_deadline() is deadline
+
+    asyncio.run(run())
+
+def test_shared_deadline_extends_to_the_loosest_caller():
+    with deadline_scope(100) as short:
+        shared = Deadline(short.remaining())
+    with deadline_scope(2000) as longer:
+        shared.extend(longer)
+        shared.extend(short)
+    assert 1.9 < shared.remaining() <= 2.0
+    shared.extend(None)
+    assert shared.remaining() == float("inf")
+
+def test_spent_budget_is_exhausted():
+    with deadline_scope(1):
+        assert budget_exhausted() and not budget_allows(0.5)
+
+@pytest.mark.parametrize("value", ["0", "-5", "soon", "nan", "inf"])
+def test_parse_budget_rejects_bad_values(value):
+    with pytest.raises(ValueError):
+        parse_budget_ms(value)
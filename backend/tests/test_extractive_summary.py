@@ -0,0 +1,43 @@
+from extractive_summary import split_sentences, summarize, textrank_scores
+
+def test_segmentation_handles_abbreviations_questions_and_line_breaks():
+    text = "Met Dr. Smith at 3 p.m. today. Was it worth it? Yes! We talked about e.g. habits\nthen went home"
+    assert split_sentences(text) == [
+        "Met Dr. Smith at 3 p.m. today.",
+        "Was it worth it?",
+        "Yes!",
+        "We talked about e.g. habits",
+        "then went home"
+    ]
+    assert split_sentences("no punctuation at all") == ["no punctuation at all"]
+    assert split_sentences("  ") == []
+
+def test_central_sentences_rank_highest():
+    sentences = [
+        "The project deadline at work kept me busy.",
+        "I bought a red umbrella.",
+        "Work on the project went well and the deadline is met.",
+        "The team celebrated finishing the project at work."
+    ]
+    scores = textrank_scores(sentences)
+    assert scores.argmin() == 1
+    assert abs(scores.sum() - 1.0) < 1e-6
+
+def test_summary_length_and_order():
+    text = " ".join(f"Sentence {i} about work and the project." for i in range(10)) + " Unrelated line about cats."
+    chosen = summarize(text, max_sentences=3)
+    assert len(chosen) == 3
+    assert "Unrelated line about cats." not in chosen
+    positions = [text.index(sentence) for sentence in chosen]
+    assert positions == sorted(positions)
+    assert len(summarize(text, max_sentences=5, ratio=0.2)) == 2
+    assert summarize("Only one sentence.") == ["Only one sentence."]
+
+def test_long_entries_are_ranked_in_blocks(monkeypatch):
+    import extractive_summary
+    sentences = [f"Note {i} about the project at work." for i in range(7)] + ["A stray remark on cats."]
+    monkeypatch.setattr(extractive_summary, "MAX_RANKED_SENTENCES", 4)
+    scores = textrank_scores(sentences)
+    assert len(scores) == 8 and abs(scores.sum() - 1.0) < 1e-6
+    assert scores.argmin() == 7
+    assert abs(scores[:4].sum() - 0.5) < 1e-6
@@ -0,0 +1,39 @@
+import asyncio
+import json
+import time
+from hf_cold_start import ColdStartTracker, ModelWarmer, loading_estimate
+
+def test_loading_estimate_only_for_loading_replies():
+    body = json.dumps({"error": "Model mistralai/Mistral-7B is currently loading", "estimated_time": 21.5})
+    assert loading_estimate(503, body) == 21.5
+    assert loading_estimate(503, json.dumps({"error": "Service unavailable"})) is None
+    assert loading_estimate(503, "<html>bad gateway</html>") is None
+    assert loading_estimate(200, body) is None
+
+def test_tracker_waits_within_budget_and_measures_cold_start():
+    tracker = ColdStartTracker(max_wait=20, poll_seconds=5)
+    tracker.record_loading("hf-mistral-7b", 12.0)
+    now = time.monotonic()
+    assert tracker.retry_delay("hf-mistral-7b", now + 20) == 5
+    assert tracker.retry_delay("hf-mistral-7b", now + 3) is None
+    assert tracker.too_slow("hf-mistral-7b", now + 3)
+    assert tracker.record_ready("hf-mistral-7b") >= 0
+    assert not tracker.is_loading("hf-mistral-7b")
+    assert tracker.stats()["hf-mistral-7b"]["cold_starts"] == 1
+    assert tracker.record_ready("hf-mistral-7b") is None
+
+def test_warmer_only_pings_idle_models():
+    tracker = ColdStartTracker()
+    pinged = []
+
+    async def ping(model):
+        pinged.append(model)
+        if model == "hf-gemma-7b":
+            raise RuntimeError("down")
+        tracker.record_ready(model)
+
+    warmer = ModelWarmer(["hf-mistral-7b", "hf-gemma-7b"], 60, ping, tracker)
+    asyncio.run(warmer.warm_once())
+    asyncio.run(warmer.warm_once())
+    assert pinged == ["hf-mistral-7b", "hf-gemma-7b", "hf-gemma-7b"]
+    assert warmer.stats()["failures"] == 2
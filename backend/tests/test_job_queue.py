@@ -0,0 +1,143 @@
+import asyncio
+import json
+import os
+import sqlite3
+import pytest
+from job_queue import JobQueue, JobQueueFull, check_callback_url
+
+def test_jobs_run_by_priority_and_long_poll():
+    order = []
+
+    async def handler(kind, payload):
+        order.append(payload["n"])
+        await asyncio.sleep(0.01)
+        return {"n": payload["n"]}
+
+    async def scenario():
+        queue = JobQueue(handler, workers=1)
+        blocker = await queue.submit("task", {"n": 0})
+        await asyncio.sleep(0)
+        low = await queue.submit("task", {"n": 1}, priority=9)
+        high = await queue.submit("task", {"n": 2}, priority=0)
+        done = await queue.wait(low["id"], timeout=2)
+        assert done["status"] == "done" and done["result"] == {"n": 1}
+        assert (await queue.wait(high["id"], timeout=0))["status"] == "done"
+        assert (await queue.wait(blocker["id"], timeout=0))["status"] == "done"
+        await queue.close()
+
+    asyncio.run(scenario())
+    assert order == [0, 2, 1]
+
+def test_failures_cancellation_and_backpressure():
+    async def handler(kind, payload):
+        if payload.get("fail"):
+            raise ValueError("model exploded")
+        await asyncio.sleep(1)
+        return {}
+
+    async def scenario():
+        queue = JobQueue(handler, workers=1, max_pending=1)
+        failing = await queue.submit("task", {"fail": True})
+        assert (await queue.wait(failing["id"], timeout=1))["error"] == "model exploded"
+        await queue.submit("task", {})
+        await asyncio.sleep(0)
+        waiting = await queue.submit("task", {})
+        try:
+            await queue.submit("task", {})
+            assert False, "expected JobQueueFull"
+        except JobQueueFull:
+            pass
+        assert queue.cancel(waiting["id"]) and queue.get(waiting["id"])["status"] == "cancelled"
+        assert queue.stats()["failed"] == 1
+        await queue.close()
+
+    asyncio.run(scenario())
+
+def test_unfinished_jobs_survive_restart(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    calls = []
+
+    async def handler(kind, payload):
+        calls.append(payload)
+        await asyncio.sleep(10 if len(calls) == 1 else 0)
+        return {"ok": True}
+
+    async def first_run():
+        queue = JobQueue(handler, workers=1, sqlite_path=path)
+        job = await queue.submit("task", {"n": 1})
+        await asyncio.sleep(0.05)
+        await queue.close()
+        return job["id"]
+
+    async def second_run(job_id):
+        queue = JobQueue(handler, workers=1, sqlite_path=path)
+        job = await queue.wait(job_id, timeout=2)
+        await queue.close()
+        return job, queue.counters["recovered"]
+
+    job_id = asyncio.run(first_run())
+    job, recovered = asyncio.run(second_run(job_id))
+    assert job["status"] == "done" and recovered == 1 and len(calls) == 2
+
+def test_jobs_of_other_processes_are_read_from_sqlite(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    calls = []
+
+    async def handler(kind, payload):
+        calls.append(payload)
+        return {"ok": True}
+
+    def write_job(job_id, owner):
+        db = sqlite3.connect(path, isolation_level=None)
+        db.execute("CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, data TEXT NOT NULL, status TEXT NOT NULL, finished_at REAL)")
+        job = {"id": job_id, "kind": "task", "payload": {"id": job_id}, "priority": 5, "callback_url": None, "owner": owner,
+               "status": "queued", "result": None, "error": None, "created_at": 0, "started_at": None, "finished_at": None}
+        db.execute("INSERT INTO jobs (id, data, status) VALUES (?, ?, 'queued')", (job_id, json.dumps(job)))
+        db.close()
+
+    write_job("live-owner", os.getppid())
+    write_job("dead-owner", 2 ** 22 + 1)
+
+    async def run():
+        queue = JobQueue(handler, workers=1, sqlite_path=path)
+        dead = await queue.wait("dead-owner", timeout=2)
+        live = await queue.wait("live-owner", timeout=0.3)
+        cancelled = queue.cancel("live-owner")
+        after = queue.get("live-owner")
+        await queue.close()
+        return dead, live, cancelled, after
+
+    dead, live, cancelled, after = asyncio.run(run())
+    assert dead["status"] == "done" and calls == [{"id": "dead-owner"}]
+    assert live["status"] == "queued" and cancelled and after["status"] == "cancelled"
+
+def test_close_drains_running_jobs():
+    async def handler(kind, payload):
+        await asyncio.sleep(0.2)
+        return {"ok": True}
+
+    async def run():
+        queue = JobQueue(handler, workers=1)
+        first = await queue.submit("task", {})
+        second = await queue.submit("task", {})
+        await asyncio.sleep(0.05)
+        await queue.close(drain_timeout=2)
+        return queue.get(first["id"]), queue.get(second["id"])
+
+    first, second = asyncio.run(run())
+    assert first["status"] == "done" and second["status"] == "queued"
+
+@pytest.mark.parametrize("url", [
+    "ftp://93.184.216.34/hook", "/relative/hook", "http://127.0.0.1:8000/hook", "http://localhost/hook",
+    "http://169.254.169.254/latest/meta-data", "http://10.0.0.5/hook", "http://[::1]/hook", "http://[::ffff:192.168.1.1]/"
+])
+def test_callback_urls_to_internal_hosts_are_rejected(url):
+    with pytest.raises(ValueError):
+        check_callback_url(url)
+
+def test_callback_urls_to_public_or_allowed_hosts_are_accepted():
+    assert check_callback_url("https://93.184.216.34/hook") == "https://93.184.216.34/hook"
+    assert check_callback_url("http://hooks.internal:9000/done", ["hooks.internal"])
+    assert check_callback_url("http://ci.example.test/done", [".example.test"])
+    with pytest.raises(ValueError):
+        check_callback_url("http://127.0.0.1/hook", ["hooks.internal"])
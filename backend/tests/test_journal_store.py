@@ -0,0 +1,53 @@
+from concurrent.futures import ThreadPoolExecutor
+from journal_store import JournalStore, fts_query
+
+def test_crud_round_trip(tmp_path):
+    store = JournalStore(str(tmp_path / "journal.db"))
+    entry = store.create("Went hiking with my sister.", title="Saturday")
+    assert entry["word_count"] == 5 and entry["analysis"] == {}
+    assert store.get(entry["id"])["title"] == "Saturday"
+
+    updated = store.update(entry["id"], title="Weekend")
+    assert updated["text"] == "Went hiking with my sister." and updated["title"] == "Weekend"
+    assert store.delete(entry["id"])
+    assert store.get(entry["id"]) is None
+    assert not store.delete(entry["id"])
+    assert store.stats()["journal_mode"] == "wal"
+
+def test_search_ranks_matches_and_tracks_edits(tmp_path):
+    store = JournalStore(str(tmp_path / "journal.db"))
+    work = store.create("Stressful meeting at work, then a quiet evening.")
+    store.create("Long walk by the river with friends.")
+    store.create("Work work work. The project deadline is Friday and work never stops.")
+    assert [entry["id"] for entry in store.search("work")][-1] == work["id"]
+    assert "[river]" in store.search("river")[0]["snippet"]
+    assert store.search("walked")  # porter stemming
+    assert store.search("proj*")
+    assert store.search('"unbalanced AND (') == []
+
+    store.update(work["id"], text="Calm day in the garden.")
+    assert work["id"] not in [entry["id"] for entry in store.search("meeting")]
+    assert store.search("garden")[0]["id"] == work["id"]
+
+def test_analyses_are_dropped_when_text_changes(tmp_path):
+    store = JournalStore(str(tmp_path / "journal.db"))
+    entry = store.create("A good day.")
+    assert store.save_analysis(entry["id"], "sentiment", "A good day.", {"result": "positive"})
+    assert not store.save_analysis(entry["id"], "summarize", "Some other text.", {"result": "x"})
+    assert store.get(entry["id"])["analysis"] == {"sentiment": {"result": "positive"}}
+
+    store.update(entry["id"], text="A hard day.")
+    assert store.get(entry["id"])["analysis"] == {}
+
+def test_pages_and_concurrent_writers(tmp_path):
+    store = JournalStore(str(tmp_path / "journal.db"), pool_size=4)
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(lambda i: store.create(f"Entry number {i}"), range(40)))
+    first = store.list_entries(limit=25)
+    second = store.list_entries(limit=25, before_id=first[-1]["id"])
+    assert len(first) == 25 and len(second) == 15
+    assert len({entry["id"] for entry in first + second}) == 40
+    assert store.stats()["connections"] <= 4
+
+def test_fts_query_quotes_terms():
+    assert fts_query('work OR "deadline" proj*') == '"work" "OR" "deadline" "proj"*'
@@ -1,9 +1,25 @@
+import asyncio
+import time
+import json
+import httpx
 import pytest
 from fastapi.testclient import TestClient
-from main import app
+import main
+from circuit_breaker import CircuitBreaker
+from main import app, ai_service, EnhancedAIService
 
 client = TestClient(app)
 
+def mock_service(handler, groq_key=None, hf_key=None, **client_options):
+    """EnhancedAIService whose upstream calls are answered by `handler`; providers without a key stay local"""
+    service = EnhancedAIService()
+    service.groq_api_key, service.hf_api_key = groq_key, hf_key
+    service._build_client = lambda provider: httpx.AsyncClient(transport=httpx.MockTransport(handler), **client_options)
+    return service
+
+def groq_reply(content="A steady, hopeful day with good momentum."):
+    return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})
+
 def test_read_main():
     response = client.get("/")
     assert response.status_code == 200
@@ -13,3 +29,519 @@ def test_health_check():
     response = client.get("/health")
     assert response.status_code == 200
     assert response.json()["status"] == "healthy"
+
+def test_http_pool_stats():
+    with TestClient(app) as lifespan_client:
+        response = lifespan_client.get("/api/admin/http-pool")
+    assert response.status_code == 200
+    pools = response.json()["pools"]
+    assert set(pools) == {"groq", "huggingface"}
+    assert pools["groq"]["active"] is True
+    assert pools["groq"]["open"] == 0
+
+def test_combined_analysis_falls_back_to_individual_tasks():
+    response = client.post("/api/ai/analyze", json={"text": "Today was a great day. I felt happy."})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["metadata"]["combined"] is False
+    assert data["sentiment"]["task_type"] == "sentiment"
+    assert data["insights"]["task_type"] == "insights"
+    assert data["summarize"]["task_type"] == "summarize"
+
+def test_fallback_results_are_not_cached():
+    stores = ai_service.cache.counters["stores"]
+    client.post("/api/ai/sentiment", json={"text": "Fallback only entry", "model": "unknown-model"})
+    response = client.post("/api/ai/sentiment", json={"text": "Fallback only entry", "model": "unknown-model"})
+    assert response.json()["metadata"]["cached"] is False
+    assert ai_service.cache.counters["stores"] == stores
+
+def test_batch_returns_results_in_input_order():
+    entries = [{"id": f"entry-{i}", "text": f"Entry number {i} was a good day."} for i in range(5)]
+    response = client.post("/api/ai/batch", json={"entries": entries, "task_types": ["sentiment", "summarize"]})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [item["id"] for item in results] == [entry["id"] for entry in entries]
+    assert set(results[0]["results"]) == {"sentiment", "summarize"}
+    assert results[0]["errors"] == {}
+
+def test_batch_cap_applies_to_the_provider_that_serves_the_call():
+    active, peak = [0], [0]
+
+    async def handler(request):
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        await asyncio.sleep(0.05)
+        active[0] -= 1
+        return httpx.Response(200, json=[{"generated_text": "A calm and reflective day overall."}])
+
+    service = mock_service(handler, groq_key="test-groq", hf_key="test-hf")
+    service._batch_semaphores["huggingface"] = asyncio.Semaphore(1)
+    breaker = service.breakers["groq-llama3-8b"] = CircuitBreaker("groq-llama3-8b", min_calls=1, open_seconds=60)
+    breaker.record_failure()
+
+    async def run():
+        return await asyncio.gather(
+            *(service.run_batch_task("summarize", f"Batch entry {i} today.", "groq-llama3-8b") for i in range(4)))
+
+    # groq's circuit is open, so every entry fails over to HF and queues for HF's single batch slot
+    results = asyncio.run(run())
+    assert [result["model"] for result in results] == ["hf-mistral-7b"] * 4
+    assert peak[0] == 1
+
+def test_batch_streams_ndjson():
+    entries = [{"text": "First entry."}, {"text": "Second entry."}]
+    response = client.post("/api/ai/batch", json={"entries": entries, "task_types": ["sentiment"], "stream": True})
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(line["index"] for line in lines) == [0, 1]
+
+def test_batch_rejects_unknown_task_type():
+    response = client.post("/api/ai/batch", json={"entries": [{"text": "x"}], "task_types": ["poetry"]})
+    assert response.status_code == 400
+
+def test_lexicon_endpoint_scores_batch_in_order():
+    entries = [{"id": "a", "text": "I am so happy today"}, {"id": "b", "text": "I am not happy"}]
+    response = client.post("/api/ai/sentiment/lexicon", json={"entries": entries})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [(item["id"], item["sentiment"]) for item in results] == [("a", "positive"), ("b", "negative")]
+
+def test_themes_endpoint_and_insights_fallback_use_entry_themes():
+    text = "Long day at work: the project deadline slipped and my manager was upset."
+    response = client.post("/api/ai/themes", json={"entries": [{"id": "a", "text": text}], "top_k": 2})
+    assert response.status_code == 200
+    assert response.json()["results"][0]["themes"][0]["theme"] == "career"
+    fallback = ai_service._fallback_insights(text)
+    assert fallback["themes"][0] == "career"
+    assert fallback["result"] == ai_service._fallback_insights(text)["result"]
+
+def test_stream_endpoint_sends_final_result_event():
+    response = client.post("/api/ai/summarize/stream", json={"text": "A short entry. Nothing much happened."})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [block for block in response.text.split("\n\n") if block]
+    assert events[-1].startswith("event: result")
+    final = json.loads(events[-1].split("data: ", 1)[1])
+    assert final["task_type"] == "summarize"
+    assert "summary_length" in final["metadata"]
+
+def test_streamed_results_report_token_usage():
+    payloads = []
+
+    async def handler(request):
+        payloads.append(json.loads(request.content))
+        if "huggingface" in request.url.host:
+            return httpx.Response(200, headers={"content-type": "text/event-stream"}, text=(
+                'data: {"token": {"text": "A calm, reflective day.", "special": false}}\n\n'
+                'data: {"token": {"text": "", "special": true}, "details": {"generated_tokens": 6}}\n\n'))
+        return httpx.Response(200, text=(
+            'data: {"choices": [{"delta": {"content": "A steady, hopeful day."}}]}\n\n'
+            'data: {"choices": [], "usage": {"prompt_tokens": 120, "completion_tokens": 7, "total_tokens": 127}}\n\n'
+            'data: [DONE]\n\n'))
+
+    service = mock_service(handler, groq_key="test-groq", hf_key="test-hf")
+
+    async def final(model):
+        events = [event async for event in service.stream_task("summarize", "Streamed with usage.", model)]
+        return events[-1]["data"]
+
+    groq = asyncio.run(final("groq-llama3-8b"))
+    assert payloads[0]["stream_options"] == {"include_usage": True}
+    assert groq["tokens"]["prompt"] == 120 and groq["tokens"]["completion"] == 7
+    hf = asyncio.run(final("hf-zephyr-7b"))
+    assert hf["model"] == "hf-zephyr-7b" and hf["tokens"]["completion"] == 6
+
+def test_models_endpoint_reports_circuit_state():
+    response = client.get("/api/ai/models")
+    models = response.json()["models"]
+    assert models["hf-mistral-7b"]["circuit"]["state"] == "closed"
+    assert models["hf-mistral-7b"]["fallback"] == "groq-llama3-8b"
+
+def test_auto_model_routes_to_fastest_model_in_quality_tier():
+    async def handler(request):
+        return groq_reply("A calm, positive day.")
+
+    service = mock_service(handler, groq_key="test-groq")
+    service.router.record("groq-mixtral", 0.2, ok=True)
+    service.router.record("groq-llama3-70b", 0.9, ok=True)
+    result = asyncio.run(service.analyze_sentiment("Quiet day at home.", "auto", quality="high"))
+    assert result["model"] == "groq-mixtral"
+    assert result["routing"] == {"auto": "groq-mixtral", "tier": "high"}
+    assert service.router.scores["groq-mixtral"].samples == 2
+    assert service.auto_model("sentiment", "Quiet day.", "best") == "groq-llama3-70b"
+
+def test_models_endpoint_exposes_router_scoreboard():
+    body = client.get("/api/ai/models").json()
+    assert body["auto"]["quality_tiers"] == ["standard", "high", "best"]
+    assert set(body["auto"]["router"]["models"]) == set(body["models"])
+    assert "ewma_latency_seconds" in body["models"]["groq-mixtral"]["router"]
+
+def test_journal_entries_keep_task_results(monkeypatch, tmp_path):
+    monkeypatch.setattr(main, "journal_store", main.JournalStore(str(tmp_path / "journal.db")))
+    monkeypatch.setattr(main, "similarity_index", main.SimilarityIndex())
+    entry = client.post("/api/journal/entries", json={"text": "Finished the garden project today.", "title": "Garden"}).json()
+    assert client.get(f"/api/journal/entries/{entry['id']}").json()["title"] == "Garden"
+    assert client.get("/api/journal/search", params={"q": "garden"}).json()["count"] == 1
+
+    async def handler(request):
+        return groq_reply("A proud, positive day.")
+
+    monkeypatch.setattr(main, "ai_service", mock_service(handler, groq_key="test-groq"))
+    response = client.post("/api/ai/sentiment", json={"text": entry["text"], "entry_id": entry["id"]})
+    assert response.json()["metadata"]["stored"] is True
+    stored = client.get("/api/journal/search", params={"q": "garden"}).json()["entries"][0]["analysis"]
+    assert stored["sentiment"]["result"] == response.json()["result"]
+
+    assert client.put(f"/api/journal/entries/{entry['id']}", json={"text": "Rainy day inside."}).json()["analysis"] == {}
+    assert client.delete(f"/api/journal/entries/{entry['id']}").status_code == 204
+    assert client.get(f"/api/journal/entries/{entry['id']}").status_code == 404
+
+def test_journal_entry_pages_follow_the_clamped_limit(monkeypatch, tmp_path):
+    store = main.JournalStore(str(tmp_path / "journal.db"))
+    monkeypatch.setattr(main, "journal_store", store)
+    for i in range(120):
+        store.create(f"Entry {i}.")
+
+    first = client.get("/api/journal/entries", params={"limit": 150}).json()
+    assert len(first["entries"]) == 100 and first["next_before_id"] == first["entries"][-1]["id"]
+    rest = client.get("/api/journal/entries", params={"limit": 150, "before_id": first["next_before_id"]}).json()
+    assert len(rest["entries"]) == 20 and rest["next_before_id"] is None
+    single = client.get("/api/journal/entries", params={"limit": 0}).json()
+    assert len(single["entries"]) == 1 and single["next_before_id"] == single["entries"][0]["id"]
+
+def test_period_summary_endpoint(monkeypatch, tmp_path):
+    store = main.JournalStore(str(tmp_path / "journal.db"))
+    monkeypatch.setattr(main, "journal_store", store)
+    monkeypatch.setattr(main, "similarity_index", main.SimilarityIndex())
+    monkeypatch.setattr(main, "summary_tree", main.SummaryTree(store, main.summarize_for_tree, main.FALLBACK_MODEL))
+    for day in ("2026-10-12T09:00:00", "2026-10-20T21:00:00"):
+        client.post("/api/journal/entries", json={"text": "Went for a run. Felt strong and calm.", "created_at": day})
+
+    body = client.get("/api/journal/summaries/month", params={"day": "2026-10-05"}).json()
+    assert body["key"] == "2026-10" and body["children"] == 2
+    assert body["model"] == main.FALLBACK_MODEL
+    assert client.get("/api/journal/summaries/week", params={"key": "2026-W40"}).status_code == 404
+    assert client.get("/api/journal/summaries/month", params={"key": "October"}).status_code == 422
+    assert client.get("/api/journal/summaries/decade").status_code == 404
+
+def test_related_entries(monkeypatch, tmp_path):
+    monkeypatch.setattr(main, "journal_store", main.JournalStore(str(tmp_path / "journal.db")))
+    monkeypatch.setattr(main, "similarity_index", main.SimilarityIndex())
+    texts = ["Ran by the river and felt strong.", "Budget review with the bank.", "River run at sunrise, legs strong."]
+    ids = [client.post("/api/journal/entries", json={"text": text}).json()["id"] for text in texts]
+
+    related = client.post("/api/ai/related", json={"text": "a strong river run", "k": 2}).json()["related"]
+    assert {entry["id"] for entry in related} == {ids[0], ids[2]}
+    assert related[0]["preview"] in texts
+    assert client.get(f"/api/journal/entries/{ids[0]}/related", params={"k": 1}).json()["related"][0]["id"] == ids[2]
+
+    response = client.post("/api/ai/sentiment", json={"text": texts[0], "entry_id": ids[0], "related": 1})
+    assert [entry["id"] for entry in response.json()["metadata"]["related"]] == [ids[2]]
+    client.delete(f"/api/journal/entries/{ids[2]}")
+    assert ids[2] not in [entry["id"] for entry in client.post("/api/ai/related", json={"text": "river"}).json()["related"]]
+
+def test_task_endpoints_accept_background_jobs(monkeypatch, tmp_path):
+    monkeypatch.setattr(main, "journal_store", main.JournalStore(str(tmp_path / "journal.db")))
+    monkeypatch.setattr(main, "similarity_index", main.SimilarityIndex())
+    monkeypatch.setattr(main, "job_queue", main.JobQueue(main.run_job, workers=2))
+    with TestClient(app) as jobs_client:
+        response = jobs_client.post("/api/ai/sentiment", params={"job": "true", "priority": 1}, json={"text": "A calm, happy day."})
+        assert response.status_code == 202
+        assert response.headers["location"] == response.json()["poll_url"]
+        job = jobs_client.get(response.json()["poll_url"], params={"wait": 5}).json()
+        assert job["status"] == "done" and job["result"]["task_type"] == "sentiment"
+
+        analyze = jobs_client.post("/api/ai/analyze", params={"job": "true"}, json={"text": "Long day at work."}).json()
+        result = jobs_client.get(analyze["poll_url"], params={"wait": 5}).json()["result"]
+        assert set(result) == {"sentiment", "insights", "summarize", "metadata"}
+        assert jobs_client.get("/api/jobs/missing").status_code == 404
+        assert jobs_client.get("/api/admin/jobs").json()["jobs"]["done"] == 2
+
+def test_job_callback_urls_are_checked_at_submit(monkeypatch):
+    monkeypatch.setattr(main, "job_queue", main.JobQueue(main.run_job, workers=1))
+    for url in ("http://localhost:8000/admin", "http://169.254.169.254/latest/meta-data", "file:///etc/passwd"):
+        response = client.post("/api/ai/sentiment", params={"job": "true", "callback_url": url}, json={"text": "Quiet day."})
+        assert response.status_code == 422
+    response = client.post(
+        "/api/ai/sentiment", params={"job": "true", "callback_url": "https://93.184.216.34/hook"}, json={"text": "Quiet day."})
+    assert response.status_code == 202
+    monkeypatch.setattr(main, "JOB_CALLBACK_ALLOWED_HOSTS", ["127.0.0.1"])
+    response = client.post(
+        "/api/ai/sentiment", params={"job": "true", "callback_url": "http://127.0.0.1:9000/done"}, json={"text": "Quiet day."})
+    assert response.status_code == 202
+    assert sum(main.job_queue.stats()["statuses"].values()) == 2
+
+def test_hf_cold_start_is_waited_out_within_budget():
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        if len(calls) < 3:
+            return httpx.Response(503, json={"error": "Model is currently loading", "estimated_time": 0.05})
+        return httpx.Response(200, json=[{"generated_text": "A calm and reflective day overall."}])
+
+    service = mock_service(handler, hf_key="test-hf")
+    service.cold_starts = main.ColdStartTracker(max_wait=2, poll_seconds=0.05)
+    result = asyncio.run(service.summarize_text("Quiet day at home.", "hf-zephyr-7b"))
+    assert result["model"] == "hf-zephyr-7b" and len(calls) == 3
+    assert service.cold_starts.stats()["hf-zephyr-7b"]["cold_starts"] == 1
+
+def test_hf_model_loading_past_budget_falls_back_without_tripping_breaker():
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        return httpx.Response(503, json={"error": "Model is currently loading", "estimated_time": 120})
+
+    service = mock_service(handler, hf_key="test-hf")
+    for _ in range(3):
+        result = asyncio.run(service.summarize_text(f"Quiet day {_}.", "hf-zephyr-7b"))
+        assert main.is_fallback(result)
+    # later requests know the model will not be ready in time and skip the call
+    assert len(calls) == 1
+    assert service.breakers["hf-zephyr-7b"].state == "closed"
+
+def test_hedged_routing_returns_first_good_answer():
+    async def handler(request):
+        if "groq" in request.url.host:
+            await asyncio.sleep(5)
+            return groq_reply("Too slow to matter")
+        return httpx.Response(200, json=[{"generated_text": "A calm and reflective day overall."}])
+
+    service = mock_service(handler, groq_key="test-groq", hf_key="test-hf")
+    service.hedge_delay = 0.05
+    result = asyncio.run(service.summarize_text("Quiet day at home.", "groq-llama3-8b", routing="hedged"))
+    assert result["model"] == "hf-mistral-7b"
+    assert result["routing"] == {"mode": "hedged", "primary": "groq-llama3-8b", "hedge": "hf-mistral-7b", "winner": "hf-mistral-7b"}
+
+def test_long_entries_are_map_reduced_and_reuse_chunk_results(monkeypatch):
+    monkeypatch.setattr(main, "CHUNK_MAX_TOKENS", 40)
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        return groq_reply(f"A positive, hopeful reflection {len(calls)}.")
+
+    service = mock_service(handler, groq_key="test-groq")
+    paragraphs = [f"Paragraph {i}. " + "I worked on the project and felt happy about it. " * 2 for i in range(4)]
+    result = asyncio.run(service.analyze_sentiment("\n\n".join(paragraphs), "groq-llama3-8b"))
+    assert result["chunks"] == len(calls) == 4
+    assert result["sentiment"] == "positive"
+    assert result["model"] == "groq-llama3-8b"
+
+    calls.clear()
+    paragraphs[-1] = "Paragraph 3 was rewritten. I went for a long walk and felt happy."
+    result = asyncio.run(service.analyze_sentiment("\n\n".join(paragraphs), "groq-llama3-8b"))
+    assert len(calls) == 1
+
+    summary = asyncio.run(service.summarize_text("\n\n".join(paragraphs), "groq-llama3-8b"))
+    assert summary["chunks"] == 4
+    assert summary["original_length"] == len("\n\n".join(paragraphs).split())
+
+def test_long_entry_is_rerouted_to_a_larger_context_model():
+    requested = []
+
+    async def handler(request):
+        payload = json.loads(request.content)
+        requested.append((payload["model"], payload["max_tokens"]))
+        return httpx.Response(200, json={
+            "choices": [{"message": {"content": "A long, reflective and mostly positive entry."}}],
+            "usage": {"prompt_tokens": 9000, "completion_tokens": 12, "total_tokens": 9012}
+        })
+
+    service = mock_service(handler, groq_key="test-groq")
+    text = "I walked along the river and thought about the year behind me. " * 700
+    result = asyncio.run(service.analyze_sentiment(text, "groq-llama3-8b"))
+    assert result["model"] == "groq-mixtral"
+    assert result["routing"] == {"rerouted_from": "groq-llama3-8b", "reason": "context_length"}
+    assert requested == [("mixtral-8x7b-32768", 300)]
+    assert result["tokens"]["prompt"] == 9000 and result["tokens"]["completion"] == 12
+    assert result["tokens"]["estimated_prompt"] > 8192
+
+def test_short_entry_gets_a_smaller_output_budget():
+    service = EnhancedAIService()
+    plan = service.plan("summarize", "Quiet day.", "groq-llama3-8b")
+    assert plan["fits"] and plan["max_output_tokens"] < 200
+    assert not service.plan("summarize", "word " * 9000, "hf-mistral-7b")["fits"]
+
+def test_oversized_entry_is_rejected(monkeypatch):
+    monkeypatch.setattr(main, "MAX_ENTRY_TOKENS", 50)
+    response = client.post("/api/ai/sentiment", json={"text": "word " * 100})
+    assert response.status_code == 422
+
+def test_metrics_endpoint_counts_fallbacks():
+    client.post("/api/ai/insights", json={"text": "Metrics check entry", "model": "groq-llama3-8b"})
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'journal_api_fallback_served_total{task="insights",reason="no_key"}' in response.text
+    assert 'journal_api_http_requests_total{endpoint="/api/ai/insights",method="POST",status="200"}' in response.text
+
+def test_short_deadline_skips_the_model_and_reports_degradation(monkeypatch):
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        return groq_reply()
+
+    service = mock_service(handler, groq_key="test-groq")
+    monkeypatch.setattr(main, "ai_service", service)
+    body = client.post("/api/ai/summarize", json={"text": "Short on time today.", "deadline_ms": 200}).json()
+    assert body["metadata"]["model"] == main.FALLBACK_MODEL
+    assert body["metadata"]["deadline"]["budget_ms"] == 200 and body["metadata"]["deadline"]["degraded"]
+    body = client.post("/api/ai/sentiment", json={"text": "Short on time today."}, headers={"X-Deadline-Ms": "300"}).json()
+    assert body["metadata"]["deadline"]["degraded"]
+    assert calls == []
+    assert client.post("/api/ai/sentiment", json={"text": "x"}, headers={"X-Deadline-Ms": "soon"}).status_code == 400
+
+def test_deadline_shortens_upstream_timeouts(monkeypatch):
+    timeouts = []
+
+    async def handler(request):
+        timeouts.append(request.extensions["timeout"])
+        return groq_reply()
+
+    service = mock_service(handler, groq_key="test-groq", timeout=httpx.Timeout(30.0, connect=5.0))
+    monkeypatch.setattr(main, "ai_service", service)
+    body = client.post("/api/ai/insights", json={"text": "Plenty of time today.", "deadline_ms": 4000}).json()
+    assert body["metadata"]["model"] == "groq-llama3-8b"
+    assert body["metadata"]["deadline"]["degraded"] is False
+    assert timeouts[0]["read"] <= 4.0 and timeouts[0]["connect"] <= 4.0
+    # without a deadline the provider's own timeouts apply and no deadline metadata is added
+    body = client.post("/api/ai/insights", json={"text": "No rush at all."}).json()
+    assert timeouts[1]["read"] == 30.0 and "deadline" not in body["metadata"]
+
+def test_retry_after_past_the_deadline_falls_back_at_once(monkeypatch):
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        return httpx.Response(429, headers={"retry-after": "30"})
+
+    monkeypatch.setattr(main, "ai_service", mock_service(handler, groq_key="test-groq"))
+    started = time.perf_counter()
+    body = client.post("/api/ai/summarize", json={"text": "Rate limited today.", "deadline_ms": 3000}).json()
+    assert time.perf_counter() - started < 1.0
+    assert body["metadata"]["model"] == main.FALLBACK_MODEL and body["metadata"]["deadline"]["degraded"]
+    assert len(calls) == 1 and main.ai_service._flight_deadlines == {}
+
+def test_slow_upstream_is_cut_off_at_the_deadline():
+    async def handler(request):
+        await asyncio.sleep(2)
+        return groq_reply()
+
+    service = mock_service(handler, groq_key="test-groq")
+    service.deadline_min_seconds = 0.1
+
+    async def run():
+        with main.deadline_scope(300):
+            return await service.summarize_text("Slow upstream day.", "groq-llama3-8b")
+
+    started = time.perf_counter()
+    result = asyncio.run(run())
+    assert time.perf_counter() - started < 1.5
+    assert main.is_fallback(result) and result["deadline_exceeded"]
+    assert service.breakers["groq-llama3-8b"].state == "closed"
+
+def test_coalesced_callers_keep_their_own_deadlines():
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        await asyncio.sleep(0.2)
+        if len(calls) == 1:
+            return httpx.Response(429, headers={"retry-after": "0"})
+        return groq_reply()
+
+    service = mock_service(handler, groq_key="test-groq")
+    service.deadline_min_seconds = 0.05
+
+    async def summarize(budget_ms, delay=0.0):
+        await asyncio.sleep(delay)
+        with main.deadline_scope(budget_ms):
+            return await service.summarize_text("Shared by a hurried and a patient client.", "groq-llama3-8b")
+
+    async def run():
+        return await asyncio.gather(summarize(100), summarize(None, delay=0.02))
+
+    # the hurried caller leads the shared call, but its deadline neither cancels the retry nor degrades the answer
+    hurried, patient = asyncio.run(run())
+    assert main.is_fallback(hurried) and hurried["deadline_exceeded"]
+    assert patient["model"] == "groq-llama3-8b" and not patient.get("deadline_exceeded")
+    assert len(calls) == 2
+    key = main.cache_key("summarize", "Shared by a hurried and a patient client.", "groq-llama3-8b", main.PROMPT_VERSION)
+    assert service.cache.get(key)["model"] == "groq-llama3-8b"
+
+def test_cache_miss_claimed_by_another_worker_is_waited_for(tmp_path):
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        return groq_reply()
+
+    service = mock_service(handler, groq_key="test-groq")
+    service.cache = main.ResultCache(sqlite_path=str(tmp_path / "cache.db"))
+    key = main.cache_key("summarize", "Shared across workers.", "groq-llama3-8b", main.PROMPT_VERSION)
+    service.cache._db.execute("INSERT INTO ai_result_claims (key, owner, expires_at) VALUES (?, -1, ?)", (key, time.time() + 60))
+
+    async def other_worker_finishes():
+        await asyncio.sleep(0.2)
+        other = main.ResultCache(sqlite_path=str(tmp_path / "cache.db"))
+        other.put(key, {"result": "📝 Computed elsewhere.", "confidence": 0.9, "model": "groq-llama3-8b"})
+        other._db.execute("DELETE FROM ai_result_claims")
+
+    async def run():
+        finisher = asyncio.create_task(other_worker_finishes())
+        result = await service.summarize_text("Shared across workers.", "groq-llama3-8b")
+        await finisher
+        return result
+
+    result = asyncio.run(run())
+    assert result["result"] == "📝 Computed elsewhere." and result["cached"]
+    assert calls == []
+
+def test_multi_worker_related_entries_catch_up_with_other_workers(monkeypatch, tmp_path):
+    store = main.JournalStore(str(tmp_path / "journal.db"))
+    monkeypatch.setattr(main, "journal_store", store)
+    monkeypatch.setattr(main, "similarity_index", main.SimilarityIndex())
+    monkeypatch.setattr(main, "similarity_sync", {"fingerprint": None, "since": ""})
+    monkeypatch.setattr(main, "SERVER_WORKERS", 2)
+    main.sync_similarity_index()
+    # written through another worker: this worker's index never saw it
+    entry = store.create("Long hike in the mountains with friends, sore legs but happy.")
+    related = main.find_related("A mountain hike with friends", 3)
+    assert [match["id"] for match in related] == [entry["id"]]
+    store.delete(entry["id"])
+    assert main.find_related("A mountain hike with friends", 3) == []
+
+def test_abandoned_half_open_probes_release_the_breaker():
+    async def handler(request):
+        if "mid-stream" in request.content.decode():
+            return httpx.Response(200, text='data: {"choices": [{"delta": {"content": "A calm"}}]}\n\ndata: [DONE]\n\n')
+        await asyncio.sleep(5)
+        return groq_reply()
+
+    service = mock_service(handler, groq_key="test-groq")
+    breaker = service.breakers["groq-llama3-8b"] = CircuitBreaker("groq-llama3-8b", min_calls=1, open_seconds=0)
+
+    async def cancel_soon(call):
+        task = asyncio.create_task(call)
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    async def run():
+        # cancelled while waiting on the upstream: a combined call, then a stream
+        breaker.record_failure()
+        await cancel_soon(service.analyze_all("Left before the answer.", "groq-llama3-8b"))
+        assert breaker.state == "half_open" and breaker.probes_in_flight == 0
+        await cancel_soon(service.stream_task("insights", "Left before the first token.", "groq-llama3-8b").__anext__())
+        assert breaker.probes_in_flight == 0
+        # client disconnects after the first token: the generator is closed at its yield
+        stream = service.stream_task("summarize", "Left mid-stream.", "groq-llama3-8b")
+        assert (await stream.__anext__())["event"] == "token"
+        await stream.aclose()
+        assert breaker.probes_in_flight == 0 and breaker.allow()
+
+    asyncio.run(run())
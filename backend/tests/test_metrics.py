@@ -0,0 +1,42 @@
+from metrics import MetricsRegistry, SharedMetrics
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    latency = registry.histogram("latency_seconds", "Latency", ["model"], buckets=(0.1, 1.0))
+    latency.observe("groq-llama3-8b", value=0.05)
+    latency.observe("groq-llama3-8b", value=0.5)
+    latency.observe("groq-llama3-8b", value=3.0)
+    text = registry.exposition()
+    assert 'latency_seconds_bucket{model="groq-llama3-8b",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{model="groq-llama3-8b",le="1"} 2' in text
+    assert 'latency_seconds_bucket{model="groq-llama3-8b",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{model="groq-llama3-8b"} 3' in text
+
+def test_counter_and_callback_exposition():
+    registry = MetricsRegistry()
+    fallbacks = registry.counter("fallbacks_total", "Fallbacks", ["task", "reason"])
+    fallbacks.inc("sentiment", "http_error")
+    fallbacks.inc("sentiment", "http_error")
+    registry.callback("circuit_state", "State", ["model"], lambda: {("hf-zephyr-7b",): 2})
+    text = registry.exposition()
+    assert "# TYPE fallbacks_total counter" in text
+    assert 'fallbacks_total{task="sentiment",reason="http_error"} 2' in text
+    assert 'circuit_state{model="hf-zephyr-7b"} 2' in text
+
+def test_shared_metrics_merge_worker_snapshots(tmp_path):
+    path = str(tmp_path / "metrics.db")
+    workers = []
+    for worker, (count, state) in enumerate([(2, 0), (3, 2)]):
+        registry = MetricsRegistry()
+        registry.counter("fallbacks_total", "Fallbacks", ["reason"]).inc("timeout", amount=count)
+        registry.histogram("latency_seconds", "Latency", buckets=(1.0, )).observe(value=0.5)
+        registry.callback("circuit_state", "State", ["model"], lambda state=state: {("groq",): state}, aggregate="max")
+        shared = SharedMetrics(registry, path)
+        shared.worker = worker
+        workers.append(shared)
+    workers[1].publish()
+    text = workers[0].exposition()
+    assert 'fallbacks_total{reason="timeout"} 5' in text
+    assert 'latency_seconds_count 2' in text
+    assert 'circuit_state{model="groq"} 2' in text
+    assert workers[0].workers() == 2
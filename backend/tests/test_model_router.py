@@ -0,0 +1,44 @@
+from model_router import AdaptiveRouter
+
+def test_latency_is_an_ewma_seeded_by_the_first_sample():
+    router = AdaptiveRouter(["a"], alpha=0.5)
+    router.record("a", 2.0, ok=True)
+    assert router.scores["a"].latency == 2.0
+    router.record("a", 4.0, ok=True)
+    assert router.scores["a"].latency == 3.0
+    router.record("a", 10.0, ok=False)
+    assert router.scores["a"].latency == 3.0
+    assert router.scores["a"].error_rate == 0.5
+
+def test_chooses_lowest_latency_adjusted_for_queue_depth():
+    router = AdaptiveRouter(["fast", "slow"], concurrency=1)
+    router.record("fast", 0.5, ok=True)
+    router.record("slow", 0.8, ok=True)
+    assert router.choose(["fast", "slow"], "sentiment", "standard") == "fast"
+    router.started("fast")
+    router.started("fast")
+    assert router.choose(["fast", "slow"], "sentiment", "standard") == "slow"
+    assert router.scoreboard()["recent_decisions"][-1]["reason"] == "lowest_cost"
+
+def test_degraded_model_is_skipped_then_explored_when_stale():
+    router = AdaptiveRouter(["flaky", "steady"], alpha=1.0, explore_seconds=60)
+    router.record("flaky", 0.1, ok=True)
+    router.record("steady", 1.0, ok=True)
+    router.started("flaky")
+    router.finished("flaky")
+    router.record("flaky", 0.1, ok=False)
+    assert router.choose(["flaky", "steady"], "summarize", "standard") == "steady"
+
+    router.explore_seconds = 0
+    assert router.choose(["flaky", "steady"], "summarize", "standard") == "flaky"
+    assert router.decisions[-1]["reason"] == "explore"
+
+def test_all_degraded_still_picks_one():
+    router = AdaptiveRouter(["a", "b"], alpha=1.0, explore_seconds=3600)
+    for name, latency in (("a", 2.0), ("b", 1.0)):
+        router.started(name)
+        router.finished(name)
+        router.record(name, latency, ok=False)
+    assert router.choose(["a", "b"], "insights", "high") in ("a", "b")
+    assert router.decisions[-1]["reason"] == "all_degraded"
+    assert router.choose([], "insights", "high") is None
@@ -0,0 +1,50 @@
+import asyncio
+import time
+import pytest
+from rate_limiter import ModelLimiter, RateLimitExceeded, parse_duration, parse_retry_after
+
+def test_parse_reset_durations():
+    assert parse_duration("7.66s") == pytest.approx(7.66)
+    assert parse_duration("2m59.56s") == pytest.approx(179.56)
+    assert parse_duration("120ms") == pytest.approx(0.12)
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after(None) is None
+
+def test_slot_queues_until_bucket_refills():
+    limiter = ModelLimiter(requests_per_minute=600, tokens_per_minute=0, max_concurrency=2, max_wait=1.0)
+    limiter.requests.level = 0
+
+    async def acquire():
+        started = time.monotonic()
+        async with limiter.slot():
+            pass
+        return time.monotonic() - started
+
+    waited = asyncio.run(acquire())
+    assert waited >= 0.09
+    assert limiter.stats()["queued"] == 1
+
+def test_retry_after_beyond_max_wait_is_rejected():
+    limiter = ModelLimiter(requests_per_minute=60, tokens_per_minute=0, max_concurrency=1, max_wait=0.05)
+    limiter.observe(429, {"retry-after": "30"})
+
+    async def acquire():
+        async with limiter.slot():
+            pass
+
+    with pytest.raises(RateLimitExceeded):
+        asyncio.run(acquire())
+    assert limiter.stats()["throttled"] == 1
+    assert limiter.stats()["rejected"] == 1
+
+def test_caller_max_wait_shortens_the_wait():
+    limiter = ModelLimiter(requests_per_minute=600, tokens_per_minute=0, max_concurrency=1, max_wait=1.0)
+    limiter.requests.level = 0
+
+    async def acquire():
+        async with limiter.slot(max_wait=0.01):
+            pass
+
+    with pytest.raises(RateLimitExceeded):
+        asyncio.run(acquire())
+    assert limiter.stats()["rejected"] == 1
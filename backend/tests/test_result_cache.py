@@ -0,0 +1,61 @@
+import time
+from result_cache import ResultCache, cache_key
+
+def test_cache_key_depends_on_model_and_prompt_version():
+    base = cache_key("sentiment", "text", "groq-llama3-8b", "v1")
+    assert base == cache_key("sentiment", "text", "groq-llama3-8b", "v1")
+    assert base != cache_key("sentiment", "text", "groq-mixtral", "v1")
+    assert base != cache_key("sentiment", "text", "groq-llama3-8b", "v2")
+
+def test_lru_eviction_and_ttl():
+    cache = ResultCache(max_entries=2, ttl_seconds=60)
+    cache.put("a", {"result": "a"})
+    cache.put("b", {"result": "b"})
+    cache.get("a")
+    cache.put("c", {"result": "c"})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"result": "a"}
+    assert cache.stats()["evictions"] == 1
+
+    expiring = ResultCache(ttl_seconds=0.01)
+    expiring.put("a", {"result": "a"})
+    time.sleep(0.02)
+    assert expiring.get("a") is None
+
+def test_sqlite_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = ResultCache(sqlite_path=path)
+    cache.put("key", {"result": "persisted", "themes": ["growth"]})
+    cache.close()
+
+    reopened = ResultCache(sqlite_path=path)
+    assert reopened.get("key") == {"result": "persisted", "themes": ["growth"]}
+    assert reopened.stats()["disk_hits"] == 1
+
+def test_memory_only_lookups_skip_disk_and_stores_prune_expired_rows(tmp_path):
+    path = str(tmp_path / "cache.db")
+    ResultCache(sqlite_path=path).put("old", {"result": "on disk"})
+    cache = ResultCache(sqlite_path=path, ttl_seconds=0.05, prune_seconds=0)
+    assert cache.persistent and cache.get("old", memory_only=True) is None
+    assert cache.stats()["misses"] == 0 and cache.get("old") == {"result": "on disk"}
+
+    cache.put("stale", {"result": "stale"})
+    time.sleep(0.06)
+    cache.put("fresh", {"result": "fresh"})
+    assert cache.stats()["pruned"] == 1
+    assert [row[0] for row in cache._db.execute("SELECT key FROM ai_result_cache ORDER BY key")] == ["fresh", "old"]
+
+def test_claims_make_other_processes_wait(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = ResultCache(sqlite_path=path, claim_seconds=60)
+    assert cache.claim("key") and cache.claim("key")  # re-entrant for the owning process
+    cache.release("key")
+
+    # a claim held by another worker process
+    cache._db.execute("INSERT INTO ai_result_claims (key, owner, expires_at) VALUES ('key', -1, ?)", (time.time() + 60,))
+    assert not cache.claim("key") and cache.claimed("key")
+    cache._db.execute("UPDATE ai_result_claims SET expires_at = ?", (time.time() - 1,))
+    assert not cache.claimed("key") and cache.claim("key")
+    assert cache.stats()["claim_waits"] == 1
+
+    assert ResultCache().claim("key")  # nothing shared without the SQLite tier
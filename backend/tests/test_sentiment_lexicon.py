@@ -0,0 +1,29 @@
+from sentiment_lexicon import LexiconSentiment
+
+engine = LexiconSentiment()
+
+def test_whole_word_matching():
+    assert engine.score("sadness")["sentiment"] == "negative"
+    assert engine.score("I saddled the horse")["matches"] == 0
+
+def test_negation_flips_within_clause_only():
+    assert engine.score("I am not happy")["sentiment"] == "negative"
+    assert engine.score("It was not a bad day")["sentiment"] == "positive"
+    assert engine.score("I was not late. I was happy")["sentiment"] == "positive"
+
+def test_intensifiers_scale_the_next_word():
+    plain = engine.score("I am happy")["score"]
+    assert engine.score("I am extremely happy")["score"] > plain
+    assert engine.score("I am slightly happy")["score"] < plain
+
+def test_neutral_and_confidence():
+    result = engine.score("I went to the store")
+    assert result == {"sentiment": "neutral", "score": 0.0, "confidence": 0.5, "positive": 0.0, "negative": 0.0, "matches": 0}
+    weak = engine.score("a good day")["confidence"]
+    strong = engine.score("a great, wonderful, amazing day. I loved it")["confidence"]
+    assert 0.5 < weak < strong <= 0.95
+
+def test_batch_matches_single_scoring_and_keeps_documents_apart():
+    texts = ["not", "happy", "", "I hate this but love that", "very", "bad"]
+    assert engine.score_batch(texts) == [engine.score(text) for text in texts]
+    assert engine.score_batch([]) == []
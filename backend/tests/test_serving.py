@@ -0,0 +1,17 @@
+from serving import available_cpus, prepare_workers, worker_count
+
+def test_worker_count_from_setting():
+    assert worker_count(None) == 1 and worker_count("") == 1
+    assert worker_count("3") == 3 and worker_count("0") == 1
+    assert worker_count("auto") == available_cpus() >= 1
+
+def test_multi_worker_mode_shares_state_through_sqlite():
+    environ = {"AI_CACHE_SQLITE_PATH": "/srv/cache.db"}
+    prepare_workers(4, environ)
+    assert environ["SERVER_WORKERS"] == "4"
+    assert environ["AI_CACHE_SQLITE_PATH"] == "/srv/cache.db"
+    assert environ["METRICS_SHARED_PATH"] and environ["JOB_SQLITE_PATH"]
+
+    single = {}
+    prepare_workers(1, single)
+    assert single == {"SERVER_WORKERS": "1"}
@@ -0,0 +1,45 @@
+import numpy as np
+from similarity_index import SimilarityIndex
+
+ENTRIES = [
+    (1, "Long run by the river this morning, my legs are sore but I feel strong."),
+    (2, "Argued with my manager about the project deadline again."),
+    (3, "Baked bread with my sister and talked about our parents."),
+    (4, "Ran along the river trail after work, legs felt strong and light."),
+]
+
+def test_query_ranks_similar_entries_first():
+    index = SimilarityIndex()
+    for entry_id, text in ENTRIES:
+        index.add(entry_id, text)
+    related = index.query("Went running by the river, strong legs", k=2)
+    assert {match["id"] for match in related} == {1, 4}
+    assert related[0]["score"] >= related[1]["score"] > 0
+    assert [match["id"] for match in index.query(ENTRIES[0][1], k=1, exclude=1)] == [4]
+    assert index.query("zzz qqq") == []
+
+def test_updates_and_removals():
+    index = SimilarityIndex(capacity=2)
+    for entry_id, text in ENTRIES:
+        index.add(entry_id, text)
+    index.add(2, "Quiet afternoon baking bread with family.")
+    assert index.query("baking bread", k=1)[0]["id"] in (2, 3)
+    index.remove(3)
+    assert 3 not in [match["id"] for match in index.query("bread sister parents", k=4)]
+    assert index.stats()["entries"] == 3 and index.stats()["capacity"] >= 4
+
+def test_rebuild_matches_incremental_and_persists(tmp_path):
+    incremental = SimilarityIndex()
+    for entry_id, text in ENTRIES:
+        incremental.add(entry_id, text)
+    directory = str(tmp_path / "index")
+    rebuilt = SimilarityIndex(directory)
+    rebuilt.rebuild(ENTRIES, fingerprint="4:4:x")
+    # the last insert saw the same document frequencies a rebuild does
+    assert np.allclose(rebuilt.vectors[3], incremental.vectors[3], atol=1e-6)
+
+    reopened = SimilarityIndex(directory)
+    assert reopened.is_current("4:4:x")
+    assert reopened.query("river run", k=1)[0]["id"] in (1, 4)
+    reopened.add(5, "New entry about the river.")
+    assert not SimilarityIndex(directory).is_current("4:4:x")
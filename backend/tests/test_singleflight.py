@@ -0,0 +1,57 @@
+import asyncio
+import pytest
+from singleflight import SingleFlight
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"result": "shared"}
+
+    async def main():
+        return await asyncio.gather(*(flight.do("key", work) for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert all(result == {"result": "shared"} for result in results)
+    assert flight.stats() == {"leaders": 1, "coalesced": 4, "abandoned": 0, "in_flight": 0}
+
+def test_cancelled_follower_does_not_cancel_leader():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def main():
+        leader = asyncio.create_task(flight.do("key", work))
+        follower = asyncio.create_task(flight.do("key", work))
+        await asyncio.sleep(0)
+        follower.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+        return await leader
+
+    assert asyncio.run(main()) == "done"
+
+def test_call_cancelled_once_every_caller_leaves():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(10)
+
+    async def main():
+        caller = asyncio.create_task(flight.do("key", work))
+        await asyncio.sleep(0)
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        await asyncio.sleep(0)
+        return flight.stats()
+
+    stats = asyncio.run(main())
+    assert stats["abandoned"] == 1
+    assert stats["in_flight"] == 0
@@ -0,0 +1,21 @@
+import json
+import logging
+from structured_logging import JsonFormatter, SamplingFilter
+
+def make_record(level: int, **fields) -> logging.LogRecord:
+    record = logging.LogRecord("journal_api.test", level, __file__, 1, "upstream_error", None, None)
+    record.fields = fields
+    return record
+
+def test_json_formatter_emits_structured_fields():
+    line = JsonFormatter().format(make_record(logging.WARNING, provider="groq", status=503))
+    entry = json.loads(line)
+    assert entry["event"] == "upstream_error"
+    assert entry["level"] == "WARNING"
+    assert entry["provider"] == "groq"
+    assert entry["status"] == 503
+
+def test_sampling_never_drops_warnings():
+    sampler = SamplingFilter(0.0)
+    assert sampler.filter(make_record(logging.INFO)) is False
+    assert sampler.filter(make_record(logging.WARNING)) is True
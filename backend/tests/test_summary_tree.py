@@ -0,0 +1,91 @@
+import asyncio
+from datetime import date, datetime
+from journal_store import JournalStore
+from summary_tree import SummaryTree, ancestors, period_range
+
+def make_tree(tmp_path):
+    store = JournalStore(str(tmp_path / "journal.db"))
+    calls = []
+
+    async def summarize(text):
+        calls.append(text)
+        return {"result": f"📝 summary of {text[:40]!r}", "metadata": {"model": "groq-llama3-8b"}}
+
+    return store, SummaryTree(store, summarize, "fallback-analysis"), calls
+
+def test_period_keys_and_ranges():
+    assert [key for _, key in ancestors(date(2026, 12, 31))] == ["2026-12-31", "2026-W53", "2026-12", "2026"]
+    assert period_range("week", "2026-W42") == (date(2026, 10, 12), date(2026, 10, 19))
+    assert period_range("month", "2026-12") == (date(2026, 12, 1), date(2027, 1, 1))
+
+def test_only_changed_ancestors_are_recomputed(tmp_path):
+    store, tree, calls = make_tree(tmp_path)
+    monday = store.create("Started the new job.", created_at=datetime(2026, 10, 12, 9))
+    store.create("Long walk after work.", created_at=datetime(2026, 10, 12, 19))
+    store.create("Quiet evening reading.", created_at=datetime(2026, 10, 14, 21))
+
+    week = asyncio.run(tree.node("week", "2026-W42"))
+    # three entries, one two-entry day, and the week itself
+    assert len(calls) == 5 and week["children"] == 2
+    assert asyncio.run(tree.node("week", "2026-W42"))["summary"] == week["summary"]
+    assert len(calls) == 5
+
+    calls.clear()
+    store.update(monday["id"], text="Started the new job and met the team.")
+    asyncio.run(tree.node("month", "2026-10"))
+    # the edited entry, its day, then the month (over the recomputed day and the untouched one)
+    assert len(calls) == 3
+    assert "Quiet evening reading." not in calls
+
+    calls.clear()
+    year = asyncio.run(tree.node("year", "2026"))
+    assert calls == [] and year["summary"] == asyncio.run(tree.node("month", "2026-10"))["summary"]
+
+def test_periods_without_entries_have_no_node(tmp_path):
+    store, tree, calls = make_tree(tmp_path)
+    assert asyncio.run(tree.node("day", "2026-10-12")) is None
+    entry = store.create("One entry.", created_at=datetime(2026, 10, 12, 9))
+    assert asyncio.run(tree.node("day", "2026-10-12"))["children"] == 1
+    store.delete(entry["id"])
+    assert asyncio.run(tree.node("day", "2026-10-12")) is None
+
+def test_children_are_summarized_concurrently_within_the_limit(tmp_path):
+    store = JournalStore(str(tmp_path / "journal.db"))
+    active, peak = [0], [0]
+
+    async def summarize(text):
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        await asyncio.sleep(0.02)
+        active[0] -= 1
+        return {"result": f"📝 summary of {text[:40]!r}", "metadata": {"model": "groq-llama3-8b"}}
+
+    tree = SummaryTree(store, summarize, "fallback-analysis", concurrency=3)
+    for day in range(1, 8):
+        for hour in (9, 18):
+            store.create(f"Entry on day {day} at {hour}.", created_at=datetime(2026, 10, day, hour))
+    month = asyncio.run(tree.node("month", "2026-10"))
+    assert month["children"] == 7 and tree.counters["summarize_calls"] == 14 + 7 + 1
+    assert peak[0] == 3
+
+def test_fallback_summaries_are_reused_until_the_retry_window_passes(tmp_path):
+    store = JournalStore(str(tmp_path / "journal.db"))
+    calls = []
+
+    async def summarize(text):
+        calls.append(text)
+        return {"result": f"📄 Summary: {text[:40]}", "metadata": {"model": "fallback-analysis"}}
+
+    tree = SummaryTree(store, summarize, "fallback-analysis", fallback_retry_seconds=60)
+    store.create("Morning run.", created_at=datetime(2026, 10, 12, 7))
+    store.create("Evening call with family.", created_at=datetime(2026, 10, 13, 20))
+    month = asyncio.run(tree.node("month", "2026-10"))
+    assert month["model"] == "fallback-analysis" and len(calls) == 3
+    assert asyncio.run(tree.node("month", "2026-10"))["summary"] == month["summary"]
+    # the week is new, but its days were built for the month and are reused
+    asyncio.run(tree.node("week", "2026-W42"))
+    assert len(calls) == 4
+
+    tree.fallback_retry_seconds = 0
+    asyncio.run(tree.node("month", "2026-10"))
+    assert len(calls) == 7
@@ -0,0 +1,30 @@
+from theme_index import ThemeIndex, stem
+
+index = ThemeIndex()
+
+def test_stems_map_inflections_together():
+    assert stem("working") == stem("worked") == stem("works") == stem("work")
+    assert stem("families") == stem("family")
+    assert stem("planned") == stem("plan")
+    assert stem("stress") == stem("stressed")
+
+def test_ranked_themes_with_synonyms_and_phrases():
+    text = ("Work was exhausting. The project deadline moved and my manager called two meetings. "
+            "I took a day off to rest and sleep.")
+    matches = index.extract(text)
+    assert [match["theme"] for match in matches][:2] == ["career", "self-care"]
+    assert matches[0]["terms"][:2] == ["work", "project"]
+    assert "day off" in matches[1]["terms"]
+
+def test_insight_text_is_deterministic_and_entry_specific():
+    text = "Argued with my partner again, then called a friend. Money is tight and rent is due."
+    first = index.insight_text(index.extract(text))
+    assert first == index.insight_text(index.extract(text))
+    assert "relationships" in first or "finances" in first
+    assert index.extract("Nothing to report.") == []
+    assert "self-awareness" in index.insight_text([])
+
+def test_batch_matches_single_extraction():
+    texts = ["My sister visited.", "", "Deadline at work, so stressed and tired.", "Grateful for music."]
+    assert index.extract_batch(texts) == [index.extract(text) for text in texts]
+    assert index.extract_batch(texts, top_k=1)[2] == index.extract(texts[2])[:1]
@@ -0,0 +1,22 @@
+from token_planner import OUTPUT_BUDGETS, count_tokens, input_capacity, output_budget, plan_request
+
+def test_count_tokens_errs_high_for_english():
+    text = "Today was a long day at work but I finished the project and felt proud."
+    assert len(text.split()) <= count_tokens(text) <= len(text) // 2
+    assert count_tokens("") == 0
+
+def test_output_budget_grows_with_input_up_to_the_task_maximum():
+    minimum, _, maximum = OUTPUT_BUDGETS["summarize"]
+    assert output_budget("summarize", 0) == minimum
+    assert minimum < output_budget("summarize", 200) < maximum
+    assert output_budget("summarize", 100000) == maximum
+
+def test_plan_trims_output_to_the_context_window():
+    roomy = plan_request("sentiment", 100, 400, 8192)
+    assert roomy["fits"] and roomy["max_output_tokens"] == output_budget("sentiment", 100)
+    tight = plan_request("sentiment", 7000, 7700, 8192)
+    assert tight["fits"] and tight["max_output_tokens"] == 8192 - 7700 - 256
+    assert not plan_request("sentiment", 7800, 8000, 8192)["fits"]
+
+def test_input_capacity_leaves_room_for_full_reply():
+    assert input_capacity("insights", 150, 4096) == 4096 - 150 - 350 - 256
@@ -0,0 +1,86 @@
+# Benchmark: per-request logging cost on the event loop thread, print-based vs structured
+#
+# "before" replays the print() calls the old analyze_sentiment/_hf_sentiment path made
+# for every HF request (including response headers and the raw body). "after" makes the
+# structured log calls the current path makes for the same request. Both write to a
+# line-buffered file, like a container's piped stdout.
+#
+# Usage: python benchmarks/logging_overhead.py [requests]
+import os
+import sys
+import tempfile
+import time
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from structured_logging import setup_logging, shutdown_logging, get_logger, log_event
+
+MODEL = "hf-mistral-7b"
+TEXT = "Today was a long day at work but I finished the project and felt proud. " * 8
+HEADERS = {
+    "content-type": "application/json",
+    "x-compute-type": "cache",
+    "x-request-id": "Root=1-65f0c0de-5d6c7a1b2c3d4e5f6a7b8c9d",
+    "x-compute-time": "2.311",
+    "x-compute-characters": "812",
+    "access-control-allow-credentials": "true",
+    "vary": "Origin, Access-Control-Request-Method, Access-Control-Request-Headers"
+}
+RAW_RESPONSE = [{"generated_text": "You sound proud and tired, a mix of accomplishment and fatigue. " * 6}]
+
+
+def old_request(out):
+    ai_response = RAW_RESPONSE[0]["generated_text"]
+    print(f"🎯 Sentiment Analysis Request - Model: {MODEL}, Text length: {len(TEXT)}", file=out)
+    print(f"🔍 Model found in registry: {MODEL}", file=out)
+    print(f"✅ Using HuggingFace API for {MODEL}", file=out)
+    print(f"🔍 HF Sentiment Analysis - Model: {MODEL}", file=out)
+    print(f"🔍 HF API Key present: True", file=out)
+    print(f"🔍 Model config: {{'name': 'mistralai/Mistral-7B-Instruct-v0.2', 'provider': 'huggingface'}}", file=out)
+    print(f"🔍 HF Base URL: https://api-inference.huggingface.co/models", file=out)
+    print(f"🔍 Full model URL: https://api-inference.huggingface.co/models/mistralai/Mistral-7B-Instruct-v0.2", file=out)
+    print(f"🔍 HF API Response Status: 200", file=out)
+    print(f"🔍 HF API Response Headers: {dict(HEADERS)}", file=out)
+    print(f"🔍 HF API Raw Response: {RAW_RESPONSE}", file=out)
+    print(f"🔍 Extracted from list format: {ai_response[:100]}...", file=out)
+    print(f"✅ HF API Success - Model: {MODEL}, Length: {len(ai_response)}", file=out)
+
+
+def new_request(logger):
+    log_event(logger, logging.DEBUG, "task_request", task="sentiment", model=MODEL, text_length=len(TEXT))
+
+
+def new_request_with_warning(logger):
+    new_request(logger)
+    log_event(logger, logging.WARNING, "upstream_error", provider="huggingface", model=MODEL, task="sentiment", error="HTTP 503")
+
+
+def measure(fn, arg, requests: int) -> float:
+    started = time.perf_counter()
+    for _ in range(requests):
+        fn(arg)
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, "before.log"), "w", buffering=1) as out:
+            before = measure(old_request, out, requests)
+
+        with open(os.path.join(tmp, "after.log"), "w", buffering=1) as out:
+            setup_logging(level="INFO", stream=out)
+            logger = get_logger("bench")
+            after = measure(new_request, logger, requests)
+            after_warning = measure(new_request_with_warning, logger, requests)
+            shutdown_logging()
+
+    print(f"requests:                              {requests}")
+    print(f"before: 13 print() lines               {before:8.2f} µs/request")
+    print(f"after:  structured, LOG_LEVEL=INFO     {after:8.2f} µs/request")
+    print(f"after:  plus one WARNING record        {after_warning:8.2f} µs/request (formatted off-thread)")
+
+
+if __name__ == "__main__":
+    main()
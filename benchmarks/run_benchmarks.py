@@ -0,0 +1,190 @@
+# Benchmark: end-to-end throughput and latency of main:app against local Groq/HF stubs
+#
+# Starts benchmarks/stub_servers.py and main:app as uvicorn subprocesses on localhost,
+# points the app at the stubs (GROQ_BASE_URL / HF_BASE_URL) with dummy API keys and
+# rate limits high enough not to interfere, then drives each endpoint at several
+# concurrency levels. Every request carries a unique text so the result cache and
+# in-flight coalescing never short-cut the upstream call.
+#
+# Usage: python benchmarks/run_benchmarks.py [--requests 200] [--concurrency 1,8,32]
+#            [--latency-ms 200] [--error-rate 0] [--loading-rate 0] [--json results.json]
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import uuid
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TEXT = "Today was a long day at work but I finished the project and felt proud of the team. "
+
+# name -> (path, request body builder)
+SCENARIOS = {
+    "sentiment-groq": ("/api/ai/sentiment", lambda text: {"text": text, "task_type": "sentiment", "model": "groq-llama3-8b"}),
+    "insights-hf": ("/api/ai/insights", lambda text: {"text": text, "task_type": "insights", "model": "hf-mistral-7b"}),
+    "summarize-groq": ("/api/ai/summarize", lambda text: {"text": text, "task_type": "summarize", "model": "groq-llama3-8b"}),
+    "analyze-groq": ("/api/ai/analyze", lambda text: {"text": text, "model": "groq-llama3-8b"}),
+    "stream-groq": ("/api/ai/sentiment/stream", lambda text: {"text": text, "task_type": "sentiment", "model": "groq-llama3-8b"})
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(app: str, port: int, env: dict) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT,
+        env={**os.environ, **env},
+        stdout=subprocess.DEVNULL
+    )
+
+
+def wait_ready(url: str, timeout: float = 20.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server at {url} did not start within {timeout}s")
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(pct / 100 * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+async def run_scenario(client: httpx.AsyncClient, name: str, requests: int, concurrency: int) -> dict:
+    path, body = SCENARIOS[name]
+    latencies = []
+    errors = 0
+    fallbacks = 0
+    queue: asyncio.Queue = asyncio.Queue()
+    for _ in range(requests):
+        queue.put_nowait(f"{TEXT}[{uuid.uuid4().hex}]")
+
+    async def worker():
+        nonlocal errors, fallbacks
+        while not queue.empty():
+            text = queue.get_nowait()
+            started = time.perf_counter()
+            try:
+                response = await client.post(path, json=body(text))
+                content = response.text
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                errors += 1
+            elif '"fallback-analysis"' in content or '"fallback": true' in content:
+                fallbacks += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "scenario": name,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "fallbacks": fallbacks,
+        "throughput_rps": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1)
+    }
+
+
+async def run_all(base_url: str, scenarios: list, requests: int, levels: list) -> list:
+    limits = httpx.Limits(max_connections=max(levels) + 8)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60.0, limits=limits) as client:
+        results = []
+        for name in scenarios:
+            for concurrency in levels:
+                results.append(await run_scenario(client, name, requests, concurrency))
+                print(format_row(results[-1]), flush=True)
+        return results
+
+
+def format_row(result: dict) -> str:
+    return (
+        f"{result['scenario']:<16} {result['concurrency']:>5} {result['throughput_rps']:>9} "
+        f"{result['p50_ms']:>9} {result['p95_ms']:>9} {result['p99_ms']:>9} "
+        f"{result['errors']:>6} {result['fallbacks']:>9}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark main:app against local Groq/HF stubs")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario and concurrency level")
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated concurrency levels")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated scenario names")
+    parser.add_argument("--latency-ms", type=float, default=200, help="mean stub upstream latency")
+    parser.add_argument("--jitter-ms", type=float, default=50, help="uniform jitter around the stub latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of stub responses that are HTTP 500")
+    parser.add_argument("--loading-rate", type=float, default=0.0, help="fraction of HF stub responses that are 503 loading")
+    parser.add_argument("--json", dest="json_path", help="also write results to this file")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.concurrency.split(",")]
+    scenarios = args.scenarios.split(",")
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    stub_port, app_port = free_port(), free_port()
+    stub_url = f"http://127.0.0.1:{stub_port}"
+    stub = start_server("benchmarks.stub_servers:app", stub_port, {
+        "STUB_LATENCY_MS": str(args.latency_ms),
+        "STUB_JITTER_MS": str(args.jitter_ms),
+        "STUB_ERROR_RATE": str(args.error_rate),
+        "STUB_LOADING_RATE": str(args.loading_rate)
+    })
+    app = start_server("main:app", app_port, {
+        "GROQ_BASE_URL": f"{stub_url}/openai/v1/chat/completions",
+        "HF_BASE_URL": f"{stub_url}/models",
+        "GROQ_API_KEY": "stub-key",
+        "HUGGINGFACE_API_KEY": "stub-key",
+        "GROQ_RPM": "1000000",
+        "GROQ_TPM": "0",
+        "HF_RPM": "1000000",
+        "GROQ_MAX_CONCURRENCY": str(max(levels)),
+        "HF_MAX_CONCURRENCY": str(max(levels)),
+        "GROQ_MAX_CONNECTIONS": str(max(levels)),
+        "HF_MAX_CONNECTIONS": str(max(levels)),
+        "LOG_LEVEL": "WARNING"
+    })
+    try:
+        wait_ready(f"{stub_url}/docs")
+        wait_ready(f"http://127.0.0.1:{app_port}/health")
+        print(f"stub latency {args.latency_ms}ms ±{args.jitter_ms}ms, error rate {args.error_rate}, loading rate {args.loading_rate}")
+        print(f"{'scenario':<16} {'conc':>5} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>6} {'fallbacks':>9}")
+        results = asyncio.run(run_all(f"http://127.0.0.1:{app_port}", scenarios, args.requests, levels))
+    finally:
+        for process in (app, stub):
+            process.terminate()
+            process.wait(timeout=10)
+
+    if args.json_path:
+        with open(args.json_path, "w") as out:
+            json.dump({"config": vars(args), "results": results}, out, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# Local stand-ins for the Groq chat-completions and HuggingFace inference APIs
+#
+# Behaviour is controlled with environment variables so the same stub can be
+# started by run_benchmarks.py or by hand:
+#   STUB_LATENCY_MS      mean upstream latency (default 200)
+#   STUB_JITTER_MS       +/- uniform jitter around the mean (default 50)
+#   STUB_ERROR_RATE      fraction of requests answered with HTTP 500 (default 0)
+#   STUB_LOADING_RATE    fraction of HF requests answered with 503 "model is loading" (default 0)
+#   STUB_TOKEN_DELAY_MS  delay between streamed tokens (default 20)
+#
+# Usage: uvicorn benchmarks.stub_servers:app --port 9100
+import asyncio
+import json
+import os
+import random
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+LATENCY_MS = float(os.getenv("STUB_LATENCY_MS", 200))
+JITTER_MS = float(os.getenv("STUB_JITTER_MS", 50))
+ERROR_RATE = float(os.getenv("STUB_ERROR_RATE", 0))
+LOADING_RATE = float(os.getenv("STUB_LOADING_RATE", 0))
+TOKEN_DELAY_MS = float(os.getenv("STUB_TOKEN_DELAY_MS", 20))
+
+SENTIMENT_REPLY = (
+    "Your entry carries a positive, hopeful tone with some underlying fatigue. "
+    "You seem proud of what you achieved and a little anxious about what comes next."
+)
+COMBINED_REPLY = json.dumps({
+    "sentiment": {"label": "positive", "analysis": SENTIMENT_REPLY},
+    "insights": {"themes": ["growth", "career"], "analysis": "You grow most when you take on stretch goals."},
+    "summary": "A demanding but rewarding day that ended with a sense of accomplishment."
+})
+
+app = FastAPI(title="Groq/HF stub servers")
+
+
+async def simulated_latency():
+    await asyncio.sleep(max(LATENCY_MS + random.uniform(-JITTER_MS, JITTER_MS), 0) / 1000)
+
+
+def reply_for(prompt: str) -> str:
+    return COMBINED_REPLY if "JSON object" in prompt else SENTIMENT_REPLY
+
+
+def rate_limit_headers() -> dict:
+    return {
+        "x-ratelimit-remaining-requests": "14000",
+        "x-ratelimit-remaining-tokens": "100000",
+        "x-ratelimit-reset-requests": "1m0s",
+        "x-ratelimit-reset-tokens": "6s"
+    }
+
+
+async def stream_tokens(reply: str, event):
+    for word in reply.split(" "):
+        await asyncio.sleep(TOKEN_DELAY_MS / 1000)
+        yield f"data: {json.dumps(event(word + ' '))}\n\n"
+
+
+@app.post("/openai/v1/chat/completions")
+async def groq_chat_completions(request: Request):
+    payload = await request.json()
+    await simulated_latency()
+    if random.random() < ERROR_RATE:
+        return JSONResponse({"error": {"message": "stub internal error"}}, status_code=500)
+
+    prompt = payload["messages"][-1]["content"]
+    reply = reply_for(prompt)
+    if payload.get("stream"):
+        async def events():
+            async for chunk in stream_tokens(reply, lambda text: {"choices": [{"delta": {"content": text}}]}):
+                yield chunk
+            if payload.get("stream_options", {}).get("include_usage"):
+                usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(reply) // 4}
+                usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+                yield f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n"
+            yield "data: [DONE]\n\n"
+        return StreamingResponse(events(), media_type="text/event-stream", headers=rate_limit_headers())
+
+    prompt_tokens = len(prompt) // 4
+    completion_tokens = len(reply) // 4
+    return JSONResponse(
+        {
+            "model": payload["model"],
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        },
+        headers=rate_limit_headers()
+    )
+
+
+@app.post("/models/{model_id:path}")
+async def hf_inference(model_id: str, request: Request):
+    payload = await request.json()
+    if random.random() < LOADING_RATE:
+        return JSONResponse(
+            {"error": f"Model {model_id} is currently loading", "estimated_time": round(random.uniform(5, 30), 1)},
+            status_code=503
+        )
+    await simulated_latency()
+    if random.random() < ERROR_RATE:
+        return JSONResponse({"error": "stub internal error"}, status_code=500)
+
+    reply = reply_for(payload["inputs"])
+    if payload.get("stream"):
+        async def events():
+            async for chunk in stream_tokens(reply, lambda text: {"token": {"text": text, "special": False}}):
+                yield chunk
+            final = {"token": {"text": "", "special": True}, "generated_text": reply,
+                     "details": {"finish_reason": "eos_token", "generated_tokens": len(reply) // 4}}
+            yield f"data: {json.dumps(final)}\n\n"
+        return StreamingResponse(events(), media_type="text/event-stream")
+    generated = {"generated_text": reply}
+    if payload.get("parameters", {}).get("details"):
+        generated["details"] = {"finish_reason": "eos_token", "generated_tokens": len(reply) // 4}
+    return JSONResponse([generated])
@@ -0,0 +1,51 @@
+# Token-aware chunking of long entries along paragraph and sentence boundaries
+import re
+from typing import List
+
+from extractive_summary import split_sentences
+from token_planner import count_tokens
+
+PARAGRAPH_PATTERN = re.compile(r"\n\s*\n")
+
+
+def _split_oversized(unit: str, max_tokens: int) -> List[str]:
+    """Break a single paragraph or sentence that exceeds the budget: sentences first, then words"""
+    sentences = split_sentences(unit)
+    if len(sentences) > 1:
+        return _pack(sentences, max_tokens, " ")
+    return _pack(unit.split(), max_tokens, " ")
+
+
+def _pack(units: List[str], max_tokens: int, separator: str) -> List[str]:
+    """Greedily join consecutive units into chunks of at most max_tokens"""
+    chunks, current = [], []
+    size = 0
+    for unit in units:
+        tokens = count_tokens(unit)
+        if tokens > max_tokens and " " in unit.strip():
+            if current:
+                chunks.append(separator.join(current))
+                current, size = [], 0
+            chunks.extend(_split_oversized(unit, max_tokens))
+            continue
+        if current and size + tokens > max_tokens:
+            chunks.append(separator.join(current))
+            current, size = [], 0
+        size += tokens
+        current.append(unit)
+    if current:
+        chunks.append(separator.join(current))
+    return chunks
+
+
+def chunk_text(text: str, max_tokens: int) -> List[str]:
+    """Split text into chunks of at most max_tokens (estimated), breaking at paragraphs, then sentences.
+
+    Chunks are packed front to back, so appending to an entry or editing a
+    later paragraph leaves the earlier chunks byte-identical and their cached
+    results reusable.
+    """
+    if count_tokens(text) <= max_tokens:
+        return [text]
+    paragraphs = [paragraph.strip() for paragraph in PARAGRAPH_PATTERN.split(text) if paragraph.strip()]
+    return _pack(paragraphs, max(max_tokens, 1), "\n\n")
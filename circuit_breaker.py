@@ -0,0 +1,149 @@
+# Circuit breakers for AI models - fail fast to a fallback while a model is unhealthy
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, List, Tuple
+
+from structured_logging import get_logger, log_event
+
+logger = get_logger("circuit_breaker")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker over a sliding window of recent call outcomes.
+
+    Trips when the error rate over the window reaches `failure_rate` (once at
+    least `min_calls` have been seen) or when `timeout_threshold` timeouts are
+    in the window. After `open_seconds` it lets `half_open_calls` probes
+    through; a successful probe closes it, a failed one re-opens it. Probes
+    that report no outcome within `probe_seconds` are written off so a lost
+    probe cannot hold the breaker half-open forever.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: int = 20,
+        min_calls: int = 5,
+        failure_rate: float = 0.5,
+        timeout_threshold: int = 3,
+        open_seconds: float = 30.0,
+        half_open_calls: int = 1,
+        probe_seconds: float = 60.0
+    ):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.timeout_threshold = timeout_threshold
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.probe_seconds = probe_seconds
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probes_in_flight = 0
+        self.probe_started_at = 0.0
+        self._outcomes: Deque[Tuple[bool, bool]] = deque(maxlen=window)
+        self.transitions: Deque[dict] = deque(maxlen=10)
+        self.counters = {"successes": 0, "failures": 0, "timeouts": 0, "short_circuited": 0}
+
+    @classmethod
+    def from_env(cls, name: str) -> "CircuitBreaker":
+        return cls(
+            name,
+            window=int(os.getenv("BREAKER_WINDOW", 20)),
+            min_calls=int(os.getenv("BREAKER_MIN_CALLS", 5)),
+            failure_rate=float(os.getenv("BREAKER_FAILURE_RATE", 0.5)),
+            timeout_threshold=int(os.getenv("BREAKER_TIMEOUT_THRESHOLD", 3)),
+            open_seconds=float(os.getenv("BREAKER_OPEN_SECONDS", 30)),
+            half_open_calls=int(os.getenv("BREAKER_HALF_OPEN_CALLS", 1)),
+            probe_seconds=float(os.getenv("BREAKER_PROBE_SECONDS", 60))
+        )
+
+    def _transition(self, state: str, reason: str):
+        if state == self.state:
+            return
+        log_event(logger, logging.WARNING, "circuit_transition", model=self.name, from_state=self.state, to_state=state, reason=reason)
+        self.transitions.append({
+            "from": self.state,
+            "to": state,
+            "reason": reason,
+            "at": datetime.now().isoformat()
+        })
+        self.state = state
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+            self.probes_in_flight = 0
+        elif state == CLOSED:
+            self._outcomes.clear()
+            self.probes_in_flight = 0
+
+    def allow(self) -> bool:
+        """Whether a call may go to the model now; counts short-circuits"""
+        now = time.monotonic()
+        if self.state == OPEN and now - self.opened_at >= self.open_seconds:
+            self._transition(HALF_OPEN, "recovery probe")
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and self.probes_in_flight and now - self.probe_started_at >= self.probe_seconds:
+            log_event(logger, logging.WARNING, "circuit_probe_expired", model=self.name, probes=self.probes_in_flight)
+            self.probes_in_flight = 0
+        if self.state == HALF_OPEN and self.probes_in_flight < self.half_open_calls:
+            self.probes_in_flight += 1
+            self.probe_started_at = now
+            return True
+        self.counters["short_circuited"] += 1
+        return False
+
+    def record_success(self):
+        self.counters["successes"] += 1
+        if self.state == HALF_OPEN:
+            self._transition(CLOSED, "probe succeeded")
+            return
+        self._outcomes.append((True, False))
+
+    def record_failure(self, timeout: bool = False):
+        self.counters["failures"] += 1
+        if timeout:
+            self.counters["timeouts"] += 1
+        if self.state == HALF_OPEN:
+            self._transition(OPEN, "probe failed")
+            return
+        self._outcomes.append((False, timeout))
+        if self.state != CLOSED:
+            return
+
+        failures = sum(1 for ok, _ in self._outcomes if not ok)
+        timeouts = sum(1 for _, timed_out in self._outcomes if timed_out)
+        if timeouts >= self.timeout_threshold:
+            self._transition(OPEN, f"{timeouts} timeouts in window")
+        elif len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate:
+            self._transition(OPEN, f"error rate {failures}/{len(self._outcomes)}")
+
+    def record_ignored(self):
+        """Outcome that says nothing about model health (e.g. local rate limiting)"""
+        if self.state == HALF_OPEN and self.probes_in_flight > 0:
+            self.probes_in_flight -= 1
+
+    def stats(self) -> dict:
+        failures = sum(1 for ok, _ in self._outcomes if not ok)
+        retry_in = 0.0
+        if self.state == OPEN:
+            retry_in = max(self.open_seconds - (time.monotonic() - self.opened_at), 0.0)
+        return {
+            "state": self.state,
+            "window_calls": len(self._outcomes),
+            "window_error_rate": round(failures / len(self._outcomes), 3) if self._outcomes else 0.0,
+            "retry_in_seconds": round(retry_in, 1),
+            **self.counters,
+            "recent_transitions": list(self.transitions)
+        }
+
+
+def build_breakers(model_names: List[str]) -> Dict[str, CircuitBreaker]:
+    return {name: CircuitBreaker.from_env(name) for name in model_names}
@@ -0,0 +1,134 @@
+# Request deadlines - a client's time budget carried in a context variable down to every upstream call
+import contextvars
+import math
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Iterator, Optional, TypeVar
+
+from starlette.responses import JSONResponse
+
+# Remaining time budget the client is willing to wait, in milliseconds from when the request arrives
+DEADLINE_HEADER = "X-Deadline-Ms"
+
+T = TypeVar("T")
+
+# Timeouts that fire with less than this left were caused by the deadline, not by the upstream
+EXHAUSTED_SLACK_SECONDS = 0.1
+
+
+class DeadlineExceeded(Exception):
+    """The request's deadline leaves too little time for an upstream call or wait"""
+
+
+class Deadline:
+    """Monotonic expiry of one request's budget"""
+
+    def __init__(self, budget: float):
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+
+    def remaining(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def extend(self, other: Optional["Deadline"]):
+        """Expire no earlier than `other` does (never, when there is no other deadline)"""
+        self.expires_at = math.inf if other is None else max(self.expires_at, other.expires_at)
+
+    def report(self, degraded: bool) -> dict:
+        """Response metadata: the budget, what was left of it and whether it forced the local fallback"""
+        return {
+            "budget_ms": round(self.budget * 1000),
+            "remaining_ms": round(self.remaining() * 1000),
+            "degraded": degraded
+        }
+
+
+_current: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar("request_deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current.get()
+
+
+def remaining_budget() -> Optional[float]:
+    """Seconds left before the current request's deadline, or None without one"""
+    deadline = _current.get()
+    return None if deadline is None else deadline.remaining()
+
+
+def within_budget(seconds: float) -> float:
+    """`seconds`, shortened to what is left of the current deadline"""
+    budget = remaining_budget()
+    return seconds if budget is None else min(seconds, budget)
+
+
+def budget_allows(seconds: float) -> bool:
+    """At least `seconds` are left (always true without a deadline)"""
+    budget = remaining_budget()
+    return budget is None or budget >= seconds
+
+
+def budget_exhausted() -> bool:
+    """A deadline is set and it has (all but) run out"""
+    budget = remaining_budget()
+    return budget is not None and budget <= EXHAUSTED_SLACK_SECONDS
+
+
+@contextmanager
+def deadline_scope(budget_ms: Optional[float]) -> Iterator[Optional[Deadline]]:
+    """Run the block under a budget of `budget_ms`; an enclosing deadline that ends sooner still wins"""
+    parent = _current.get()
+    if budget_ms is None:
+        yield parent
+        return
+    budget = budget_ms / 1000
+    if parent is not None:
+        budget = min(budget, parent.remaining())
+    token = _current.set(Deadline(budget))
+    try:
+        yield _current.get()
+    finally:
+        _current.reset(token)
+
+
+async def detached(awaitable: Awaitable[T], deadline: Optional[Deadline] = None) -> T:
+    """Await `awaitable` under `deadline` instead of the current one, for work shared by several callers"""
+    token = _current.set(deadline)
+    try:
+        return await awaitable
+    finally:
+        _current.reset(token)
+
+
+def parse_budget_ms(value: str) -> float:
+    """Budget from a DEADLINE_HEADER value; ValueError unless it is a positive number"""
+    budget_ms = float(value)
+    if not budget_ms > 0 or budget_ms == float("inf"):
+        raise ValueError(f"{DEADLINE_HEADER} must be a positive number of milliseconds")
+    return budget_ms
+
+
+class DeadlineMiddleware:
+    """ASGI middleware putting each request's DEADLINE_HEADER budget in scope for the handler"""
+
+    def __init__(self, app):
+        self.app = app
+        self.header = DEADLINE_HEADER.lower().encode("latin-1")
+
+    async def __call__(self, scope, receive, send):
+        value = None
+        if scope["type"] == "http":
+            value = next((v for k, v in scope["headers"] if k == self.header), None)
+        if value is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            budget_ms = parse_budget_ms(value.decode("latin-1"))
+        except ValueError:
+            response = JSONResponse(
+                status_code=400, content={"detail": f"{DEADLINE_HEADER} must be a positive number of milliseconds"})
+            await response(scope, receive, send)
+            return
+        with deadline_scope(budget_ms):
+            await self.app(scope, receive, send)
@@ -0,0 +1,139 @@
+# Extractive summarization - sentence segmentation, sparse TF-IDF sentence similarity and TextRank in NumPy
+import re
+from typing import List, Optional
+
+import numpy as np
+
+# Abbreviations whose trailing period does not end a sentence
+ABBREVIATIONS = frozenset({
+    "mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "vs", "etc", "e.g", "i.e", "a.m", "p.m", "approx",
+    "appt", "dept", "est", "min", "max", "no", "jan", "feb", "mar", "apr", "jun", "jul", "aug", "sep",
+    "sept", "oct", "nov", "dec", "mon", "tue", "wed", "thu", "fri", "sat", "sun", "u.s", "inc", "ltd", "co"
+})
+
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below between
+both but by can could did do does doing down during each few for from further had has have having he her
+here hers herself him himself his how i if in into is it its itself just me more most my myself no nor not
+now of off on once only or other our ours ourselves out over own same she should so some such than that the
+their theirs them themselves then there these they this those through to too under until up very was we
+were what when where which while who whom why will with would you your yours yourself yourselves im ive
+its dont didnt got get really also today
+""".split())
+
+# Candidate boundaries: terminal punctuation (plus closing quotes/brackets) before whitespace, or line breaks
+BOUNDARY_PATTERN = re.compile(r"[.!?…]+[\"'”’)\]]*(?=\s|$)|\n+")
+WORD_BEFORE_PATTERN = re.compile(r"([A-Za-z][A-Za-z.]*)\.$")
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+DAMPING = 0.85
+MAX_ITERATIONS = 50
+TOLERANCE = 1e-6
+# The sentence graph is quadratic; longer entries are ranked in contiguous blocks of at most this many sentences
+MAX_RANKED_SENTENCES = 300
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split text into sentences on ., !, ?, … and line breaks, keeping abbreviations and initials intact"""
+    sentences = []
+    start = 0
+    for match in BOUNDARY_PATTERN.finditer(text):
+        end = match.end()
+        if match.group().startswith("."):
+            before = WORD_BEFORE_PATTERN.search(text, start, match.start() + 1)
+            word = before.group(1).lower() if before else ""
+            if word in ABBREVIATIONS or (len(word) == 1 and word != "i"):
+                continue
+        sentence = text[start:end].strip()
+        if sentence:
+            sentences.append(sentence)
+        start = end
+    tail = text[start:].strip()
+    if tail:
+        sentences.append(tail)
+    return sentences
+
+
+def _similarity_matrix(sentences: List[str]) -> np.ndarray:
+    """Cosine similarity of the sentences' TF-IDF vectors over the entry's own vocabulary.
+
+    The vectors are kept as sparse (sentence, term, weight) triples: only terms
+    shared by two or more sentences contribute, so the work grows with the pairs
+    of sentences sharing a word rather than with sentences x vocabulary.
+    """
+    count = len(sentences)
+    vocabulary = {}
+    rows, columns = [], []
+    for i, sentence in enumerate(sentences):
+        for token in TOKEN_PATTERN.findall(sentence.lower()):
+            if token not in STOPWORDS:
+                rows.append(i)
+                columns.append(vocabulary.setdefault(token, len(vocabulary)))
+    if not vocabulary:
+        return np.zeros((count, count))
+
+    width = len(vocabulary)
+    cells, counts = np.unique(np.array(rows, dtype=np.int64) * width + np.array(columns, dtype=np.int64),
+                              return_counts=True)
+    rows, columns = cells // width, cells % width
+    document_frequency = np.bincount(columns, minlength=width)
+    idf = np.log((1 + count) / (1 + document_frequency)) + 1.0
+    weights = counts * idf[columns]
+    norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=count))
+    weights /= norms[rows]
+
+    # Pair every cell with each cell of the same term (terms are contiguous once sorted)
+    shared = document_frequency[columns] > 1
+    order = np.argsort(columns[shared], kind="stable")
+    rows, columns, weights = rows[shared][order], columns[shared][order], weights[shared][order]
+    sizes = document_frequency[columns]
+    left = np.repeat(np.arange(len(rows)), sizes)
+    offsets = np.arange(len(left)) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    right = np.repeat(np.searchsorted(columns, columns), sizes) + offsets
+    similarity = np.bincount(rows[left] * count + rows[right], weights=weights[left] * weights[right],
+                             minlength=count * count).astype(np.float64)
+    return similarity.reshape(count, count)
+
+
+def textrank_scores(sentences: List[str]) -> np.ndarray:
+    """Centrality of each sentence: PageRank over the cosine-similarity graph"""
+    count = len(sentences)
+    if count <= 1:
+        return np.ones(count)
+    if count > MAX_RANKED_SENTENCES:
+        # Scaled by block size so the scores still sum to 1 and compare across blocks
+        blocks = np.array_split(np.arange(count), -(-count // MAX_RANKED_SENTENCES))
+        return np.concatenate([textrank_scores([sentences[i] for i in block]) * len(block) / count for block in blocks])
+    similarity = _similarity_matrix(sentences)
+    np.fill_diagonal(similarity, 0.0)
+
+    # Row-stochastic transitions; sentences sharing no words with any other jump uniformly
+    out_weight = similarity.sum(axis=1, keepdims=True)
+    transitions = np.divide(similarity, out_weight, out=np.full_like(similarity, 1.0 / count), where=out_weight > 0)
+    scores = np.full(count, 1.0 / count)
+    for _ in range(MAX_ITERATIONS):
+        updated = (1 - DAMPING) / count + DAMPING * (transitions.T @ scores)
+        converged = np.abs(updated - scores).sum() < TOLERANCE
+        scores = updated
+        if converged:
+            break
+    return scores
+
+
+def summarize(text: str, max_sentences: int = 3, ratio: Optional[float] = None) -> List[str]:
+    """The most central sentences of `text`, in their original order.
+
+    Length is `max_sentences`, or `ratio` of the entry's sentences when given
+    (at least one, never more than `max_sentences`).
+    """
+    sentences = split_sentences(text)
+    limit = max_sentences
+    if ratio is not None:
+        limit = min(max_sentences, max(1, round(len(sentences) * ratio)))
+    if len(sentences) <= limit:
+        return sentences
+
+    scores = textrank_scores(sentences)
+    # Stable sort keeps the earlier sentence on ties
+    chosen = np.sort(np.argsort(-scores, kind="stable")[:limit])
+    return [sentences[i] for i in chosen]
@@ -0,0 +1,154 @@
+# HuggingFace cold starts - parse "model is loading" replies, wait them out within a budget, keep models warm
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from structured_logging import get_logger, log_event
+
+logger = get_logger("hf_cold_start")
+
+
+def loading_estimate(status_code: int, body: str) -> Optional[float]:
+    """Seconds until the model is ready if this is a 503 "model is loading" reply, else None"""
+    if status_code != 503:
+        return None
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return None
+    if not isinstance(data, dict) or "loading" not in str(data.get("error", "")).lower():
+        return None
+    try:
+        return max(float(data.get("estimated_time", 0.0)), 0.0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class ColdStartTracker:
+    """Per-model loading state shared by every request to the model.
+
+    A loading reply sets the model's expected ready time; requests then
+    sleep towards it (at most `poll_seconds` at a time) and retry, as long
+    as it falls within their wait budget. Requests whose budget ends before
+    the model is expected to be ready give up at once instead of calling,
+    and the first success after loading yields the cold-start duration.
+    """
+
+    def __init__(self, max_wait: float = 20.0, poll_seconds: float = 5.0):
+        self.max_wait = max_wait
+        self.poll_seconds = poll_seconds
+        self.models: Dict[str, dict] = {}
+
+    @classmethod
+    def from_env(cls) -> "ColdStartTracker":
+        return cls(
+            max_wait=float(os.getenv("HF_COLD_START_MAX_WAIT_SECONDS", 20)),
+            poll_seconds=float(os.getenv("HF_COLD_START_POLL_SECONDS", 5))
+        )
+
+    def _state(self, model: str) -> dict:
+        return self.models.setdefault(model, {
+            "loading_since": None, "ready_at": None, "last_ready": None,
+            "loading_replies": 0, "cold_starts": 0, "last_cold_start_seconds": None
+        })
+
+    def record_loading(self, model: str, estimate: float):
+        now = time.monotonic()
+        state = self._state(model)
+        if state["loading_since"] is None:
+            state["loading_since"] = now
+            log_event(logger, logging.INFO, "hf_model_loading", model=model, estimated_time=estimate)
+        state["ready_at"] = now + estimate
+        state["loading_replies"] += 1
+
+    def record_ready(self, model: str) -> Optional[float]:
+        """Mark the model warm; returns how long it was loading, if it was"""
+        state = self._state(model)
+        state["last_ready"] = time.monotonic()
+        if state["loading_since"] is None:
+            return None
+        duration = state["last_ready"] - state["loading_since"]
+        state.update(loading_since=None, ready_at=None, last_cold_start_seconds=round(duration, 3))
+        state["cold_starts"] += 1
+        return duration
+
+    def is_loading(self, model: str) -> bool:
+        return self._state(model)["loading_since"] is not None
+
+    def too_slow(self, model: str, deadline: float) -> bool:
+        """The model is loading and not expected to be ready before `deadline` (monotonic)"""
+        state = self._state(model)
+        return state["ready_at"] is not None and state["ready_at"] > deadline
+
+    def retry_delay(self, model: str, deadline: float) -> Optional[float]:
+        """Seconds to sleep before retrying a loading model, or None when the budget cannot cover it"""
+        if self.too_slow(model, deadline):
+            return None
+        now = time.monotonic()
+        return min(max(self._state(model)["ready_at"] - now, 0.5), self.poll_seconds, max(deadline - now, 0.0))
+
+    def idle_for(self, model: str) -> float:
+        last_ready = self._state(model)["last_ready"]
+        return float("inf") if last_ready is None else time.monotonic() - last_ready
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            model: {
+                "state": "loading" if state["loading_since"] is not None else ("warm" if state["last_ready"] else "unknown"),
+                "ready_in_seconds": round(max(state["ready_at"] - now, 0.0), 1) if state["ready_at"] else None,
+                "loading_replies": state["loading_replies"],
+                "cold_starts": state["cold_starts"],
+                "last_cold_start_seconds": state["last_cold_start_seconds"]
+            }
+            for model, state in self.models.items()
+        }
+
+
+class ModelWarmer:
+    """Background pings that keep selected models loaded.
+
+    Every `interval` seconds each model that has not answered anything in
+    that time gets one tiny request; models in regular use cost nothing.
+    """
+
+    def __init__(self, models: List[str], interval: float, ping: Callable[[str], Awaitable[None]], tracker: ColdStartTracker):
+        self.models = models
+        self.interval = interval
+        self.ping = ping
+        self.tracker = tracker
+        self.pings = 0
+        self.failures = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self.models and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def warm_once(self):
+        for model in self.models:
+            if self.tracker.idle_for(model) < self.interval:
+                continue
+            self.pings += 1
+            try:
+                await self.ping(model)
+            except Exception as e:
+                self.failures += 1
+                log_event(logger, logging.WARNING, "hf_warm_ping_failed", model=model, error=str(e))
+
+    async def _run(self):
+        while True:
+            await self.warm_once()
+            await asyncio.sleep(self.interval)
+
+    def stats(self) -> dict:
+        return {"models": self.models, "interval_seconds": self.interval, "pings": self.pings, "failures": self.failures}
@@ -0,0 +1,346 @@
+# Background job queue - bounded async worker pool with priorities, polling and optional SQLite persistence
+import asyncio
+import ipaddress
+import json
+import logging
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+from urllib.parse import urlsplit
+
+from structured_logging import get_logger, log_event
+
+logger = get_logger("jobs")
+
+FINISHED = ("done", "failed", "cancelled")
+
+# How often a long-poll for another worker's job re-reads it from SQLite
+POLL_SECONDS = 0.25
+
+
+def process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def check_callback_url(url: str, allowed_hosts: Iterable[str] = ()) -> str:
+    """Return `url` if the server may POST job results to it; ValueError otherwise.
+
+    Only http(s) URLs are accepted. Hosts in `allowed_hosts` (a leading dot
+    also admits subdomains) are trusted as configured; any other host must
+    resolve to public addresses only, so callbacks cannot reach loopback,
+    private, link-local (cloud metadata) or other internal addresses.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ValueError("callback_url must be an absolute http(s) URL")
+    host = parts.hostname.lower().rstrip(".")
+    for allowed in allowed_hosts:
+        if host == allowed.lstrip(".") or (allowed.startswith(".") and host.endswith(allowed)):
+            return url
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, parts.port or 80, type=socket.SOCK_STREAM)}
+    except (socket.gaierror, UnicodeError):
+        raise ValueError(f"callback_url host {host!r} does not resolve")
+    for address in addresses:
+        if not ipaddress.ip_address(address.split("%", 1)[0]).is_global:
+            raise ValueError(f"callback_url host {host!r} is not a public address")
+    return url
+
+
+class JobQueueFull(Exception):
+    """Raised by submit when max_pending jobs are already waiting"""
+
+
+class JobQueue:
+    """Runs submitted jobs on a fixed number of asyncio workers, lowest priority number first.
+
+    `handler(kind, payload)` does the work and returns a JSON-serializable
+    result. Job state is kept in memory and, when `sqlite_path` is set,
+    written through to SQLite: on start, jobs that were queued or running
+    when the process stopped are queued again, and finished jobs stay
+    readable until `retention_seconds` after they finished.
+
+    Workers are bound to the event loop that started them; `start` is
+    idempotent and re-queues unfinished jobs if it runs on a new loop.
+
+    Several server processes can share one SQLite file. Each job belongs to
+    the process it was submitted to; the others read it from SQLite when it
+    is polled or cancelled through them, and only re-run it once its owner
+    process is gone.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[str, dict], Awaitable[dict]],
+        workers: int = 4,
+        max_pending: int = 1000,
+        retention_seconds: float = 3600.0,
+        sqlite_path: Optional[str] = None,
+        notify: Optional[Callable[[dict, str], Awaitable[None]]] = None
+    ):
+        self.handler = handler
+        self.workers = workers
+        self.max_pending = max_pending
+        self.retention_seconds = retention_seconds
+        self.sqlite_path = sqlite_path
+        self.notify = notify
+        self.jobs: Dict[str, dict] = {}
+        self.counters = {"submitted": 0, "done": 0, "failed": 0, "cancelled": 0, "rejected": 0, "recovered": 0}
+        self._db: Optional[sqlite3.Connection] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._tasks = []
+        self._events: Dict[str, asyncio.Event] = {}
+        self._sequence = 0
+        self._draining = False
+        self._running = 0
+
+    @classmethod
+    def from_env(cls, handler: Callable[[str, dict], Awaitable[dict]], notify=None) -> "JobQueue":
+        return cls(
+            handler,
+            workers=int(os.getenv("JOB_WORKERS", 4)),
+            max_pending=int(os.getenv("JOB_MAX_PENDING", 1000)),
+            retention_seconds=float(os.getenv("JOB_RETENTION_SECONDS", 3600)),
+            sqlite_path=os.getenv("JOB_SQLITE_PATH") or None,
+            notify=notify
+        )
+
+    def _open_db(self):
+        directory = os.path.dirname(self.sqlite_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(self.sqlite_path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, data TEXT NOT NULL, status TEXT NOT NULL, finished_at REAL)"
+        )
+        self._db.execute("DELETE FROM jobs WHERE finished_at < ?", (time.time() - self.retention_seconds,))
+        owner = os.getpid()
+        # One transaction, so two processes starting together cannot both adopt an orphaned job
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            for (data, ) in self._db.execute("SELECT data FROM jobs").fetchall():
+                job = json.loads(data)
+                if job["status"] not in FINISHED:
+                    previous = job.get("owner", owner)
+                    if previous != owner and process_alive(previous):
+                        continue
+                    job.update(status="queued", started_at=None, owner=owner)
+                    self._save(job)
+                    self.counters["recovered"] += 1
+                self.jobs[job["id"]] = job
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    def _save(self, job: dict):
+        if self._db is not None:
+            self._db.execute(
+                "INSERT OR REPLACE INTO jobs (id, data, status, finished_at) VALUES (?, ?, ?, ?)",
+                (job["id"], json.dumps(job), job["status"], job.get("finished_at"))
+            )
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        if self.sqlite_path and self._db is None:
+            self._open_db()
+        self._loop = loop
+        self._draining = False
+        self._queue = asyncio.PriorityQueue()
+        self._events = {}
+        for job in self.jobs.values():
+            if job["status"] not in FINISHED:
+                job["status"] = "queued"
+                self._enqueue(job)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def close(self, drain_timeout: float = 0.0):
+        """Stop the workers, letting running jobs finish for up to `drain_timeout` seconds.
+
+        Queued jobs are not started while draining; they and any jobs still
+        running at the timeout stay unfinished and are re-run by the next start.
+        """
+        self._draining = True
+        deadline = time.monotonic() + drain_timeout
+        while self._running and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if self._running:
+            log_event(logger, logging.WARNING, "job_drain_timeout", running=self._running)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _enqueue(self, job: dict):
+        self._sequence += 1
+        self._queue.put_nowait((job["priority"], self._sequence, job["id"]))
+
+    def pending(self) -> int:
+        return sum(1 for job in self.jobs.values() if job["status"] == "queued")
+
+    async def submit(self, kind: str, payload: dict, priority: int = 5, callback_url: Optional[str] = None) -> dict:
+        await self.start()
+        self._prune()
+        if self.pending() >= self.max_pending:
+            self.counters["rejected"] += 1
+            raise JobQueueFull(f"{self.max_pending} jobs already queued")
+        job = {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "payload": payload,
+            "priority": priority,
+            "callback_url": callback_url,
+            "owner": os.getpid(),
+            "status": "queued",
+            "result": None,
+            "error": None,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None
+        }
+        self.jobs[job["id"]] = job
+        self._save(job)
+        self._enqueue(job)
+        self.counters["submitted"] += 1
+        return self.view(job)
+
+    def view(self, job: dict) -> dict:
+        """Public job state (without the submitted payload)"""
+        return {key: value for key, value in job.items() if key != "payload"}
+
+    def _load(self, job_id: str) -> Optional[dict]:
+        """A job as last saved to SQLite, e.g. one another process owns"""
+        if self._db is None:
+            return None
+        row = self._db.execute("SELECT data FROM jobs WHERE id = ?", (job_id, )).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def get(self, job_id: str) -> Optional[dict]:
+        job = self.jobs.get(job_id) or self._load(job_id)
+        return self.view(job) if job is not None else None
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[dict]:
+        """Long-poll: the job once it finishes, or as it stands after `timeout` seconds"""
+        await self.start()
+        job = self.jobs.get(job_id)
+        if job is None:
+            return await self._wait_elsewhere(job_id, timeout)
+        if job["status"] not in FINISHED and timeout > 0:
+            event = self._events.setdefault(job_id, asyncio.Event())
+            try:
+                await asyncio.wait_for(event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.view(job)
+
+    async def _wait_elsewhere(self, job_id: str, timeout: float) -> Optional[dict]:
+        """Long-poll a job owned by another process by re-reading it from SQLite"""
+        deadline = time.monotonic() + timeout
+        job = self._load(job_id)
+        while job is not None and job["status"] not in FINISHED and time.monotonic() < deadline:
+            await asyncio.sleep(min(POLL_SECONDS, max(deadline - time.monotonic(), 0)))
+            job = self._load(job_id)
+        return self.view(job) if job is not None else None
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job that has not started yet"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return self._cancel_elsewhere(job_id)
+        if job["status"] != "queued":
+            return False
+        self._finish(job, "cancelled")
+        return True
+
+    def _cancel_elsewhere(self, job_id: str) -> bool:
+        """Mark another process's queued job cancelled in SQLite; its owner checks before running it"""
+        job = self._load(job_id)
+        if job is None or job["status"] != "queued":
+            return False
+        job.update(status="cancelled", finished_at=time.time())
+        cursor = self._db.execute(
+            "UPDATE jobs SET data = ?, status = ?, finished_at = ? WHERE id = ? AND status = 'queued'",
+            (json.dumps(job), job["status"], job["finished_at"], job_id)
+        )
+        if cursor.rowcount:
+            self.counters["cancelled"] += 1
+        return cursor.rowcount == 1
+
+    def _finish(self, job: dict, status: str, result: Optional[dict] = None, error: Optional[str] = None):
+        job.update(status=status, result=result, error=error, finished_at=time.time())
+        self.counters[status] += 1
+        self._save(job)
+        event = self._events.pop(job["id"], None)
+        if event is not None:
+            event.set()
+
+    async def _worker(self):
+        while True:
+            _, _, job_id = await self._queue.get()
+            job = self.jobs.get(job_id)
+            if job is None or job["status"] != "queued" or self._draining:
+                continue
+            saved = self._load(job_id)
+            if saved is not None and saved["status"] == "cancelled":
+                job.update(status="cancelled", finished_at=saved["finished_at"])
+                continue
+            job["status"] = "running"
+            job["started_at"] = time.time()
+            self._save(job)
+            self._running += 1
+            try:
+                result = await self.handler(job["kind"], job["payload"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception("job_failed", extra={"fields": {"job_id": job_id, "kind": job["kind"]}})
+                self._finish(job, "failed", error=str(e))
+            else:
+                self._finish(job, "done", result=result)
+            finally:
+                self._running -= 1
+            if job["callback_url"] and self.notify is not None:
+                try:
+                    await self.notify(self.view(job), job["callback_url"])
+                except Exception as e:
+                    log_event(logger, logging.WARNING, "job_callback_failed", job_id=job_id, error=str(e))
+
+    def _prune(self):
+        """Forget finished jobs past their retention"""
+        cutoff = time.time() - self.retention_seconds
+        expired = [job_id for job_id, job in self.jobs.items() if job["status"] in FINISHED and job["finished_at"] < cutoff]
+        for job_id in expired:
+            del self.jobs[job_id]
+        if expired and self._db is not None:
+            self._db.execute("DELETE FROM jobs WHERE finished_at < ?", (cutoff,))
+
+    def stats(self) -> dict:
+        statuses: Dict[str, int] = {}
+        for job in self.jobs.values():
+            statuses[job["status"]] = statuses.get(job["status"], 0) + 1
+        return {
+            **self.counters,
+            "statuses": statuses,
+            "workers": self.workers,
+            "running": self._running,
+            "max_pending": self.max_pending,
+            "sqlite_path": self.sqlite_path
+        }
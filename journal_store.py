@@ -0,0 +1,369 @@
+# Journal entry store - SQLite in WAL mode with a connection pool, FTS5 search and stored analyses
+import hashlib
+import json
+import os
+import queue
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import Dict, Iterator, List, Optional, Set
+
+from summary_tree import ancestors
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS journal_entries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT NOT NULL DEFAULT '',
+    text TEXT NOT NULL,
+    word_count INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS journal_entries_created_at ON journal_entries (created_at);
+CREATE INDEX IF NOT EXISTS journal_entries_updated_at ON journal_entries (updated_at);
+CREATE VIRTUAL TABLE IF NOT EXISTS journal_entries_fts USING fts5(
+    title, text, content='journal_entries', content_rowid='id', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS journal_entries_ai AFTER INSERT ON journal_entries BEGIN
+    INSERT INTO journal_entries_fts (rowid, title, text) VALUES (new.id, new.title, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS journal_entries_ad AFTER DELETE ON journal_entries BEGIN
+    INSERT INTO journal_entries_fts (journal_entries_fts, rowid, title, text) VALUES ('delete', old.id, old.title, old.text);
+END;
+CREATE TRIGGER IF NOT EXISTS journal_entries_au AFTER UPDATE OF title, text ON journal_entries BEGIN
+    INSERT INTO journal_entries_fts (journal_entries_fts, rowid, title, text) VALUES ('delete', old.id, old.title, old.text);
+    INSERT INTO journal_entries_fts (rowid, title, text) VALUES (new.id, new.title, new.text);
+END;
+CREATE TABLE IF NOT EXISTS journal_analyses (
+    entry_id INTEGER NOT NULL REFERENCES journal_entries (id) ON DELETE CASCADE,
+    task_type TEXT NOT NULL,
+    text_hash TEXT NOT NULL,
+    result TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    PRIMARY KEY (entry_id, task_type)
+);
+CREATE TABLE IF NOT EXISTS journal_summary_nodes (
+    level TEXT NOT NULL,
+    key TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 1,
+    clean_version INTEGER NOT NULL DEFAULT 0,
+    summary TEXT,
+    model TEXT,
+    source_hash TEXT,
+    children INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT,
+    PRIMARY KEY (level, key)
+);
+"""
+
+# Words (with an optional trailing * for prefix search) pulled out of a free-text query
+QUERY_TERM_PATTERN = re.compile(r"\w+\*?", re.UNICODE)
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def fts_query(query: str) -> str:
+    """Free text -> FTS5 query: every word must match (quoted, so FTS syntax in user input is inert)"""
+    terms = []
+    for term in QUERY_TERM_PATTERN.findall(query):
+        prefix = term.endswith("*")
+        terms.append(f'"{term.rstrip("*")}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+class JournalStore:
+    """Journal entries and their stored task results in one SQLite database.
+
+    The database runs in WAL mode so readers never wait for the writer.
+    Connections come from a small pool, each used by one thread at a time,
+    so blocking calls can run concurrently in worker threads. The schema is
+    created on first use, not on construction.
+
+    Stored analyses carry the hash of the text they were computed from and
+    only count while it matches the entry's current text; editing an entry
+    drops them.
+    """
+
+    def __init__(self, path: str, pool_size: int = 4):
+        self.path = path
+        self.pool_size = pool_size
+        self._pool: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        self._opened = 0
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    @classmethod
+    def from_env(cls) -> "JournalStore":
+        return cls(
+            path=os.getenv("JOURNAL_DB_PATH", "./data/journal.db"),
+            pool_size=int(os.getenv("JOURNAL_DB_POOL_SIZE", 4))
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=5.0)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("PRAGMA foreign_keys=ON")
+        return connection
+
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a pooled connection, opening one while the pool is below its size"""
+        connection = None
+        with self._lock:
+            if not self._initialized:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                connection = self._connect()
+                connection.executescript(SCHEMA)
+                self._opened += 1
+                self._initialized = True
+            elif self._pool.empty() and self._opened < self.pool_size:
+                connection = self._connect()
+                self._opened += 1
+        if connection is None:
+            connection = self._pool.get()
+        try:
+            yield connection
+        finally:
+            self._pool.put(connection)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._connection() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+    def create(self, text: str, title: Optional[str] = None, created_at: Optional[datetime] = None) -> dict:
+        """Add an entry; `created_at` backdates it (imports), otherwise it is written now"""
+        now = datetime.now().isoformat()
+        created = created_at.isoformat() if created_at is not None else now
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                "INSERT INTO journal_entries (title, text, word_count, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (title or "", text, len(text.split()), created, now)
+            )
+            entry_id = cursor.lastrowid
+            self._mark_dirty(connection, created)
+        return self.get(entry_id)
+
+    def get(self, entry_id: int) -> Optional[dict]:
+        with self._connection() as connection:
+            row = connection.execute("SELECT * FROM journal_entries WHERE id = ?", (entry_id,)).fetchone()
+            if row is None:
+                return None
+            return self._with_analyses(connection, [dict(row)])[0]
+
+    def list_entries(self, limit: int = 20, before_id: Optional[int] = None) -> List[dict]:
+        """Newest entries first; pass the last id of a page as `before_id` for the next one"""
+        with self._connection() as connection:
+            rows = connection.execute(
+                "SELECT * FROM journal_entries WHERE id < ? ORDER BY id DESC LIMIT ?",
+                (before_id if before_id is not None else 2 ** 63 - 1, limit)
+            ).fetchall()
+            return self._with_analyses(connection, [dict(row) for row in rows])
+
+    def update(self, entry_id: int, text: Optional[str] = None, title: Optional[str] = None) -> Optional[dict]:
+        with self._transaction() as connection:
+            row = connection.execute(
+                "SELECT text, title, created_at FROM journal_entries WHERE id = ?", (entry_id,)).fetchone()
+            if row is None:
+                return None
+            new_text = row["text"] if text is None else text
+            new_title = row["title"] if title is None else title
+            connection.execute(
+                "UPDATE journal_entries SET title = ?, text = ?, word_count = ?, updated_at = ? WHERE id = ?",
+                (new_title, new_text, len(new_text.split()), datetime.now().isoformat(), entry_id)
+            )
+            if new_text != row["text"] or new_title != row["title"]:
+                self._mark_dirty(connection, row["created_at"])
+            if new_text != row["text"]:
+                connection.execute("DELETE FROM journal_analyses WHERE entry_id = ?", (entry_id,))
+        return self.get(entry_id)
+
+    def delete(self, entry_id: int) -> bool:
+        with self._transaction() as connection:
+            row = connection.execute("SELECT created_at FROM journal_entries WHERE id = ?", (entry_id,)).fetchone()
+            if row is None:
+                return False
+            connection.execute("DELETE FROM journal_entries WHERE id = ?", (entry_id,))
+            self._mark_dirty(connection, row["created_at"])
+            return True
+
+    def search(self, query: str, limit: int = 20) -> List[dict]:
+        """Entries matching every word of `query`, best BM25 match first, with a highlighted snippet"""
+        match = fts_query(query)
+        if not match:
+            return []
+        with self._connection() as connection:
+            rows = connection.execute(
+                "SELECT e.*, bm25(journal_entries_fts) AS rank, "
+                "snippet(journal_entries_fts, 1, '[', ']', '…', 12) AS snippet "
+                "FROM journal_entries_fts JOIN journal_entries e ON e.id = journal_entries_fts.rowid "
+                "WHERE journal_entries_fts MATCH ? ORDER BY rank LIMIT ?",
+                (match, limit)
+            ).fetchall()
+            entries = []
+            for row in rows:
+                entry = dict(row)
+                entry["rank"] = round(-entry["rank"], 4)
+                entries.append(entry)
+            return self._with_analyses(connection, entries)
+
+    def save_analysis(self, entry_id: int, task_type: str, text: str, result: dict) -> bool:
+        """Store a task result for an entry; ignored if the entry is gone or its text has changed"""
+        with self._transaction() as connection:
+            row = connection.execute("SELECT text FROM journal_entries WHERE id = ?", (entry_id,)).fetchone()
+            if row is None or row["text"] != text:
+                return False
+            connection.execute(
+                "INSERT OR REPLACE INTO journal_analyses (entry_id, task_type, text_hash, result, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (entry_id, task_type, text_hash(text), json.dumps(result), datetime.now().isoformat())
+            )
+            return True
+
+    def previews(self, entry_ids: List[int]) -> Dict[int, dict]:
+        """Light entry rows (no stored analyses) keyed by id, with the first 160 characters as preview"""
+        if not entry_ids:
+            return {}
+        with self._connection() as connection:
+            rows = connection.execute(
+                f"SELECT id, title, created_at, word_count, substr(text, 1, 160) AS preview FROM journal_entries "
+                f"WHERE id IN ({','.join('?' * len(entry_ids))})",
+                entry_ids
+            ).fetchall()
+        return {row["id"]: dict(row) for row in rows}
+
+    def texts(self) -> List[tuple]:
+        """(id, text) of every entry, for rebuilding derived indexes"""
+        with self._connection() as connection:
+            return [tuple(row) for row in connection.execute("SELECT id, text FROM journal_entries ORDER BY id")]
+
+    def changed_since(self, updated_at: str) -> List[tuple]:
+        """(id, text) of entries written at or after `updated_at`, for catching up derived indexes"""
+        with self._connection() as connection:
+            return [tuple(row) for row in connection.execute(
+                "SELECT id, text FROM journal_entries WHERE updated_at >= ? ORDER BY updated_at", (updated_at, ))]
+
+    def entry_ids(self) -> Set[int]:
+        with self._connection() as connection:
+            return {row[0] for row in connection.execute("SELECT id FROM journal_entries")}
+
+    def fingerprint(self) -> str:
+        """Changes whenever an entry is added, edited or deleted"""
+        with self._connection() as connection:
+            row = connection.execute(
+                "SELECT COUNT(*), COALESCE(MAX(id), 0), COALESCE(MAX(updated_at), '') FROM journal_entries").fetchone()
+        return ":".join(str(value) for value in row)
+
+    def entries_between(self, start: str, end: str) -> List[dict]:
+        """Entries written on days in [start, end) (ISO dates), oldest first"""
+        with self._connection() as connection:
+            rows = connection.execute(
+                "SELECT * FROM journal_entries WHERE created_at >= ? AND created_at < ? ORDER BY created_at, id",
+                (start, end)
+            ).fetchall()
+            return self._with_analyses(connection, [dict(row) for row in rows])
+
+    def entry_days(self, start: str, end: str) -> List[str]:
+        """Distinct ISO dates in [start, end) that have entries"""
+        with self._connection() as connection:
+            rows = connection.execute(
+                "SELECT DISTINCT substr(created_at, 1, 10) FROM journal_entries "
+                "WHERE created_at >= ? AND created_at < ? ORDER BY 1",
+                (start, end)
+            ).fetchall()
+            return [row[0] for row in rows]
+
+    def _mark_dirty(self, connection: sqlite3.Connection, created_at: str):
+        """Bump the version of every summary node the entry rolls up into"""
+        connection.executemany(
+            "INSERT INTO journal_summary_nodes (level, key) VALUES (?, ?) "
+            "ON CONFLICT (level, key) DO UPDATE SET version = version + 1",
+            ancestors(date.fromisoformat(created_at[:10]))
+        )
+
+    def summary_node(self, level: str, key: str) -> Optional[dict]:
+        with self._connection() as connection:
+            row = connection.execute(
+                "SELECT * FROM journal_summary_nodes WHERE level = ? AND key = ?", (level, key)).fetchone()
+        if row is None or (row["summary"] is None and row["version"] == row["clean_version"]):
+            return None
+        node = dict(row)
+        node["dirty"] = node["version"] != node["clean_version"]
+        return node
+
+    def save_summary_node(self, level: str, key: str, version: int, node: Optional[dict]) -> Optional[dict]:
+        """Store a recomputed node as of `version`; a write in the meantime bumped the version and keeps it dirty.
+
+        `node` is {"summary", "model", "source_hash", "children"}, or None for
+        a period that no longer has entries.
+        """
+        node = node or {"summary": None, "model": None, "source_hash": None, "children": 0}
+        with self._transaction() as connection:
+            connection.execute(
+                "INSERT INTO journal_summary_nodes "
+                "(level, key, version, clean_version, summary, model, source_hash, children, updated_at) "
+                "VALUES (:level, :key, :version, :version, :summary, :model, :source_hash, :children, :updated_at) "
+                "ON CONFLICT (level, key) DO UPDATE SET clean_version = :version, summary = :summary, model = :model, "
+                "source_hash = :source_hash, children = :children, updated_at = :updated_at",
+                {**node, "level": level, "key": key, "version": version, "updated_at": datetime.now().isoformat()}
+            )
+        return self.summary_node(level, key)
+
+    def _with_analyses(self, connection: sqlite3.Connection, entries: List[dict]) -> List[dict]:
+        """Attach current stored analyses to entries with one query for the whole page"""
+        if not entries:
+            return entries
+        ids = [entry["id"] for entry in entries]
+        rows = connection.execute(
+            f"SELECT entry_id, task_type, text_hash, result FROM journal_analyses "
+            f"WHERE entry_id IN ({','.join('?' * len(ids))})",
+            ids
+        ).fetchall()
+        hashes = {entry["id"]: text_hash(entry["text"]) for entry in entries}
+        analyses: Dict[int, dict] = {entry_id: {} for entry_id in ids}
+        for row in rows:
+            if row["text_hash"] == hashes[row["entry_id"]]:
+                analyses[row["entry_id"]][row["task_type"]] = json.loads(row["result"])
+        for entry in entries:
+            entry["analysis"] = analyses[entry["id"]]
+        return entries
+
+    def close(self):
+        with self._lock:
+            while not self._pool.empty():
+                self._pool.get().close()
+            self._opened = 0
+            self._initialized = False
+
+    def stats(self) -> dict:
+        if not self._initialized:
+            return {"path": self.path, "pool_size": self.pool_size, "connections": 0}
+        with self._connection() as connection:
+            entries = connection.execute("SELECT COUNT(*) FROM journal_entries").fetchone()[0]
+            analyses = connection.execute("SELECT COUNT(*) FROM journal_analyses").fetchone()[0]
+            summary_nodes = connection.execute(
+                "SELECT COUNT(*) FROM journal_summary_nodes WHERE summary IS NOT NULL").fetchone()[0]
+            journal_mode = connection.execute("PRAGMA journal_mode").fetchone()[0]
+        return {
+            "path": self.path,
+            "pool_size": self.pool_size,
+            "connections": self._opened,
+            "journal_mode": journal_mode,
+            "entries": entries,
+            "analyses": analyses,
+            "summary_nodes": summary_nodes
+        }
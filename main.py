@@ -1,25 +1,124 @@
 # Railway Production FastAPI Backend - AI Journal Summarizer
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import AfterValidator, BaseModel, Field
 import uvicorn
+import asyncio
+import contextvars
 import os
 from dotenv import load_dotenv
 import json
-from datetime import datetime
+import logging
+import time
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta
 import httpx
-import random
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, AsyncIterator, Awaitable, Callable, Tuple, Annotated, Literal
+from chunking import chunk_text
+from circuit_breaker import build_breakers
+from deadlines import (
+    Deadline, DeadlineExceeded, DeadlineMiddleware, budget_allows, budget_exhausted, current_deadline,
+    deadline_scope, detached, remaining_budget, within_budget
+)
+from extractive_summary import summarize as summarize_extractive
+from hf_cold_start import ColdStartTracker, ModelWarmer, loading_estimate
+from job_queue import JobQueue, JobQueueFull, check_callback_url
+from journal_store import JournalStore
+from metrics import MetricsRegistry, MetricsMiddleware, SharedMetrics
+from model_router import AdaptiveRouter, QUALITY_TIERS
+from rate_limiter import RateLimiter, RateLimitExceeded
+from result_cache import ResultCache, cache_key
+from serving import configured_workers, prepare_workers, worker_count
+from sentiment_lexicon import LexiconSentiment
+from similarity_index import SimilarityIndex
+from singleflight import SingleFlight
+from structured_logging import setup_logging, get_logger, log_event
+from summary_tree import LEVELS as SUMMARY_LEVELS, SummaryTree, period_key
+from theme_index import ThemeIndex
+from token_planner import count_tokens, input_capacity, plan_request
 
 # Load environment variables
 load_dotenv()
 
+# JSON-lines logging through a background writer thread (LOG_LEVEL, LOG_SAMPLE_RATE)
+setup_logging()
+logger = get_logger("service")
+
+# Raw upstream responses are only logged when explicitly enabled
+LOG_UPSTREAM_PAYLOADS = os.getenv("LOG_UPSTREAM_PAYLOADS", "false").lower() == "true"
+
+# Worker processes serving this app (API_WORKERS, see serving.py); per-server budgets are split between them
+SERVER_WORKERS = configured_workers()
+
+# On shutdown, running jobs and upstream calls get this long to finish (open requests get it from uvicorn too)
+SHUTDOWN_DRAIN_SECONDS = float(os.getenv("SHUTDOWN_DRAIN_SECONDS", 20))
+
+# Metrics, served in Prometheus text format at /metrics
+metrics = MetricsRegistry()
+HTTP_REQUESTS = metrics.counter(
+    "journal_api_http_requests_total", "HTTP requests by route, method and status", ["endpoint", "method", "status"])
+HTTP_LATENCY = metrics.histogram(
+    "journal_api_http_request_duration_seconds", "HTTP request latency by route", ["endpoint"])
+HTTP_IN_FLIGHT = metrics.gauge(
+    "journal_api_http_requests_in_flight", "HTTP requests currently being served")
+TASKS = metrics.counter(
+    "journal_api_ai_tasks_total", "AI tasks by task, answering model, provider and source", ["task", "model", "provider", "source"])
+TASK_LATENCY = metrics.histogram(
+    "journal_api_ai_task_duration_seconds", "AI task latency (cache misses) by task, answering model and provider", ["task", "model", "provider"])
+UPSTREAM_RESPONSES = metrics.counter(
+    "journal_api_upstream_responses_total", "Upstream HTTP responses by provider, model and status", ["provider", "model", "status"])
+UPSTREAM_LATENCY = metrics.histogram(
+    "journal_api_upstream_request_duration_seconds", "Upstream call latency by provider and model", ["provider", "model"])
+UPSTREAM_IN_FLIGHT = metrics.gauge(
+    "journal_api_upstream_requests_in_flight", "Upstream calls currently open", ["provider"])
+FALLBACKS = metrics.counter(
+    "journal_api_fallback_served_total", "Local fallback results served in place of model output", ["task", "reason"])
+HF_LOADING_REPLIES = metrics.counter(
+    "journal_api_hf_loading_replies_total", "HuggingFace 503 'model is loading' replies", ["model"])
+HF_COLD_START = metrics.histogram(
+    "journal_api_hf_cold_start_seconds", "Time from a HuggingFace model's first loading reply to its first answer", ["model"],
+    buckets=(1, 5, 10, 20, 30, 45, 60, 120, 300))
+TOKENS = metrics.counter(
+    "journal_api_tokens_total", "Tokens reported by the provider usage field", ["model", "kind"])
+# With several workers, /metrics merges every worker's metrics through SQLite (METRICS_SHARED_PATH)
+shared_metrics = SharedMetrics.from_env(metrics)
+
+try:
+    import h2  # noqa: F401 - enables HTTP/2 in httpx
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the provider clients, load the related-entry index and start the job workers; drain and stop them on shutdown"""
+    await ai_service.start()
+    await asyncio.to_thread(sync_similarity_index)
+    await job_queue.start()
+    if shared_metrics is not None:
+        shared_metrics.start()
+    yield
+    drain_deadline = time.monotonic() + SHUTDOWN_DRAIN_SECONDS
+    await job_queue.close(drain_timeout=SHUTDOWN_DRAIN_SECONDS)
+    await ai_service.close(drain_timeout=max(drain_deadline - time.monotonic(), 0.0))
+    if shared_metrics is not None:
+        await shared_metrics.close()
+    await asyncio.to_thread(similarity_index.save, journal_store.fingerprint())
+    journal_store.close()
+
 app = FastAPI(
     title="AI Journal Summarizer API",
     version="1.0.0",
-    description="AI-powered journal summarizer backend - Railway Production"
+    description="AI-powered journal summarizer backend - Railway Production",
+    lifespan=lifespan
 )
 
+# Client time budgets (X-Deadline-Ms header) bound every upstream call made for the request
+app.add_middleware(DeadlineMiddleware)
+app.add_middleware(MetricsMiddleware, requests=HTTP_REQUESTS, latency=HTTP_LATENCY, in_flight=HTTP_IN_FLIGHT)
+
 # Configure CORS for production
 app.add_middleware(
     CORSMiddleware,
@@ -31,15 +130,32 @@ app.add_middleware(
         "*"  # Temporary for testing - restrict in production
     ],
     allow_credentials=True,
-    allow_methods=["GET", "POST", "OPTIONS"],
+    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+    expose_headers=["Location"],
     allow_headers=["*"],
 )
 
+# Entries longer than this are rejected outright rather than chunked
+MAX_ENTRY_TOKENS = int(os.getenv("MAX_ENTRY_TOKENS", 50000))
+
+def check_entry_size(text: str) -> str:
+    """Request validator: reject entries too long to process even in chunks"""
+    if count_tokens(text) > MAX_ENTRY_TOKENS:
+        raise ValueError(f"Entry exceeds {MAX_ENTRY_TOKENS} estimated tokens")
+    return text
+
+EntryText = Annotated[str, AfterValidator(check_entry_size)]
+
 # Request/Response Models
 class TextProcessRequest(BaseModel):
-    text: str
+    text: EntryText
     task_type: str = "sentiment"
-    model: Optional[str] = "groq-llama3-8b"  # Default model
+    model: Optional[str] = "groq-llama3-8b"  # Default model; "auto" picks one from live stats
+    routing: Optional[str] = None  # "direct" or "hedged"; defaults to ROUTING_MODE
+    quality: Optional[Literal["standard", "high", "best"]] = None  # minimum tier for model="auto"
+    entry_id: Optional[int] = None  # store the result with this journal entry
+    related: int = Field(0, ge=0, le=20)  # also return this many similar past entries
+    deadline_ms: Optional[int] = Field(None, gt=0)  # time budget; same as the X-Deadline-Ms header
 
 class TextProcessResponse(BaseModel):
     result: str
@@ -47,554 +163,1551 @@ class TextProcessResponse(BaseModel):
     confidence: float
     metadata: dict
 
+class AnalyzeRequest(BaseModel):
+    text: EntryText
+    model: Optional[str] = "groq-llama3-8b"
+    quality: Optional[Literal["standard", "high", "best"]] = None
+    deadline_ms: Optional[int] = Field(None, gt=0)
+
+class CombinedAnalysisResponse(BaseModel):
+    sentiment: TextProcessResponse
+    insights: TextProcessResponse
+    summarize: TextProcessResponse
+    metadata: dict
+
+class BatchEntry(BaseModel):
+    text: EntryText
+    id: Optional[str] = None
+
+class BatchRequest(BaseModel):
+    entries: List[BatchEntry]
+    task_types: List[str] = ["sentiment", "insights", "summarize"]
+    model: Optional[str] = "groq-llama3-8b"
+    stream: bool = False  # NDJSON, one line per entry as it completes
+    deadline_ms: Optional[int] = Field(None, gt=0)  # shared by every entry in the batch
+
+class JournalEntryCreate(BaseModel):
+    text: EntryText
+    title: Optional[str] = None
+    created_at: Optional[datetime] = None  # backdate imported entries
+
+class JournalEntryUpdate(BaseModel):
+    text: Optional[EntryText] = None
+    title: Optional[str] = None
+
+class RelatedRequest(BaseModel):
+    text: EntryText
+    k: int = Field(5, ge=1, le=50)
+    exclude_id: Optional[int] = None
+
+class LexiconBatchRequest(BaseModel):
+    entries: List[BatchEntry]
+
+class ThemeBatchRequest(BaseModel):
+    entries: List[BatchEntry]
+    top_k: int = 3
+
+# Bump whenever a prompt template changes so stale cached output is not served
+PROMPT_VERSION = "v1"
+
+# How often a worker waiting on another worker's claimed cache miss checks for the result
+CLAIM_POLL_SECONDS = 0.1
+
+# Set while serving a batch entry: upstream calls then count against their provider's batch cap
+batch_call: contextvars.ContextVar[bool] = contextvars.ContextVar("batch_call", default=False)
+
+FALLBACK_MODEL = "fallback-analysis"
+
+# Model name that asks the adaptive router to choose
+AUTO_MODEL = "auto"
+
+TASK_TYPES = ("sentiment", "insights", "summarize")
+
+# Prompt templates shared by both providers
+PROMPT_TEMPLATES = {
+    "sentiment": """Analyze the emotional tone and sentiment of this journal entry with deep psychological insight.
+
+Journal Entry:
+"{text}"
+
+Provide a detailed sentiment analysis that includes:
+1. Primary emotional state and intensity
+2. Underlying emotional patterns or conflicts
+3. Emotional triggers or catalysts mentioned
+4. Suggestions for emotional wellbeing or reflection
+
+Format your response as a supportive, insightful analysis that helps the person understand their emotional landscape better. Be specific to their actual words and experiences.""",
+    "insights": """As an insightful life coach and psychologist, analyze this journal entry to provide personalized insights that will genuinely help this person grow and understand themselves better.
+
+Journal Entry:
+"{text}"
+
+Provide specific, actionable insights that:
+1. Identify key patterns in their thinking or behavior
+2. Highlight strengths and growth opportunities
+3. Suggest concrete next steps or reflections
+4. Connect their experiences to broader life themes
+
+Be specific to THEIR actual words and situation. Avoid generic advice. Focus on what will be most valuable for their personal development based on what they've shared.""",
+    "summarize": """Create a concise but comprehensive summary of this journal entry that captures the essential experiences, emotions, and insights. Make it useful for the person to quickly recall what happened and how they felt.
+
+Journal Entry:
+"{text}"
+
+Create a summary that:
+1. Captures the main events or experiences
+2. Preserves the emotional core
+3. Highlights any important realizations or decisions
+4. Is about 2-3 sentences but rich in meaningful detail
+
+Focus on what this person would most want to remember about this day/experience."""
+}
+
+# Reply token budgets are sized per request by the token planner (token_planner.OUTPUT_BUDGETS)
+GENERATION_PARAMS = {
+    "sentiment": {"temperature": 0.7},
+    "insights": {"temperature": 0.8},
+    "summarize": {"temperature": 0.6}
+}
+
+TASK_CONFIDENCE = {
+    "groq": {"sentiment": 0.92, "insights": 0.89, "summarize": 0.88},
+    "huggingface": {"sentiment": 0.88, "insights": 0.85, "summarize": 0.82}
+}
+
+# Length of the extractive fallback summary: at most N sentences, or this share of the entry's sentences
+FALLBACK_SUMMARY_SENTENCES = int(os.getenv("FALLBACK_SUMMARY_SENTENCES", 3))
+FALLBACK_SUMMARY_RATIO = float(os.getenv("FALLBACK_SUMMARY_RATIO", 0)) or None
+
+# Upper bound on chunk size for long entries (0 = only the model's context window limits it)
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", 0))
+
+# Replies shorter than this are treated as a failed generation
+MIN_RESPONSE_CHARS = 10
+
+# How many times a 429 is retried (after waiting out Retry-After) before falling back
+RATE_LIMIT_RETRIES = int(os.getenv("RATE_LIMIT_RETRIES", 2))
+
+def estimate_tokens(prompt: str, max_tokens: int) -> int:
+    """Estimated prompt + completion token count, for rate limiting"""
+    return count_tokens(prompt) + max_tokens
+
+
+
+def token_report(plan: dict, usage: dict) -> dict:
+    """Estimated vs provider-reported tokens for response metadata (None where not reported)"""
+    return {
+        "estimated_prompt": plan["prompt_tokens"],
+        "max_output": plan["max_output_tokens"],
+        "prompt": usage.get("prompt_tokens"),
+        "completion": usage.get("completion_tokens")
+    }
+
+class EmptyResponseError(Exception):
+    """Provider answered 200 but with no usable text"""
+
+def fallback_reason(error: Exception) -> str:
+    """Metric label for why a model call degraded to the local fallback"""
+    if isinstance(error, DeadlineExceeded) or (isinstance(error, httpx.TimeoutException) and budget_exhausted()):
+        return "deadline"
+    if isinstance(error, EmptyResponseError):
+        return "short_response"
+    if isinstance(error, ModelLoadingError):
+        return "model_loading"
+    if isinstance(error, ProviderError):
+        return "http_error"
+    if isinstance(error, RateLimitExceeded):
+        return "rate_limited"
+    if isinstance(error, httpx.TimeoutException):
+        return "timeout"
+    return "exception"
+
+class ProviderError(Exception):
+    """Non-200 response from an upstream AI provider"""
+    def __init__(self, provider: str, status_code: int, detail: str = ""):
+        super().__init__(f"{provider} HTTP {status_code}: {detail}")
+        self.provider = provider
+        self.status_code = status_code
+
+class ModelLoadingError(ProviderError):
+    """HuggingFace model still loading past the request's wait budget (not a model failure)"""
+    def __init__(self, model: str, estimated_time: Optional[float]):
+        super().__init__("huggingface", 503, f"{model} is loading (estimated {estimated_time}s)")
+        self.estimated_time = estimated_time
+
+def hf_error(model: str, status_code: int, body: str) -> ProviderError:
+    """ProviderError for a failed HuggingFace reply, distinguishing cold-start loading replies"""
+    estimate = loading_estimate(status_code, body)
+    if estimate is not None:
+        return ModelLoadingError(model, estimate)
+    return ProviderError("huggingface", status_code, body[:500])
+
+def is_fallback(result: dict) -> bool:
+    """True when a result came from the local fallback rather than a model"""
+    return result.get("model") == FALLBACK_MODEL
+
+def provider_http_settings(prefix: str, timeout: float, http2: bool) -> dict:
+    """Connection pool settings for one provider, overridable via <PREFIX>_* env vars"""
+    return {
+        "timeout": float(os.getenv(f"{prefix}_TIMEOUT", timeout)),
+        "connect_timeout": float(os.getenv(f"{prefix}_CONNECT_TIMEOUT", 5.0)),
+        "max_connections": int(os.getenv(f"{prefix}_MAX_CONNECTIONS", 20)),
+        "max_keepalive_connections": int(os.getenv(f"{prefix}_MAX_KEEPALIVE", 10)),
+        "keepalive_expiry": float(os.getenv(f"{prefix}_KEEPALIVE_EXPIRY", 30.0)),
+        "http2": os.getenv(f"{prefix}_HTTP2", str(http2)).lower() == "true" and HTTP2_AVAILABLE
+    }
+
 # Enhanced AI Service with Real Groq Integration
 class EnhancedAIService:
     def __init__(self):
         self.groq_api_key = os.getenv("GROQ_API_KEY")
         self.hf_api_key = os.getenv("HUGGINGFACE_API_KEY")
-        self.groq_base_url = "https://api.groq.com/openai/v1/chat/completions"
-        self.hf_base_url = "https://api-inference.huggingface.co/models"
+        self.groq_base_url = os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1/chat/completions")
+        self.hf_base_url = os.getenv("HF_BASE_URL", "https://api-inference.huggingface.co/models")
         
-        # Debug: Log API key status
-        print(f"🔑 API Keys Status:")
-        print(f"   GROQ_API_KEY: {'✅ Present' if self.groq_api_key else '❌ Missing'}")
-        print(f"   HUGGINGFACE_API_KEY: {'✅ Present' if self.hf_api_key else '❌ Missing'}")
-        if self.hf_api_key:
-            print(f"   HF Key format: {'✅ Valid' if self.hf_api_key.startswith('hf_') else '⚠️ Unusual format'}")
+        # Log API key status (presence only, never the keys)
+        log_event(
+            logger, logging.INFO, "api_keys_status",
+            groq_key_present=bool(self.groq_api_key),
+            hf_key_present=bool(self.hf_api_key),
+            hf_key_format_valid=self.hf_api_key.startswith("hf_") if self.hf_api_key else None
+        )
+        
+        # One long-lived pooled client per provider (created lazily or in the app lifespan)
+        self.http_settings = {
+            "groq": provider_http_settings("GROQ", 30.0, http2=True),
+            "huggingface": provider_http_settings("HF", 45.0, http2=False)
+        }
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        # Upstream requests currently open, waited for by close()
+        self.upstream_calls = 0
+        
+        # Cache of real model output keyed by text hash, task, model and prompt version
+        self.cache = ResultCache.from_env()
+        # Identical requests already in flight share one upstream call (same key as the cache)
+        self.inflight = SingleFlight()
+        # Deadline each in-flight shared call runs under (None = a caller without one joined)
+        self._flight_deadlines: Dict[str, Optional[Deadline]] = {}
+        # Local sentiment scorer used whenever no model answers
+        self.lexicon = LexiconSentiment()
+        # Theme taxonomy matched against the journal text itself
+        self.theme_index = ThemeIndex()
+        # Estimated prompt tokens per task, excluding the entry (filled lazily)
+        self._prompt_overheads: Dict[str, int] = {}
+        
+        # Concurrency caps for batch fan-out, per provider ("local" = no usable provider)
+        self.batch_concurrency = {
+            "groq": int(os.getenv("GROQ_BATCH_CONCURRENCY", 8)),
+            "huggingface": int(os.getenv("HF_BATCH_CONCURRENCY", 4)),
+            "local": int(os.getenv("LOCAL_BATCH_CONCURRENCY", 32))
+        }
+        self._batch_semaphores = {
+            provider: asyncio.Semaphore(limit) for provider, limit in self.batch_concurrency.items()
+        }
+        
+        # Token buckets and concurrency slots in front of every outbound call
+        self.rate_limiter = RateLimiter.from_env(SERVER_WORKERS)
         
         # Available models with their characteristics
+        # ("fallback" is the model served while this one's circuit is open; "context_tokens" is the
+        # input+output window, 4k for HF serverless inference; "quality" is the QUALITY_TIERS level)
         self.models = {
             # Groq Models (Fast inference)
             "groq-llama3-8b": {
                 "name": "llama3-8b-8192",
                 "provider": "groq",
+                "context_tokens": 8192,
+                "quality": 1,
                 "description": "Fast, efficient for quick analysis",
-                "strengths": ["Speed", "Reliability"]
+                "strengths": ["Speed", "Reliability"],
+                "fallback": "hf-mistral-7b"
             },
             "groq-llama3-70b": {
                 "name": "llama3-70b-8192", 
                 "provider": "groq",
+                "context_tokens": 8192,
+                "quality": 3,
                 "description": "Most capable, detailed insights",
-                "strengths": ["Advanced reasoning", "Detailed analysis"]
+                "strengths": ["Advanced reasoning", "Detailed analysis"],
+                "fallback": "groq-llama3-8b"
             },
             "groq-mixtral": {
                 "name": "mixtral-8x7b-32768",
                 "provider": "groq", 
+                "context_tokens": 32768,
+                "quality": 2,
                 "description": "Balanced performance and quality",
-                "strengths": ["Multilingual", "Balanced performance"]
+                "strengths": ["Multilingual", "Balanced performance"],
+                "fallback": "groq-llama3-8b"
             },
             
             # HuggingFace Models (More variety and specialized models)
             "hf-mistral-7b": {
                 "name": "mistralai/Mistral-7B-Instruct-v0.2",
                 "provider": "huggingface",
+                "context_tokens": 4096,
+                "quality": 1,
                 "description": "Powerful 7B model with excellent instruction following",
-                "strengths": ["Instruction following", "Efficiency"]
+                "strengths": ["Instruction following", "Efficiency"],
+                "fallback": "groq-llama3-8b"
             },
             "hf-phi3-medium": {
                 "name": "microsoft/Phi-3-medium-4k-instruct",
                 "provider": "huggingface", 
+                "context_tokens": 4096,
+                "quality": 2,
                 "description": "Microsoft's efficient reasoning model",
-                "strengths": ["Reasoning", "Code understanding"]
+                "strengths": ["Reasoning", "Code understanding"],
+                "fallback": "groq-llama3-8b"
             },
             "hf-gemma-7b": {
                 "name": "google/gemma-1.1-7b-it",
                 "provider": "huggingface",
+                "context_tokens": 4096,
+                "quality": 1,
                 "description": "Google's Gemma model optimized for conversations",
-                "strengths": ["Conversational", "Safety"]
+                "strengths": ["Conversational", "Safety"],
+                "fallback": "groq-llama3-8b"
             },
             "hf-zephyr-7b": {
                 "name": "HuggingFaceH4/zephyr-7b-beta",
                 "provider": "huggingface",
+                "context_tokens": 4096,
+                "quality": 1,
                 "description": "Fine-tuned for helpful, harmless conversations",
-                "strengths": ["Helpfulness", "Safety", "Chat optimization"]
+                "strengths": ["Helpfulness", "Safety", "Chat optimization"],
+                "fallback": "groq-llama3-8b"
             }
         }
+        
+        # One circuit breaker per registered model
+        self.breakers = build_breakers(list(self.models))
+        # Live latency/error/queue scores for model="auto"
+        self.router = AdaptiveRouter.from_env(list(self.models))
+        
+        # Hedged routing: race a second provider if the primary is slow
+        self.routing_mode = os.getenv("ROUTING_MODE", "direct")
+        self.hedge_delay = float(os.getenv("HEDGE_DELAY_SECONDS", 1.5))
+        self.hedge_deadline = float(os.getenv("HEDGE_DEADLINE_SECONDS", 20.0))
+        
+        # Client deadlines: with less budget left than this, tasks skip the model for the local fallback
+        self.deadline_min_seconds = float(os.getenv("DEADLINE_MIN_LLM_SECONDS", 1.0))
+        
+        # HuggingFace cold starts: wait out "model is loading" within a budget, and keep chosen models warm
+        self.cold_starts = ColdStartTracker.from_env()
+        warm_models = [name.strip() for name in os.getenv("HF_WARM_MODELS", "").split(",") if name.strip() in self.models]
+        self.warmer = ModelWarmer(warm_models, float(os.getenv("HF_WARM_INTERVAL_SECONDS", 240)), self._hf_ping, self.cold_starts)
+    
+    def _provider_headers(self, provider: str) -> dict:
+        api_key = self.groq_api_key if provider == "groq" else self.hf_api_key
+        return {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        }
     
-    async def analyze_sentiment(self, text: str, model: str = "groq-llama3-8b") -> dict:
+    def _build_client(self, provider: str) -> httpx.AsyncClient:
+        settings = self.http_settings[provider]
+        return httpx.AsyncClient(
+            headers=self._provider_headers(provider),
+            timeout=httpx.Timeout(settings["timeout"], connect=settings["connect_timeout"]),
+            limits=httpx.Limits(
+                max_connections=settings["max_connections"],
+                max_keepalive_connections=settings["max_keepalive_connections"],
+                keepalive_expiry=settings["keepalive_expiry"]
+            ),
+            http2=settings["http2"]
+        )
+    
+    def _get_client(self, provider: str) -> httpx.AsyncClient:
+        """Return the shared client for a provider, reopening it if it was closed"""
+        client = self._clients.get(provider)
+        if client is None or client.is_closed:
+            client = self._build_client(provider)
+            self._clients[provider] = client
+        return client
+    
+    def _request_timeout(self, provider: str):
+        """Per-call timeouts: the provider's settings, shortened to what is left of the request deadline"""
+        budget = remaining_budget()
+        if budget is None:
+            return httpx.USE_CLIENT_DEFAULT
+        settings = self.http_settings[provider]
+        return httpx.Timeout(min(settings["timeout"], budget), connect=min(settings["connect_timeout"], budget))
+    
+    async def start(self):
+        """Warm up one pooled client per provider and start the HF keep-warm pings"""
+        for provider in self.http_settings:
+            self._get_client(provider)
+        if self.hf_api_key:
+            self.warmer.start()
+    
+    async def close(self, drain_timeout: float = 0.0):
+        """Stop the keep-warm pings, give open upstream calls up to `drain_timeout` seconds, then close all pooled clients"""
+        await self.warmer.close()
+        await self.drain(drain_timeout)
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+        self.cache.close()
+    
+    async def drain(self, timeout: float):
+        """Wait (up to `timeout` seconds) for open upstream calls to finish"""
+        deadline = time.monotonic() + timeout
+        while self.upstream_calls and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if self.upstream_calls:
+            log_event(logger, logging.WARNING, "upstream_drain_timeout", open_calls=self.upstream_calls)
+    
+    def pool_stats(self) -> dict:
+        """Open, idle and waiting connection counts for each provider pool"""
+        stats = {}
+        for provider, settings in self.http_settings.items():
+            client = self._clients.get(provider)
+            pool = getattr(getattr(client, "_transport", None), "_pool", None)
+            connections = list(getattr(pool, "connections", []))
+            waiting = [r for r in getattr(pool, "_requests", []) if r.is_queued()]
+            stats[provider] = {
+                "active": client is not None and not client.is_closed,
+                "open": len(connections),
+                "idle": sum(1 for c in connections if c.is_idle()),
+                "waiting": len(waiting),
+                "limits": settings
+            }
+        return stats
+    
+    async def analyze_sentiment(self, text: str, model: str = "groq-llama3-8b", routing: Optional[str] = None, quality: Optional[str] = None) -> dict:
         """Enhanced sentiment analysis with real AI"""
-        print(f"🎯 Sentiment Analysis Request - Model: {model}, Text length: {len(text)}")
+        return await self.route("sentiment", text, model, routing, quality)
+    
+    async def generate_insights(self, text: str, model: str = "groq-llama3-8b", routing: Optional[str] = None, quality: Optional[str] = None) -> dict:
+        """Generate personal insights with real AI"""
+        return await self.route("insights", text, model, routing, quality)
+    
+    async def summarize_text(self, text: str, model: str = "groq-llama3-8b", routing: Optional[str] = None, quality: Optional[str] = None) -> dict:
+        """Summarize journal entry with real AI"""
+        return await self.route("summarize", text, model, routing, quality)
+    
+    async def route(self, task_type: str, text: str, model: str, routing: Optional[str] = None, quality: Optional[str] = None) -> dict:
+        """Run a task using the requested routing mode (defaults to ROUTING_MODE)"""
+        if model == AUTO_MODEL:
+            chosen = self.auto_model(task_type, text, quality)
+            result = dict(await self.route(task_type, text, chosen, routing))
+            result["routing"] = {**result.get("routing", {}), "auto": chosen, "tier": quality or "standard"}
+            return result
+        if not self._fits(task_type, text, model):
+            target = self._length_target(task_type, text, model)
+            if target is not None:
+                log_event(logger, logging.INFO, "length_reroute", task=task_type, model=model, target=target)
+                result = dict(await self.route(task_type, text, target, routing))
+                result["routing"] = {**result.get("routing", {}), "rerouted_from": model, "reason": "context_length"}
+                return result
+        chunks = self._chunks(task_type, text, model)
+        if len(chunks) > 1:
+            return await self.run_map_reduce(task_type, text, chunks, model, routing)
+        if (routing or self.routing_mode) == "hedged":
+            return await self.run_hedged(task_type, text, model)
+        return await self.run_task(task_type, text, model)
+    
+    def auto_model(self, task_type: str, text: str, quality: Optional[str] = None) -> str:
+        """Fastest healthy model at or above the quality tier, preferring ones the entry fits whole"""
+        tier = quality or "standard"
+        candidates = [
+            name for name, config in self.models.items()
+            if config["quality"] >= QUALITY_TIERS[tier]
+            and self._effective_provider(name) != "local"
+            and self.breakers[name].state != "open"
+        ]
+        fitting = [name for name in candidates if self._fits(task_type, text, name)]
+        return self.router.choose(fitting or candidates, task_type, tier) or "groq-llama3-8b"
+    
+    def _prompt_overhead(self, task_type: str) -> int:
+        """Estimated tokens of a task's prompt without the entry text"""
+        if task_type not in self._prompt_overheads:
+            template = self._combined_prompt("") if task_type == "analyze" else self._prompt(task_type, "")
+            self._prompt_overheads[task_type] = count_tokens(template)
+        return self._prompt_overheads[task_type]
+    
+    def plan(self, task_type: str, text: str, model: str) -> dict:
+        """Token plan for one call: estimated prompt tokens and the reply budget that fits"""
+        input_tokens = count_tokens(text)
+        return plan_request(
+            task_type, input_tokens, self._prompt_overhead(task_type) + input_tokens, self.models[model]["context_tokens"])
+    
+    def _capacity(self, task_type: str, model: str) -> int:
+        return input_capacity(task_type, self._prompt_overhead(task_type), self.models[model]["context_tokens"])
+    
+    def _fits(self, task_type: str, text: str, model: str) -> bool:
+        """Whether the whole entry fits the model's window with the task's full reply budget"""
+        if self._effective_provider(model) == "local":
+            return True  # local fallbacks take any length
+        return count_tokens(text) <= self._capacity(task_type, model)
+    
+    def _length_target(self, task_type: str, text: str, model: str) -> Optional[str]:
+        """Smallest-window usable model that fits an entry too long for `model`"""
+        candidates = [
+            name for name, config in self.models.items()
+            if name != model
+            and config["context_tokens"] > self.models[model]["context_tokens"]
+            and self._effective_provider(name) != "local"
+            and self.breakers[name].state != "open"
+            and self._fits(task_type, text, name)
+        ]
+        return min(candidates, key=lambda name: self.models[name]["context_tokens"], default=None)
+    
+    def _chunks(self, task_type: str, text: str, model: str) -> List[str]:
+        """The entry split to fit the model's context window next to the prompt and reply"""
+        if self._effective_provider(model) == "local":
+            return [text]
+        budget = self._capacity(task_type, model)
+        if CHUNK_MAX_TOKENS:
+            budget = min(budget, CHUNK_MAX_TOKENS)
+        return chunk_text(text, budget)
+    
+    async def run_map_reduce(self, task_type: str, text: str, chunks: List[str], model: str, routing: Optional[str] = None) -> dict:
+        """Run a task over each chunk concurrently and merge the chunk results.
+        
+        Chunks go through the normal cache and coalescing path, so an edited
+        entry only re-runs the chunks whose text changed. The merged result is
+        cached under the whole entry once every chunk came from the requested model.
+        """
+        key = cache_key(task_type, text, model, PROMPT_VERSION)
+        cached = await self._cache_get(key)
+        if cached is not None:
+            TASKS.inc(task_type, model, self._provider_label(cached), "cache")
+            return {**cached, "cached": True}
+        
+        log_event(logger, logging.INFO, "map_reduce", task=task_type, model=model, chunks=len(chunks), text_length=len(text))
+        results = await asyncio.gather(*(self.route(task_type, chunk, model, routing) for chunk in chunks))
+        merged = await self._reduce_chunks(task_type, text, chunks, results, model, routing)
+        
+        if merged["model"] == model and not merged.get("deadline_exceeded"):
+            await self._cache_io(self.cache.put, key, merged)
+        return merged
+    
+    async def _reduce_chunks(self, task_type: str, text: str, chunks: List[str], results: List[dict], model: str, routing: Optional[str]) -> dict:
+        """Merge per-chunk results: length-weighted sentiment vote, ranked themes, summary of summaries"""
+        weights = [len(chunk.split()) or 1 for chunk in chunks]
+        bodies = [result["result"].split(" ", 1)[-1] for result in results]
+        models = [result["model"] for result in results]
+        merged = {
+            "confidence": round(sum(w * r["confidence"] for w, r in zip(weights, results)) / sum(weights), 3),
+            "chunks": len(chunks)
+        }
+        parts = "\n\n".join(f"Part {i + 1}: {body}" for i, body in enumerate(bodies))
+        
+        if task_type == "sentiment":
+            votes: Dict[str, int] = {}
+            for weight, result in zip(weights, results):
+                votes[result.get("sentiment", "neutral")] = votes.get(result.get("sentiment", "neutral"), 0) + weight
+            merged["sentiment"] = max(votes, key=votes.get)
+            merged["result"] = f"✨ {parts}"
+        elif task_type == "insights":
+            ranked: Dict[str, int] = {}
+            for result in results:
+                for position, theme in enumerate(result.get("themes", [])):
+                    ranked[theme] = ranked.get(theme, 0) + 3 - position
+            merged["themes"] = sorted(ranked, key=ranked.get, reverse=True)[:3]
+            merged["result"] = f"🧠 {parts}"
+        else:
+            # Reduce step: summarize the concatenated chunk summaries
+            final = await self.route("summarize", " ".join(bodies), model, routing)
+            models.append(final["model"])
+            results = results + [final]
+            summary = final["result"].split(" ", 1)[-1]
+            merged.update({
+                "result": f"📝 {summary}",
+                "original_length": len(text.split()),
+                "summary_length": len(summary.split())
+            })
+        
+        merged["model"] = models[0] if len(set(models)) == 1 else "mixed"
+        merged["chunk_models"] = models[:len(chunks)]
+        if any(result.get("deadline_exceeded") for result in results):
+            merged["deadline_exceeded"] = True
+        return merged
+    
+    async def run_task(self, task_type: str, text: str, model: str) -> dict:
+        """Serve a task from the result cache, calling the model on a miss"""
+        key = cache_key(task_type, text, model, PROMPT_VERSION)
+        cached = await self._cache_get(key)
+        if cached is not None:
+            TASKS.inc(task_type, model, self._provider_label(cached), "cache")
+            return {**cached, "cached": True}
+        
+        if self._effective_provider(model) != "local" and not budget_allows(self.deadline_min_seconds):
+            log_event(logger, logging.INFO, "deadline_short_circuit", task=task_type, model=model, remaining=remaining_budget())
+            result = self._fallback(task_type, text, "deadline")
+            TASKS.inc(task_type, result["model"], "local", "fallback")
+            return result
         
+        result = await self._await_shared(key, lambda: self._compute_task(key, task_type, text, model))
+        return dict(result) if result is not None else self._fallback(task_type, text, "deadline")
+    
+    async def _await_shared(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Join the coalesced call for `key`, waiting no longer than this caller's own deadline (None once it runs out).
+        
+        The shared call runs under the loosest deadline of the callers that
+        joined it, so its upstream timeouts and retries still follow the
+        request budgets without one caller's short budget cutting it short
+        for the others.
+        """
+        budget = remaining_budget()
+        if budget is None:
+            return await self._join_shared(key, compute)
         try:
-            if model in self.models:
-                print(f"🔍 Model found in registry: {model}")
-                if self.models[model]["provider"] == "groq" and self.groq_api_key:
-                    print(f"✅ Using Groq API for {model}")
-                    return await self._groq_sentiment(text, model)
-                elif self.models[model]["provider"] == "huggingface" and self.hf_api_key:
-                    print(f"✅ Using HuggingFace API for {model}")
-                    return await self._hf_sentiment(text, model)
-                else:
-                    print(f"⚠️ No valid API key for {model} provider: {self.models[model]['provider']}")
-                    print(f"   Groq key present: {bool(self.groq_api_key)}")
-                    print(f"   HF key present: {bool(self.hf_api_key)}")
-                    return self._fallback_sentiment(text)
-            else:
-                print(f"❌ Model not found in registry: {model}")
-                return self._fallback_sentiment(text)
-        except Exception as e:
-            print(f"❌ AI service error in analyze_sentiment: {e}")
-            import traceback
-            traceback.print_exc()
-            return self._fallback_sentiment(text)
+            return await asyncio.wait_for(self._join_shared(key, compute), budget)
+        except asyncio.TimeoutError:
+            return None
     
-    async def generate_insights(self, text: str, model: str = "groq-llama3-8b") -> dict:
-        """Generate personal insights with real AI"""
+    async def _join_shared(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        caller = current_deadline()
+        if self.inflight.running(key):
+            shared = self._flight_deadlines.get(key)
+            if shared is not None:
+                shared.extend(caller)
+            return await self.inflight.do(key, compute)
+        shared = Deadline(caller.remaining()) if caller is not None else None
+        self._flight_deadlines[key] = shared
+        try:
+            return await self.inflight.do(key, lambda: self._run_shared(key, shared, compute))
+        finally:
+            # A call cancelled before it started never reaches _run_shared's cleanup
+            if not self.inflight.running(key):
+                self._flight_deadlines.pop(key, None)
+    
+    async def _run_shared(self, key: str, deadline: Optional[Deadline], compute: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            return await detached(compute(), deadline)
+        finally:
+            self._flight_deadlines.pop(key, None)
+    
+    def _provider_label(self, result: dict) -> str:
+        return self.models.get(result.get("model"), {}).get("provider", "local")
+    
+    async def _compute_task(self, key: str, task_type: str, text: str, model: str) -> dict:
+        cached = await self._claim(key)
+        if cached is not None:
+            TASKS.inc(task_type, model, self._provider_label(cached), "cache")
+            return {**cached, "cached": True}
+        try:
+            started = time.perf_counter()
+            result = await self._call_model(task_type, text, model)
+            provider = self._provider_label(result)
+            TASK_LATENCY.observe(task_type, result["model"], provider, value=time.perf_counter() - started)
+            TASKS.inc(task_type, result["model"], provider, "fallback" if is_fallback(result) else "model")
+            # Only cache real output from the requested model (not failover or deadline-degraded answers)
+            if not is_fallback(result) and result.get("model") == model and not result.get("deadline_exceeded"):
+                await self._cache_io(self.cache.put, key, result)
+            return result
+        finally:
+            await self._cache_io(self.cache.release, key)
+    
+    async def _cache_get(self, key: str) -> Optional[dict]:
+        """Result cache lookup; only memory misses that must read the SQLite tier go to a worker thread"""
+        cached = self.cache.get(key, memory_only=True)
+        if cached is None and self.cache.persistent:
+            cached = await asyncio.to_thread(self.cache.get, key)
+        return cached
+    
+    async def _cache_io(self, method: Callable[..., Any], *args) -> Any:
+        """Result cache call that may touch the SQLite tier, kept off the event loop when it does"""
+        if not self.cache.persistent:
+            return method(*args)
+        return await asyncio.to_thread(method, *args)
+    
+    async def _claim(self, key: str) -> Optional[dict]:
+        """Claim a cache miss across worker processes.
+        
+        While another worker is computing the same key, wait for it and
+        return its cached result; None means this worker should compute it
+        (it holds the claim, or the other worker produced nothing cacheable).
+        """
+        while not await self._cache_io(self.cache.claim, key):
+            while await self._cache_io(self.cache.claimed, key):
+                await asyncio.sleep(CLAIM_POLL_SECONDS)
+            cached = await self._cache_get(key)
+            if cached is not None:
+                return cached
+        return None
+    
+    def _effective_provider(self, model: str) -> str:
+        """Provider a request for this model will actually reach"""
+        provider = self.models.get(model, {}).get("provider")
+        if provider == "groq" and self.groq_api_key:
+            return "groq"
+        if provider == "huggingface" and self.hf_api_key:
+            return "huggingface"
+        return "local"
+    
+    async def run_batch_task(self, task_type: str, text: str, model: str) -> dict:
+        """Direct-routed task bounded by the batch concurrency cap of whichever provider serves it.
+        
+        Provider caps are taken per upstream call (see _batch_slot), so calls
+        rerouted or failed over to another provider count against that one.
+        """
+        if model == AUTO_MODEL:
+            model = self.auto_model(task_type, text)
+        token = batch_call.set(True)
+        try:
+            if self._effective_provider(model) == "local":
+                async with self._batch_semaphores["local"]:
+                    return await self.route(task_type, text, model, "direct")
+            return await self.route(task_type, text, model, "direct")
+        finally:
+            batch_call.reset(token)
+    
+    @asynccontextmanager
+    async def _batch_slot(self, provider: str):
+        """Hold the provider's batch concurrency slot when the call belongs to a batch"""
+        if not batch_call.get():
+            yield
+            return
+        async with self._batch_semaphores[provider]:
+            yield
+    
+    async def _call_model(self, task_type: str, text: str, model: str, failover: bool = True) -> dict:
+        """Route a task to its provider, degrading to the local fallback"""
+        log_event(logger, logging.DEBUG, "task_request", task=task_type, model=model, text_length=len(text))
+        
         try:
             if model in self.models:
-                if self.models[model]["provider"] == "groq" and self.groq_api_key:
-                    return await self._groq_insights(text, model)
-                elif self.models[model]["provider"] == "huggingface" and self.hf_api_key:
-                    return await self._hf_insights(text, model)
-                else:
-                    return self._fallback_insights(text)
+                provider = self._effective_provider(model)
+                if provider == "local":
+                    log_event(logger, logging.INFO, "no_api_key", model=model, provider=self.models[model]["provider"])
+                    return self._fallback(task_type, text, "no_key")
+                # The slot is taken before the breaker so waiting for it never holds a half-open probe
+                async with self._batch_slot(provider):
+                    if self.breakers[model].allow():
+                        return await self._tracked_task(task_type, text, model, provider)
+                return await self._short_circuit(task_type, text, model, failover)
             else:
-                return self._fallback_insights(text)
+                log_event(logger, logging.WARNING, "unknown_model", model=model)
+                return self._fallback(task_type, text, "unknown_model")
         except Exception as e:
-            return self._fallback_insights(text)
+            logger.exception("task_error", extra={"fields": {"task": task_type, "model": model}})
+            return self._fallback(task_type, text, "exception")
     
-    async def summarize_text(self, text: str, model: str = "groq-llama3-8b") -> dict:
-        """Summarize journal entry with real AI"""
+    async def _tracked_task(self, task_type: str, text: str, model: str, provider: str) -> dict:
+        """Provider call with its queue depth, latency and outcome fed to the adaptive router"""
+        started = time.perf_counter()
+        self.router.started(model)
         try:
-            if model in self.models:
-                if self.models[model]["provider"] == "groq" and self.groq_api_key:
-                    return await self._groq_summarize(text, model)
-                elif self.models[model]["provider"] == "huggingface" and self.hf_api_key:
-                    return await self._hf_summarize(text, model)
-                else:
-                    return self._fallback_summarize(text)
+            if provider == "groq":
+                result = await self._groq_task(task_type, text, model)
             else:
-                return self._fallback_summarize(text)
-        except Exception as e:
-            return self._fallback_summarize(text)
+                result = await self._hf_task(task_type, text, model)
+        finally:
+            self.router.finished(model)
+        # Running out of the client's budget says nothing about the model
+        if not result.get("deadline_exceeded"):
+            self.router.record(model, time.perf_counter() - started, ok=not is_fallback(result))
+        return result
     
-    async def _groq_sentiment(self, text: str, model: str) -> dict:
-        """Real Groq-powered sentiment analysis"""
-        prompt = f"""Analyze the emotional tone and sentiment of this journal entry with deep psychological insight.
-
-Journal Entry:
-"{text}"
-
-Provide a detailed sentiment analysis that includes:
-1. Primary emotional state and intensity
-2. Underlying emotional patterns or conflicts
-3. Emotional triggers or catalysts mentioned
-4. Suggestions for emotional wellbeing or reflection
-
-Format your response as a supportive, insightful analysis that helps the person understand their emotional landscape better. Be specific to their actual words and experiences."""
-
+    def _hedge_target(self, model: str) -> Optional[str]:
+        """Usable model on a different provider to race against `model`"""
+        provider = self.models.get(model, {}).get("provider")
+        candidates = [self.models.get(model, {}).get("fallback")] + list(self.models)
+        for candidate in candidates:
+            if (
+                candidate in self.models
+                and self.models[candidate]["provider"] != provider
+                and self._effective_provider(candidate) != "local"
+                and self.breakers[candidate].state == "closed"
+            ):
+                return candidate
+        return None
+    
+    async def run_hedged(self, task_type: str, text: str, model: str) -> dict:
+        """Race a hedge request on another provider if `model` is slow to answer.
+        
+        The hedge fires after hedge_delay; the first non-fallback answer wins
+        and the other request is cancelled. If nothing good arrives before
+        hedge_deadline the local fallback is served.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + within_budget(self.hedge_deadline)
+        hedge_model = self._hedge_target(model)
+        routing = {"mode": "hedged", "primary": model, "hedge": None}
+        
+        pending = {asyncio.create_task(self.run_task(task_type, text, model)): model}
+        hedge_at = loop.time() + self.hedge_delay
+        last_result = None
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    self.groq_base_url,
-                    headers={
-                        "Authorization": f"Bearer {self.groq_api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": self.models[model]["name"],
-                        "messages": [{"role": "user", "content": prompt}],
-                        "temperature": 0.7,
-                        "max_tokens": 300
-                    }
+            while pending:
+                hedge_pending = hedge_model is not None and routing["hedge"] is None
+                wake_at = min(hedge_at, deadline) if hedge_pending else deadline
+                done, _ = await asyncio.wait(
+                    pending, timeout=max(wake_at - loop.time(), 0), return_when=asyncio.FIRST_COMPLETED
                 )
+                for task in done:
+                    pending.pop(task)
+                    result = task.result()
+                    if not is_fallback(result):
+                        return {**result, "routing": {**routing, "winner": result.get("model")}}
+                    last_result = result
                 
-                result = response.json()
-                ai_response = result["choices"][0]["message"]["content"]
-                
-                # Extract sentiment polarity
-                sentiment = "neutral"
-                if any(word in ai_response.lower() for word in ["positive", "happy", "joy", "excited", "optimistic"]):
-                    sentiment = "positive"
-                elif any(word in ai_response.lower() for word in ["negative", "sad", "angry", "frustrated", "anxious"]):
-                    sentiment = "negative"
-                
-                return {
-                    "result": f"✨ {ai_response}",
-                    "confidence": 0.92,
-                    "sentiment": sentiment,
-                    "model": model
-                }
-                
+                if loop.time() >= deadline:
+                    log_event(logger, logging.WARNING, "hedge_deadline_exceeded", task=task_type, model=model, deadline=self.hedge_deadline)
+                    routing["deadline_exceeded"] = True
+                    break
+                if hedge_pending and (loop.time() >= hedge_at or not pending):
+                    log_event(logger, logging.INFO, "hedge_fired", task=task_type, model=model, hedge_model=hedge_model)
+                    routing["hedge"] = hedge_model
+                    pending[asyncio.create_task(self.run_task(task_type, text, hedge_model))] = hedge_model
+        finally:
+            for task in pending:
+                task.cancel()
+        
+        result = last_result or self._fallback(task_type, text, "deadline")
+        return {**result, "routing": {**routing, "winner": result.get("model")}}
+    
+    def _circuit_fallback(self, model: str) -> Optional[str]:
+        """Configured fallback model for a model whose circuit is open, if usable"""
+        target = self.models[model].get("fallback")
+        if target in self.models and target != model and self._effective_provider(target) != "local":
+            return target
+        return None
+    
+    async def _short_circuit(self, task_type: str, text: str, model: str, failover: bool) -> dict:
+        """Serve a task without calling an open-circuit model"""
+        target = self._circuit_fallback(model) if failover else None
+        log_event(logger, logging.INFO, "circuit_short_circuit", task=task_type, model=model, target=target or FALLBACK_MODEL)
+        if target:
+            return await self._call_model(task_type, text, target, failover=False)
+        return self._fallback(task_type, text, "circuit_open")
+    
+    def _record_outcome(self, model: str, error: Optional[Exception] = None):
+        """Feed a call outcome into the model's circuit breaker"""
+        breaker = self.breakers[model]
+        if error is None:
+            breaker.record_success()
+        elif (
+            isinstance(error, (RateLimitExceeded, ModelLoadingError))
+            or (isinstance(error, ProviderError) and error.status_code == 429)
+            or fallback_reason(error) == "deadline"
+        ):
+            breaker.record_ignored()
+        else:
+            breaker.record_failure(timeout=isinstance(error, httpx.TimeoutException))
+    
+    async def analyze_all(self, text: str, model: str = "groq-llama3-8b", quality: Optional[str] = None) -> dict:
+        """Sentiment, insights and summary from one structured-output call.
+        
+        Falls back to running the three task methods concurrently when the
+        model is unavailable or its reply is not in the combined format.
+        """
+        if model == AUTO_MODEL:
+            model = self.auto_model("analyze", text, quality)
+        key = cache_key("analyze", text, model, PROMPT_VERSION)
+        cached = await self._cache_get(key)
+        if cached is not None:
+            return {**cached, "cached": True}
+        
+        # Entries too long for one combined prompt are chunked per task instead
+        if len(self._chunks("analyze", text, model)) == 1 and budget_allows(self.deadline_min_seconds):
+            combined = await self._await_shared(key, lambda: self._compute_combined(key, text, model))
+            if combined is not None:
+                return dict(combined)
+        
+        sentiment, insights, summary = await asyncio.gather(
+            self.analyze_sentiment(text, model),
+            self.generate_insights(text, model),
+            self.summarize_text(text, model)
+        )
+        return {"sentiment": sentiment, "insights": insights, "summarize": summary, "combined": False}
+    
+    async def _compute_combined(self, key: str, text: str, model: str) -> Optional[dict]:
+        cached = await self._claim(key)
+        if cached is not None:
+            return {**cached, "cached": True}
+        try:
+            return await self._combined_call(key, text, model)
+        finally:
+            await self._cache_io(self.cache.release, key)
+    
+    async def _combined_call(self, key: str, text: str, model: str) -> Optional[dict]:
+        combined = None
+        try:
+            provider = self._effective_provider(model)
+            if provider != "local" and self.breakers[model].allow():
+                if provider == "groq":
+                    combined = await self._groq_combined(text, model)
+                else:
+                    combined = await self._hf_combined(text, model)
         except Exception as e:
-            print(f"Groq API error: {e}")
-            return self._fallback_sentiment(text)
+            log_event(logger, logging.WARNING, "combined_error", model=model, error=str(e))
+        
+        if combined is not None:
+            combined["combined"] = True
+            await self._cache_io(self.cache.put, key, combined)
+        return combined
     
-    async def _groq_insights(self, text: str, model: str) -> dict:
-        """Real Groq-powered insights"""
-        prompt = f"""As an insightful life coach and psychologist, analyze this journal entry to provide personalized insights that will genuinely help this person grow and understand themselves better.
+    def _combined_prompt(self, text: str) -> str:
+        return f"""Analyze this journal entry with deep psychological insight, as a supportive life coach and psychologist.
 
 Journal Entry:
 "{text}"
 
-Provide specific, actionable insights that:
-1. Identify key patterns in their thinking or behavior
-2. Highlight strengths and growth opportunities
-3. Suggest concrete next steps or reflections
-4. Connect their experiences to broader life themes
-
-Be specific to THEIR actual words and situation. Avoid generic advice. Focus on what will be most valuable for their personal development based on what they've shared."""
+Respond with ONLY a JSON object in exactly this format:
+{{
+  "sentiment": {{
+    "label": "positive" | "negative" | "neutral",
+    "analysis": "Primary emotional state, underlying patterns, triggers and suggestions for emotional wellbeing"
+  }},
+  "insights": {{
+    "themes": ["up to 3 short life themes, e.g. growth, relationships, career"],
+    "analysis": "Specific, actionable insights on patterns, strengths, growth opportunities and next steps"
+  }},
+  "summary": "A 2-3 sentence summary capturing the main events, emotional core and important realizations"
+}}
 
+Be specific to THEIR actual words and situation. Avoid generic advice."""
+    
+    def _parse_combined(self, ai_response: str, text: str, model: str, confidence: float, tokens: dict) -> Optional[dict]:
+        """Turn a combined JSON reply into the three per-task result dicts, or None if malformed"""
+        start, end = ai_response.find("{"), ai_response.rfind("}")
+        if start == -1 or end <= start:
+            return None
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    self.groq_base_url,
-                    headers={
-                        "Authorization": f"Bearer {self.groq_api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": self.models[model]["name"],
-                        "messages": [{"role": "user", "content": prompt}],
-                        "temperature": 0.8,
-                        "max_tokens": 350
-                    }
-                )
-                
-                result = response.json()
-                ai_response = result["choices"][0]["message"]["content"]
-                
-                # Extract themes from response
-                themes = []
-                common_themes = ["growth", "relationships", "career", "self-care", "goals", "emotions", "challenges", "reflection"]
-                for theme in common_themes:
-                    if theme in ai_response.lower():
-                        themes.append(theme)
-                
-                return {
-                    "result": f"🧠 {ai_response}",
-                    "confidence": 0.89,
-                    "themes": themes[:3],  # Top 3 themes
-                    "model": model
-                }
-                
+            data = json.loads(ai_response[start:end + 1])
+            sentiment_data = data["sentiment"]
+            insights_data = data["insights"]
+            summary = str(data["summary"]).strip()
+            sentiment_text = str(sentiment_data["analysis"]).strip()
+            insights_text = str(insights_data["analysis"]).strip()
+        except (ValueError, KeyError, TypeError):
+            return None
+        if not (summary and sentiment_text and insights_text):
+            return None
+        
+        label = str(sentiment_data.get("label", "neutral")).lower()
+        if label not in ("positive", "negative", "neutral"):
+            label = "neutral"
+        themes = [str(theme).lower() for theme in insights_data.get("themes", []) if theme][:3]
+        if not themes:
+            themes = self._entry_themes(text)
+        
+        return {
+            "sentiment": {
+                "result": f"✨ {sentiment_text}",
+                "confidence": confidence,
+                "sentiment": label,
+                "model": model,
+                "tokens": tokens
+            },
+            "insights": {
+                "result": f"🧠 {insights_text}",
+                "confidence": confidence,
+                "themes": themes,
+                "model": model,
+                "tokens": tokens
+            },
+            "summarize": {
+                "result": f"📝 {summary}",
+                "confidence": confidence,
+                "original_length": len(text.split()),
+                "summary_length": len(summary.split()),
+                "model": model,
+                "tokens": tokens
+            }
+        }
+    
+    async def _groq_combined(self, text: str, model: str) -> Optional[dict]:
+        """All three analyses from one Groq call using JSON mode"""
+        plan = self.plan("analyze", text, model)
+        try:
+            ai_response, usage = await self._groq_complete(
+                self._combined_prompt(text), model, temperature=0.7, max_tokens=plan["max_output_tokens"],
+                response_format={"type": "json_object"}
+            )
+        except asyncio.CancelledError:
+            self.breakers[model].record_ignored()
+            raise
         except Exception as e:
-            print(f"Groq API error: {e}")
-            return self._fallback_insights(text)
+            log_event(logger, logging.WARNING, "upstream_error", provider="groq", model=model, task="analyze", error=str(e))
+            self._record_outcome(model, e)
+            return None
+        self._record_outcome(model)
+        return self._parse_combined(ai_response, text, model, 0.9, token_report(plan, usage))
     
-    async def _groq_summarize(self, text: str, model: str) -> dict:
-        """Real Groq-powered summarization"""
-        word_count = len(text.split())
-        
-        prompt = f"""Create a concise but comprehensive summary of this journal entry that captures the essential experiences, emotions, and insights. Make it useful for the person to quickly recall what happened and how they felt.
-
-Journal Entry:
-"{text}"
-
-Create a summary that:
-1. Captures the main events or experiences
-2. Preserves the emotional core
-3. Highlights any important realizations or decisions
-4. Is about 2-3 sentences but rich in meaningful detail
-
-Focus on what this person would most want to remember about this day/experience."""
-
+    async def _hf_combined(self, text: str, model: str) -> Optional[dict]:
+        """All three analyses from one HuggingFace generation, parsed from JSON"""
+        plan = self.plan("analyze", text, model)
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    self.groq_base_url,
-                    headers={
-                        "Authorization": f"Bearer {self.groq_api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": self.models[model]["name"],
-                        "messages": [{"role": "user", "content": prompt}],
-                        "temperature": 0.6,
-                        "max_tokens": 200
-                    }
-                )
-                
-                result = response.json()
-                ai_response = result["choices"][0]["message"]["content"]
-                summary_length = len(ai_response.split())
-                
-                return {
-                    "result": f"📝 {ai_response}",
-                    "confidence": 0.88,
-                    "original_length": word_count,
-                    "summary_length": summary_length,
-                    "model": model
-                }
-                
+            ai_response, usage = await self._hf_generate(
+                self._combined_prompt(text), model, temperature=0.7, max_tokens=plan["max_output_tokens"])
+        except asyncio.CancelledError:
+            self.breakers[model].record_ignored()
+            raise
         except Exception as e:
-            print(f"Groq API error: {e}")
-            return self._fallback_summarize(text)
+            log_event(logger, logging.WARNING, "upstream_error", provider="huggingface", model=model, task="analyze", error=str(e))
+            self._record_outcome(model, e)
+            return None
+        self._record_outcome(model)
+        return self._parse_combined(ai_response, text, model, 0.85, token_report(plan, usage))
     
-    # HuggingFace API Methods
-    async def _hf_sentiment(self, text: str, model: str) -> dict:
-        """HuggingFace-powered sentiment analysis"""
-        prompt = f"""Analyze the emotional tone and sentiment of this journal entry with deep psychological insight.
-
-Journal Entry:
-"{text}"
-
-Provide a detailed sentiment analysis that includes:
-1. Primary emotional state and intensity
-2. Underlying emotional patterns or conflicts
-3. Emotional triggers or catalysts mentioned
-4. Suggestions for emotional wellbeing or reflection
-
-Format your response as a supportive, insightful analysis that helps the person understand their emotional landscape better. Be specific to their actual words and experiences."""
-
+    # Provider calls
+    async def _send(
+        self, provider: str, model: str, url: str, payload: dict, estimated_tokens: int,
+        max_loading_wait: Optional[float] = None
+    ) -> httpx.Response:
+        """POST through the model's rate limiter, waiting out 429s and HF cold starts instead of failing.
+        
+        Every wait and timeout is capped by the request deadline, and no
+        attempt starts with less than deadline_min_seconds of it left.
+        """
+        limiter = self.rate_limiter.for_model(provider, model)
+        loading_deadline = self._loading_deadline(provider, model, max_loading_wait)
+        attempt = 0
+        while True:
+            self._check_budget(model)
+            async with self._limiter_slot(limiter, estimated_tokens):
+                UPSTREAM_IN_FLIGHT.inc(provider)
+                self.upstream_calls += 1
+                started = time.perf_counter()
+                try:
+                    response = await self._get_client(provider).post(url, json=payload, timeout=self._request_timeout(provider))
+                finally:
+                    self.upstream_calls -= 1
+                    UPSTREAM_IN_FLIGHT.dec(provider)
+                    UPSTREAM_LATENCY.observe(provider, model, value=time.perf_counter() - started)
+            UPSTREAM_RESPONSES.inc(provider, model, str(response.status_code))
+            limiter.observe(response.status_code, response.headers)
+            if response.status_code == 429 and attempt < RATE_LIMIT_RETRIES:
+                attempt += 1
+                log_event(logger, logging.WARNING, "upstream_rate_limited", provider=provider, model=model, attempt=attempt)
+                continue
+            if provider == "huggingface":
+                delay = self._cold_start_delay(model, response.status_code, response.text, loading_deadline)
+                if delay is not None:
+                    await asyncio.sleep(delay)
+                    continue
+            return response
+    
+    def _loading_deadline(self, provider: str, model: str, max_loading_wait: Optional[float]) -> float:
+        """Monotonic time until which a call may wait for a loading HF model; fails fast if it cannot be ready by then"""
+        wait = self.cold_starts.max_wait if max_loading_wait is None else max_loading_wait
+        deadline = time.monotonic() + wait
+        if provider == "huggingface" and self.cold_starts.too_slow(model, deadline):
+            raise ModelLoadingError(model, None)
+        budget = remaining_budget()
+        if budget is not None and budget < wait:
+            deadline = time.monotonic() + budget
+            if provider == "huggingface" and self.cold_starts.too_slow(model, deadline):
+                raise DeadlineExceeded(f"{model} is loading and will not be ready within the request deadline")
+        return deadline
+    
+    def _check_budget(self, model: str):
+        """Fail an upstream attempt up front when too little of the request deadline is left for it"""
+        if not budget_allows(self.deadline_min_seconds):
+            raise DeadlineExceeded(f"less than {self.deadline_min_seconds}s of the request deadline left for {model}")
+    
+    @asynccontextmanager
+    async def _limiter_slot(self, limiter, estimated_tokens: int):
+        """Rate limiter slot, waiting for it no longer than the request deadline allows"""
+        budget = remaining_budget()
+        capped = budget is not None and budget < limiter.max_wait
         try:
-            print(f"🔍 HF Sentiment Analysis - Model: {model}")
-            print(f"🔍 HF API Key present: {bool(self.hf_api_key)}")
-            print(f"🔍 Model config: {self.models.get(model, 'Unknown')}")
-            print(f"🔍 HF Base URL: {self.hf_base_url}")
-            print(f"🔍 Full model URL: {self.hf_base_url}/{self.models[model]['name']}")
+            async with limiter.slot(estimated_tokens, max_wait=budget if capped else None):
+                yield
+        except RateLimitExceeded as e:
+            if not capped:
+                raise
+            raise DeadlineExceeded(f"no rate limit budget within the request deadline: {e}") from e
+    
+    def _cold_start_delay(self, model: str, status_code: int, body: str, deadline: float) -> Optional[float]:
+        """Seconds to wait before retrying a HF reply that says the model is loading (None = use the reply as is)"""
+        estimate = loading_estimate(status_code, body)
+        if estimate is None:
+            if status_code == 200:
+                cold_start = self.cold_starts.record_ready(model)
+                if cold_start is not None:
+                    HF_COLD_START.observe(model, value=cold_start)
+                    log_event(logger, logging.INFO, "hf_model_ready", model=model, cold_start_seconds=round(cold_start, 2))
+            return None
+        HF_LOADING_REPLIES.inc(model)
+        self.cold_starts.record_loading(model, estimate)
+        return self.cold_starts.retry_delay(model, deadline)
+    
+    @asynccontextmanager
+    async def _open_stream(self, provider: str, model: str, url: str, payload: dict, estimated_tokens: int):
+        """Streaming counterpart of _send; the limiter slot is held for the whole stream"""
+        limiter = self.rate_limiter.for_model(provider, model)
+        loading_deadline = self._loading_deadline(provider, model, None)
+        attempt = 0
+        while True:
+            self._check_budget(model)
+            delay = None
+            async with self._limiter_slot(limiter, estimated_tokens):
+                UPSTREAM_IN_FLIGHT.inc(provider)
+                self.upstream_calls += 1
+                try:
+                    async with self._get_client(provider).stream(
+                        "POST", url, json=payload, timeout=self._request_timeout(provider)
+                    ) as response:
+                        UPSTREAM_RESPONSES.inc(provider, model, str(response.status_code))
+                        limiter.observe(response.status_code, response.headers)
+                        if response.status_code == 429 and attempt < RATE_LIMIT_RETRIES:
+                            attempt += 1
+                            continue
+                        body = "" if response.status_code == 200 else (await response.aread()).decode("utf-8", "replace")
+                        if provider == "huggingface":
+                            delay = self._cold_start_delay(model, response.status_code, body, loading_deadline)
+                        if delay is None:
+                            if response.status_code != 200:
+                                if provider == "huggingface":
+                                    raise hf_error(model, response.status_code, body)
+                                raise ProviderError(provider, response.status_code, body[:500])
+                            yield response
+                            return
+                finally:
+                    self.upstream_calls -= 1
+                    UPSTREAM_IN_FLIGHT.dec(provider)
+            await asyncio.sleep(delay)
+    
+    async def _groq_complete(self, prompt: str, model: str, temperature: float, max_tokens: int, **options) -> Tuple[str, dict]:
+        """One Groq chat completion, returning the reply text and the reported token usage"""
+        estimated_tokens = estimate_tokens(prompt, max_tokens)
+        response = await self._send(
+            "groq",
+            model,
+            self.groq_base_url,
+            {
+                "model": self.models[model]["name"],
+                "messages": [{"role": "user", "content": prompt}],
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+                **options
+            },
+            estimated_tokens
+        )
+        if response.status_code != 200:
+            raise ProviderError("groq", response.status_code, response.text[:500])
+        
+        result = response.json()
+        usage = result.get("usage") or {}
+        self._record_groq_usage(model, estimated_tokens, usage)
+        return result["choices"][0]["message"]["content"], usage
+    
+    def _record_groq_usage(self, model: str, estimated_tokens: int, usage: dict):
+        """Correct the token bucket and count tokens once Groq reports the real usage"""
+        if usage.get("total_tokens"):
+            self.rate_limiter.for_model("groq", model).record_usage(estimated_tokens, usage["total_tokens"])
+            TOKENS.inc(model, "prompt", amount=usage.get("prompt_tokens", 0))
+            TOKENS.inc(model, "completion", amount=usage.get("completion_tokens", 0))
+    
+    async def _hf_generate(self, prompt: str, model: str, temperature: float, max_tokens: int) -> Tuple[str, dict]:
+        """One HuggingFace text generation, returning the generated text and generated token count"""
+        response = await self._send(
+            "huggingface",
+            model,
+            f"{self.hf_base_url}/{self.models[model]['name']}",
+            {
+                "inputs": prompt,
+                "parameters": {
+                    "max_new_tokens": max_tokens,
+                    "temperature": temperature,
+                    "return_full_text": False,
+                    "details": True
+                }
+            },
+            estimate_tokens(prompt, max_tokens)
+        )
+        if LOG_UPSTREAM_PAYLOADS:
+            log_event(
+                logger, logging.DEBUG, "upstream_response", provider="huggingface", model=model,
+                status=response.status_code, headers=dict(response.headers), body=response.text[:2000]
+            )
+        if response.status_code != 200:
+            raise hf_error(model, response.status_code, response.text)
+        
+        result = response.json()
+        usage = self._hf_usage(result)
+        if usage:
+            TOKENS.inc(model, "completion", amount=usage["completion_tokens"])
+        return self._hf_generated_text(result), usage
+    
+    async def _hf_ping(self, model: str):
+        """Keep-warm request: one generated token, allowed to wait out a full model load"""
+        response = await self._send(
+            "huggingface",
+            model,
+            f"{self.hf_base_url}/{self.models[model]['name']}",
+            {"inputs": "Hello", "parameters": {"max_new_tokens": 1, "return_full_text": False}},
+            estimate_tokens("Hello", 1),
+            max_loading_wait=self.warmer.interval
+        )
+        if response.status_code != 200:
+            raise hf_error(model, response.status_code, response.text)
+    
+    def _hf_usage(self, result: Any) -> dict:
+        """Generated token count from a details=True response, when the backend reports it"""
+        first = result[0] if isinstance(result, list) and result else result
+        details = first.get("details") if isinstance(first, dict) else None
+        if isinstance(details, dict) and "generated_tokens" in details:
+            return {"completion_tokens": details["generated_tokens"]}
+        return {}
+    
+    def _hf_generated_text(self, result: Any) -> str:
+        # Handle different HF response formats
+        if isinstance(result, list) and len(result) > 0:
+            return result[0].get("generated_text", "")
+        elif isinstance(result, dict):
+            return result.get("generated_text", "") or result.get("text", "") or str(result)
+        return str(result)
+    
+    async def _groq_stream(
+        self, prompt: str, model: str, temperature: float, max_tokens: int, usage: Optional[dict] = None
+    ) -> AsyncIterator[str]:
+        """Stream a Groq chat completion, yielding content deltas as they arrive.
+        
+        The token usage Groq reports in its final chunk is copied into `usage`.
+        """
+        estimated_tokens = estimate_tokens(prompt, max_tokens)
+        reported: dict = {}
+        async with self._open_stream(
+            "groq",
+            model,
+            self.groq_base_url,
+            {
+                "model": self.models[model]["name"],
+                "messages": [{"role": "user", "content": prompt}],
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+                "stream": True,
+                "stream_options": {"include_usage": True}
+            },
+            estimated_tokens
+        ) as response:
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                # The usage chunk has no choices; older responses carry it under x_groq instead
+                reported = chunk.get("usage") or chunk.get("x_groq", {}).get("usage") or reported
+                choices = chunk.get("choices") or [{}]
+                delta = choices[0].get("delta", {}).get("content")
+                if delta:
+                    yield delta
+        self._record_groq_usage(model, estimated_tokens, reported)
+        if usage is not None:
+            usage.update(reported)
+    
+    async def _hf_stream(
+        self, prompt: str, model: str, temperature: float, max_tokens: int, usage: Optional[dict] = None
+    ) -> AsyncIterator[str]:
+        """Stream a HuggingFace generation; models without streaming support yield once.
+        
+        The generated token count from the final event's details is copied into `usage`.
+        """
+        reported: dict = {}
+        async with self._open_stream(
+            "huggingface",
+            model,
+            f"{self.hf_base_url}/{self.models[model]['name']}",
+            {
+                "inputs": prompt,
+                "parameters": {
+                    "max_new_tokens": max_tokens,
+                    "temperature": temperature,
+                    "return_full_text": False,
+                    "details": True
+                },
+                "stream": True
+            },
+            estimate_tokens(prompt, max_tokens)
+        ) as response:
+            if "text/event-stream" not in response.headers.get("content-type", ""):
+                result = json.loads(await response.aread())
+                reported = self._hf_usage(result)
+                yield self._hf_generated_text(result)
+            else:
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    event = json.loads(line[5:])
+                    reported = self._hf_usage(event) or reported
+                    token = event.get("token", {})
+                    if token.get("text") and not token.get("special"):
+                        yield token["text"]
+        if reported:
+            TOKENS.inc(model, "completion", amount=reported["completion_tokens"])
+        if usage is not None:
+            usage.update(reported)
+    
+    # Task handlers
+    def _prompt(self, task_type: str, text: str) -> str:
+        return PROMPT_TEMPLATES[task_type].format(text=text)
+    
+    def _entry_themes(self, text: str) -> List[str]:
+        """Top themes of the journal entry from the theme index"""
+        return [match["theme"] for match in self.theme_index.extract(text)]
+    
+    def _build_result(self, task_type: str, text: str, ai_response: str, model: str, provider: str) -> dict:
+        """Shape a model reply into the result dict for its task"""
+        confidence = TASK_CONFIDENCE[provider][task_type]
+        
+        if task_type == "sentiment":
+            # Extract sentiment polarity
+            sentiment = "neutral"
+            if any(word in ai_response.lower() for word in ["positive", "happy", "joy", "excited", "optimistic"]):
+                sentiment = "positive"
+            elif any(word in ai_response.lower() for word in ["negative", "sad", "angry", "frustrated", "anxious"]):
+                sentiment = "negative"
             
-            async with httpx.AsyncClient(timeout=45.0) as client:
-                response = await client.post(
-                    f"{self.hf_base_url}/{self.models[model]['name']}",
-                    headers={
-                        "Authorization": f"Bearer {self.hf_api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "inputs": prompt,
-                        "parameters": {
-                            "max_new_tokens": 300,
-                            "temperature": 0.7,
-                            "return_full_text": False
-                        }
-                    }
-                )
-                
-                print(f"🔍 HF API Response Status: {response.status_code}")
-                print(f"🔍 HF API Response Headers: {dict(response.headers)}")
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    print(f"🔍 HF API Raw Response: {result}")
-                    
-                    # Handle different HF response formats
-                    ai_response = ""
-                    if isinstance(result, list) and len(result) > 0:
-                        ai_response = result[0].get("generated_text", "")
-                        print(f"🔍 Extracted from list format: {ai_response[:100]}...")
-                    elif isinstance(result, dict):
-                        ai_response = result.get("generated_text", "") or result.get("text", "") or str(result)
-                        print(f"🔍 Extracted from dict format: {ai_response[:100]}...")
-                    else:
-                        ai_response = str(result)
-                        print(f"🔍 Using string format: {ai_response[:100]}...")
-                    
-                    if not ai_response or len(ai_response.strip()) < 10:
-                        print(f"⚠️ HF API returned empty/short response, using fallback")
-                        return self._fallback_sentiment(text)
-                    
-                    # Extract sentiment polarity
-                    sentiment = "neutral"
-                    if any(word in ai_response.lower() for word in ["positive", "happy", "joy", "excited", "optimistic"]):
-                        sentiment = "positive"
-                    elif any(word in ai_response.lower() for word in ["negative", "sad", "angry", "frustrated", "anxious"]):
-                        sentiment = "negative"
-                    
-                    print(f"✅ HF API Success - Model: {model}, Length: {len(ai_response)}")
-                    return {
-                        "result": f"✨ {ai_response}",
-                        "confidence": 0.88,
-                        "sentiment": sentiment,
-                        "model": model
-                    }
-                else:
-                    error_text = response.text[:500] if response.text else "No error text"
-                    print(f"❌ HF API HTTP Error: {response.status_code}")
-                    print(f"❌ HF API Error Details: {error_text}")
-                    return self._fallback_sentiment(text)
-                
+            return {
+                "result": f"✨ {ai_response}",
+                "confidence": confidence,
+                "sentiment": sentiment,
+                "model": model
+            }
+        
+        if task_type == "insights":
+            return {
+                "result": f"🧠 {ai_response}",
+                "confidence": confidence,
+                "themes": self._entry_themes(text),
+                "model": model
+            }
+        
+        return {
+            "result": f"📝 {ai_response}",
+            "confidence": confidence,
+            "original_length": len(text.split()),
+            "summary_length": len(ai_response.split()),
+            "model": model
+        }
+    
+    def _fallback(self, task_type: str, text: str, reason: str) -> dict:
+        FALLBACKS.inc(task_type, reason)
+        result = getattr(self, f"_fallback_{task_type}")(text)
+        if reason == "deadline":
+            result["deadline_exceeded"] = True
+        return result
+    
+    def _too_long(self, task_type: str, text: str, model: str, plan: dict) -> dict:
+        """Serve the fallback instead of a call that could only come back truncated"""
+        log_event(logger, logging.WARNING, "context_overflow", task=task_type, model=model, **plan)
+        self.breakers[model].record_ignored()
+        return self._fallback(task_type, text, "context_length")
+    
+    async def _groq_task(self, task_type: str, text: str, model: str) -> dict:
+        """Real Groq-powered analysis for one task"""
+        plan = self.plan(task_type, text, model)
+        if not plan["fits"]:
+            return self._too_long(task_type, text, model, plan)
+        try:
+            ai_response, usage = await self._groq_complete(
+                self._prompt(task_type, text), model, max_tokens=plan["max_output_tokens"], **GENERATION_PARAMS[task_type])
+        except asyncio.CancelledError:
+            self.breakers[model].record_ignored()
+            raise
         except Exception as e:
-            print(f"HuggingFace API error: {e}")
-            return self._fallback_sentiment(text)
+            log_event(logger, logging.WARNING, "upstream_error", provider="groq", model=model, task=task_type, error=str(e))
+            self._record_outcome(model, e)
+            return self._fallback(task_type, text, fallback_reason(e))
+        
+        self._record_outcome(model)
+        return {**self._build_result(task_type, text, ai_response, model, "groq"), "tokens": token_report(plan, usage)}
     
-    async def _hf_insights(self, text: str, model: str) -> dict:
-        """HuggingFace-powered insights"""
-        prompt = f"""As an insightful life coach and psychologist, analyze this journal entry to provide personalized insights that will genuinely help this person grow and understand themselves better.
-
-Journal Entry:
-"{text}"
-
-Provide specific, actionable insights that:
-1. Identify key patterns in their thinking or behavior
-2. Highlight strengths and growth opportunities
-3. Suggest concrete next steps or reflections
-4. Connect their experiences to broader life themes
-
-Be specific to THEIR actual words and situation. Avoid generic advice. Focus on what will be most valuable for their personal development based on what they've shared."""
-
+    async def _hf_task(self, task_type: str, text: str, model: str) -> dict:
+        """HuggingFace-powered analysis for one task"""
+        plan = self.plan(task_type, text, model)
+        if not plan["fits"]:
+            return self._too_long(task_type, text, model, plan)
         try:
-            async with httpx.AsyncClient(timeout=45.0) as client:
-                response = await client.post(
-                    f"{self.hf_base_url}/{self.models[model]['name']}",
-                    headers={
-                        "Authorization": f"Bearer {self.hf_api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "inputs": prompt,
-                        "parameters": {
-                            "max_new_tokens": 350,
-                            "temperature": 0.8,
-                            "return_full_text": False
-                        }
-                    }
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    if isinstance(result, list) and len(result) > 0:
-                        ai_response = result[0].get("generated_text", "")
-                    else:
-                        ai_response = str(result)
-                    
-                    # Extract themes from response
-                    themes = []
-                    common_themes = ["growth", "relationships", "career", "self-care", "goals", "emotions", "challenges", "reflection"]
-                    for theme in common_themes:
-                        if theme in ai_response.lower():
-                            themes.append(theme)
-                    
-                    return {
-                        "result": f"🧠 {ai_response}",
-                        "confidence": 0.85,
-                        "themes": themes[:3],  # Top 3 themes
-                        "model": model
-                    }
-                else:
-                    print(f"HF API error: {response.status_code} - {response.text}")
-                    return self._fallback_insights(text)
-                
+            ai_response, usage = await self._hf_generate(
+                self._prompt(task_type, text), model, max_tokens=plan["max_output_tokens"], **GENERATION_PARAMS[task_type])
+            if not ai_response or len(ai_response.strip()) < MIN_RESPONSE_CHARS:
+                raise EmptyResponseError(f"HF API returned empty/short response ({len(ai_response.strip())} chars)")
+        except asyncio.CancelledError:
+            self.breakers[model].record_ignored()
+            raise
         except Exception as e:
-            print(f"HuggingFace API error: {e}")
-            return self._fallback_insights(text)
+            log_event(logger, logging.WARNING, "upstream_error", provider="huggingface", model=model, task=task_type, error=str(e))
+            self._record_outcome(model, e)
+            return self._fallback(task_type, text, fallback_reason(e))
+        
+        self._record_outcome(model)
+        return {**self._build_result(task_type, text, ai_response, model, "huggingface"), "tokens": token_report(plan, usage)}
     
-    async def _hf_summarize(self, text: str, model: str) -> dict:
-        """HuggingFace-powered summarization"""
-        word_count = len(text.split())
+    async def stream_task(self, task_type: str, text: str, model: str, quality: Optional[str] = None) -> AsyncIterator[dict]:
+        """Stream a task as token events followed by one final result event.
         
-        prompt = f"""Create a concise but comprehensive summary of this journal entry that captures the essential experiences, emotions, and insights. Make it useful for the person to quickly recall what happened and how they felt.
-
-Journal Entry:
-"{text}"
-
-Create a summary that:
-1. Captures the main events or experiences
-2. Preserves the emotional core
-3. Highlights any important realizations or decisions
-4. Is about 2-3 sentences but rich in meaningful detail
-
-Focus on what this person would most want to remember about this day/experience."""
-
+        The final event is authoritative: if the stream fails part way, it
+        carries the fallback result rather than the partial text.
+        """
+        if model == AUTO_MODEL:
+            model = self.auto_model(task_type, text, quality)
+        key = cache_key(task_type, text, model, PROMPT_VERSION)
+        cached = await self._cache_get(key)
+        if cached is not None:
+            yield {"event": "result", "data": {**cached, "cached": True}}
+            return
+        
+        provider = self._effective_provider(model)
+        if provider == "local":
+            yield {"event": "result", "data": self._fallback(task_type, text, "no_key")}
+            return
+        if not budget_allows(self.deadline_min_seconds):
+            yield {"event": "result", "data": self._fallback(task_type, text, "deadline")}
+            return
+        text_chunks = self._chunks(task_type, text, model)
+        if len(text_chunks) > 1:
+            # Merged chunk results have no single token stream; send the final result only
+            yield {"event": "result", "data": await self.run_map_reduce(task_type, text, text_chunks, model)}
+            return
+        if not self.breakers[model].allow():
+            yield {"event": "result", "data": await self._short_circuit(task_type, text, model, failover=True)}
+            return
+        
+        plan = self.plan(task_type, text, model)
+        if not plan["fits"]:
+            yield {"event": "result", "data": self._too_long(task_type, text, model, plan)}
+            return
+        
+        stream = self._groq_stream if provider == "groq" else self._hf_stream
+        chunks = []
+        usage: dict = {}
         try:
-            async with httpx.AsyncClient(timeout=45.0) as client:
-                response = await client.post(
-                    f"{self.hf_base_url}/{self.models[model]['name']}",
-                    headers={
-                        "Authorization": f"Bearer {self.hf_api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "inputs": prompt,
-                        "parameters": {
-                            "max_new_tokens": 200,
-                            "temperature": 0.6,
-                            "return_full_text": False
-                        }
-                    }
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    if isinstance(result, list) and len(result) > 0:
-                        ai_response = result[0].get("generated_text", "")
-                    else:
-                        ai_response = str(result)
-                    
-                    summary_length = len(ai_response.split())
-                    
-                    return {
-                        "result": f"📝 {ai_response}",
-                        "confidence": 0.82,
-                        "original_length": word_count,
-                        "summary_length": summary_length,
-                        "model": model
-                    }
-                else:
-                    print(f"HF API error: {response.status_code} - {response.text}")
-                    return self._fallback_summarize(text)
-                
+            async for token in stream(
+                self._prompt(task_type, text), model, max_tokens=plan["max_output_tokens"], usage=usage,
+                **GENERATION_PARAMS[task_type]
+            ):
+                chunks.append(token)
+                yield {"event": "token", "data": {"text": token}}
+            if len("".join(chunks).strip()) < MIN_RESPONSE_CHARS:
+                raise EmptyResponseError("stream ended with an empty/short response")
+        except (asyncio.CancelledError, GeneratorExit):
+            # Client went away mid-stream: release the breaker probe without judging the model
+            self.breakers[model].record_ignored()
+            raise
         except Exception as e:
-            print(f"HuggingFace API error: {e}")
-            return self._fallback_summarize(text)
+            log_event(logger, logging.WARNING, "upstream_error", provider=provider, model=model, task=task_type, error=str(e), stream=True)
+            self._record_outcome(model, e)
+            yield {"event": "result", "data": self._fallback(task_type, text, fallback_reason(e))}
+            return
+        
+        self._record_outcome(model)
+        result = {**self._build_result(task_type, text, "".join(chunks), model, provider), "tokens": token_report(plan, usage)}
+        await self._cache_io(self.cache.put, key, result)
+        yield {"event": "result", "data": result}
     
     def _fallback_sentiment(self, text: str) -> dict:
-        """Intelligent fallback sentiment analysis"""
-        positive_words = ["happy", "good", "great", "excellent", "amazing", "wonderful", "love", "excited", "joy"]
-        negative_words = ["sad", "bad", "terrible", "awful", "hate", "angry", "frustrated", "disappointed"]
-        
-        text_lower = text.lower()
-        pos_count = sum(1 for word in positive_words if word in text_lower)
-        neg_count = sum(1 for word in negative_words if word in text_lower)
-        
-        if pos_count > neg_count:
-            sentiment = "positive"
-            confidence = 0.75
-        elif neg_count > pos_count:
-            sentiment = "negative"
-            confidence = 0.75
-        else:
-            sentiment = "neutral"
-            confidence = 0.70
+        """Lexicon-based fallback sentiment analysis"""
+        scored = self.lexicon.score(text)
+        sentiment = scored["sentiment"]
         
         return {
             "result": f"📊 Sentiment: {sentiment.title()} - Your journal entry reflects a {sentiment} emotional tone.",
-            "confidence": confidence,
+            "confidence": scored["confidence"],
             "sentiment": sentiment,
-            "model": "fallback-analysis"
+            "score": scored["score"],
+            "model": FALLBACK_MODEL
         }
     
     def _fallback_insights(self, text: str) -> dict:
-        """Intelligent fallback insights"""
-        insights = [
-            "Your writing shows self-awareness and introspection",
-            "Consider the emotional patterns in your daily experiences",
-            "Notice the balance between challenges and positive moments",
-            "Your journal reveals personal growth opportunities"
-        ]
-        
-        import random
-        selected_insight = random.choice(insights)
+        """Theme-based fallback insights"""
+        matches = self.theme_index.extract(text)
         
         return {
-            "result": f"🔍 Insight: {selected_insight}. Continue this reflective practice for deeper self-understanding.",
+            "result": f"🔍 Insight: {self.theme_index.insight_text(matches)}",
             "confidence": 0.70,
-            "themes": ["self-awareness", "growth", "reflection"],
-            "model": "fallback-analysis"
+            "themes": [match["theme"] for match in matches],
+            "model": FALLBACK_MODEL
         }
     
     def _fallback_summarize(self, text: str) -> dict:
-        """Intelligent fallback summarization"""
-        sentences = text.split('.')
+        """Extractive TextRank fallback summarization"""
         word_count = len(text.split())
-        
-        # Simple extractive summary - take first and important sentences
-        if len(sentences) > 2:
-            summary = f"{sentences[0].strip()}. {sentences[-2].strip() if len(sentences) > 2 else ''}"
-        else:
-            summary = text[:100] + "..." if len(text) > 100 else text
+        summary = " ".join(summarize_extractive(text, FALLBACK_SUMMARY_SENTENCES, FALLBACK_SUMMARY_RATIO))
         
         return {
-            "result": f"📄 Summary: {summary.strip()}",
+            "result": f"📄 Summary: {summary}",
             "confidence": 0.65,
             "original_length": word_count,
             "summary_length": len(summary.split()),
-            "model": "fallback-analysis"
+            "model": FALLBACK_MODEL
         }
 
 # Initialize enhanced AI service
 ai_service = EnhancedAIService()
 
+# Journal entries and their stored analyses (JOURNAL_DB_PATH, JOURNAL_DB_POOL_SIZE)
+journal_store = JournalStore.from_env()
+
+# Model used for entry and period summaries in the rolling summary tree
+SUMMARY_TREE_MODEL = os.getenv("SUMMARY_TREE_MODEL", "groq-llama3-8b")
+# Summarize calls a summary rebuild runs at once (0 = the model provider's batch concurrency cap)
+SUMMARY_TREE_CONCURRENCY = (
+    int(os.getenv("SUMMARY_TREE_CONCURRENCY", 0))
+    or ai_service.batch_concurrency[ai_service._effective_provider(SUMMARY_TREE_MODEL)]
+)
+
+async def summarize_for_tree(text: str) -> dict:
+    result = await ai_service.summarize_text(text, SUMMARY_TREE_MODEL)
+    return build_task_response("summarize", text, result, SUMMARY_TREE_MODEL).model_dump()
+
+summary_tree = SummaryTree(
+    journal_store, summarize_for_tree, FALLBACK_MODEL, SUMMARY_TREE_CONCURRENCY,
+    fallback_retry_seconds=float(os.getenv("SUMMARY_TREE_FALLBACK_RETRY_SECONDS", 300))
+)
+
+# Hashed TF-IDF vectors of every stored entry, for related-entry lookups (SIMILARITY_INDEX_DIR, SIMILARITY_DIM)
+similarity_index = SimilarityIndex.from_env(SERVER_WORKERS)
+
+# With several workers: the store state this worker's in-memory index last caught up with
+similarity_sync = {"fingerprint": None, "since": ""}
+# Entry writes from different workers can commit out of timestamp order; catch-ups re-read this far back
+SIMILARITY_SYNC_OVERLAP = timedelta(seconds=5)
+
+def sync_similarity_index():
+    """Reuse the on-disk index if it matches the store as of the last clean shutdown, else rebuild it"""
+    similarity_sync["since"] = (datetime.now() - SIMILARITY_SYNC_OVERLAP).isoformat()
+    fingerprint = similarity_sync["fingerprint"] = journal_store.fingerprint()
+    if not similarity_index.is_current(fingerprint):
+        started = time.perf_counter()
+        similarity_index.rebuild(journal_store.texts(), fingerprint)
+        log_event(logger, logging.INFO, "similarity_index_rebuilt", entries=similarity_index.count,
+                  duration_ms=round((time.perf_counter() - started) * 1000, 1))
+
+def catch_up_similarity_index():
+    """Apply entry writes made through other workers since this worker's index last looked"""
+    fingerprint = journal_store.fingerprint()
+    if fingerprint == similarity_sync["fingerprint"]:
+        return
+    since = similarity_sync["since"]
+    similarity_sync["since"] = (datetime.now() - SIMILARITY_SYNC_OVERLAP).isoformat()
+    for entry_id, text in journal_store.changed_since(since):
+        similarity_index.add(entry_id, text)
+    for entry_id in set(similarity_index.rows) - journal_store.entry_ids():
+        similarity_index.remove(entry_id)
+    similarity_sync["fingerprint"] = fingerprint
+
+def find_related(text: str, k: int, exclude_id: Optional[int] = None) -> List[dict]:
+    """Most similar stored entries to `text`, with a short preview of each"""
+    if SERVER_WORKERS > 1:
+        catch_up_similarity_index()
+    matches = similarity_index.query(text, k, exclude_id)
+    previews = journal_store.previews([match["id"] for match in matches])
+    return [{**previews[match["id"]], "score": match["score"]} for match in matches if match["id"] in previews]
+
+CIRCUIT_STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+metrics.callback(
+    "journal_api_circuit_state", "Circuit breaker state per model (0 closed, 1 half-open, 2 open; worst worker)", ["model"],
+    lambda: {(name, ): CIRCUIT_STATE_VALUES[breaker.state] for name, breaker in ai_service.breakers.items()},
+    aggregate="max")
+metrics.callback(
+    "journal_api_cache_events_total", "Result cache and in-flight coalescing counters", ["event"],
+    lambda: {
+        **{(name, ): value for name, value in ai_service.cache.counters.items()},
+        **{(f"inflight_{name}", ): value for name, value in ai_service.inflight.counters.items()}
+    },
+    kind="counter")
+
 # Routes
 @app.get("/")
 async def root():
@@ -603,7 +1716,7 @@ async def root():
         "version": "1.0.0",
         "status": "healthy",
         "environment": "production",
-        "features": ["sentiment", "insights", "summarize"],
+        "features": ["sentiment", "insights", "summarize", "analyze"],
         "groq_connected": bool(os.getenv("GROQ_API_KEY")),
         "hf_connected": bool(os.getenv("HUGGINGFACE_API_KEY"))
     }
@@ -615,86 +1728,500 @@ async def health_check():
         "service": "ai-journal-summarizer-api",
         "platform": "railway",
         "environment": os.getenv("RAILWAY_ENVIRONMENT", "production"),
+        "worker": {"pid": os.getpid(), "workers": SERVER_WORKERS},
         "timestamp": datetime.now().isoformat()
     }
 
+def build_task_response(task_type: str, text: str, result_data: dict, requested_model: Optional[str]) -> TextProcessResponse:
+    """Wrap a service result dict in the public response shape for its task"""
+    metadata = {}
+    if task_type == "sentiment":
+        metadata["word_count"] = len(text.split())
+        metadata["sentiment"] = result_data.get("sentiment", "unknown")
+        if "score" in result_data:
+            metadata["sentiment_score"] = result_data["score"]
+    elif task_type == "insights":
+        metadata["word_count"] = len(text.split())
+        metadata["themes"] = result_data.get("themes", [])
+    else:
+        metadata["original_length"] = result_data.get("original_length", 0)
+        metadata["summary_length"] = result_data.get("summary_length", 0)
+    metadata["model"] = result_data.get("model", requested_model)
+    metadata["cached"] = result_data.get("cached", False)
+    if "routing" in result_data:
+        metadata["routing"] = result_data["routing"]
+    if "chunks" in result_data:
+        metadata["chunks"] = result_data["chunks"]
+    if "tokens" in result_data:
+        metadata["tokens"] = result_data["tokens"]
+    deadline = current_deadline()
+    if deadline is not None:
+        metadata["deadline"] = deadline.report(degraded=bool(result_data.get("deadline_exceeded")))
+    metadata["timestamp"] = datetime.now().isoformat()
+    
+    return TextProcessResponse(
+        result=result_data["result"],
+        task_type=task_type,
+        confidence=result_data["confidence"],
+        metadata=metadata
+    )
+
+async def store_task_response(task_type: str, request: TextProcessRequest, result_data: dict) -> TextProcessResponse:
+    """Build the task response, keep it with the request's journal entry and attach related entries if asked.
+
+    Fallback results are not stored (as with the result cache) so a later
+    call can replace them with a model answer.
+    """
+    response = build_task_response(task_type, request.text, result_data, request.model)
+    if request.entry_id is not None:
+        stored = False
+        if not is_fallback(result_data):
+            stored = await asyncio.to_thread(
+                journal_store.save_analysis, request.entry_id, task_type, request.text, response.model_dump())
+        response.metadata["entry_id"] = request.entry_id
+        response.metadata["stored"] = stored
+    if request.related:
+        response.metadata["related"] = await asyncio.to_thread(find_related, request.text, request.related, request.entry_id)
+    return response
+
+# Query parameter shared by the task endpoints: 0 runs first, 9 last
+JOB_PRIORITY = Query(5, ge=0, le=9)
+
+# Longest a GET /api/jobs/{id}?wait= long-poll is held open
+JOB_MAX_WAIT_SECONDS = float(os.getenv("JOB_MAX_WAIT_SECONDS", 30))
+
+# Callback hosts trusted without the public-address check (comma-separated, ".example.com" = any subdomain)
+JOB_CALLBACK_ALLOWED_HOSTS = [host.strip().lower() for host in os.getenv("JOB_CALLBACK_ALLOWED_HOSTS", "").split(",") if host.strip()]
+
+async def submit_job(kind: str, request: BaseModel, priority: int, callback_url: Optional[str]) -> JSONResponse:
+    """Queue a task request as a background job and answer 202 with where to poll for it"""
+    if callback_url is not None:
+        try:
+            await asyncio.to_thread(check_callback_url, callback_url, JOB_CALLBACK_ALLOWED_HOSTS)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+    try:
+        job = await job_queue.submit(kind, request.model_dump(mode="json"), priority, callback_url)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=f"Job queue is full: {e}", headers={"Retry-After": "5"})
+    poll_url = f"/api/jobs/{job['id']}"
+    return JSONResponse(
+        status_code=202,
+        content={"job_id": job["id"], "kind": kind, "status": job["status"], "priority": priority, "poll_url": poll_url},
+        headers={"Location": poll_url}
+    )
+
+async def run_job(kind: str, payload: dict) -> dict:
+    """Job handler: run the endpoint for the job's kind on the stored request"""
+    endpoints = {
+        "sentiment": (analyze_sentiment, TextProcessRequest),
+        "insights": (generate_insights, TextProcessRequest),
+        "summarize": (summarize_text, TextProcessRequest),
+        "analyze": (analyze_entry, AnalyzeRequest),
+        "batch": (analyze_batch, BatchRequest)
+    }
+    endpoint, request_model = endpoints[kind]
+    request = request_model(**payload)
+    if kind == "batch":
+        request.stream = False
+    try:
+        response = await endpoint(request, job=False, priority=5, callback_url=None)
+    except HTTPException as e:
+        raise RuntimeError(e.detail)
+    return response.model_dump() if isinstance(response, BaseModel) else response
+
+async def notify_job_callback(job: dict, url: str):
+    """POST the finished job to the callback URL given at submit time"""
+    # Checked again at send time: the host may resolve elsewhere by now
+    await asyncio.to_thread(check_callback_url, url, JOB_CALLBACK_ALLOWED_HOSTS)
+    async with httpx.AsyncClient(timeout=10.0) as callback_client:
+        response = await callback_client.post(url, json=job)
+        response.raise_for_status()
+
+# Background jobs for slow requests (JOB_WORKERS, JOB_MAX_PENDING, JOB_RETENTION_SECONDS, JOB_SQLITE_PATH)
+job_queue = JobQueue.from_env(run_job, notify_job_callback)
+
 @app.post("/api/ai/sentiment", response_model=TextProcessResponse)
-async def analyze_sentiment(request: TextProcessRequest):
+async def analyze_sentiment(request: TextProcessRequest, job: bool = False, priority: int = JOB_PRIORITY, callback_url: Optional[str] = None):
     """Analyze sentiment of journal entry with model selection"""
+    if job:
+        return await submit_job("sentiment", request, priority, callback_url)
     try:
-        result_data = await ai_service.analyze_sentiment(request.text, request.model)
-        
-        return TextProcessResponse(
-            result=result_data["result"],
-            task_type="sentiment",
-            confidence=result_data["confidence"],
-            metadata={
-                "word_count": len(request.text.split()),
-                "sentiment": result_data.get("sentiment", "unknown"),
-                "model": result_data.get("model", request.model),
-                "timestamp": datetime.now().isoformat()
-            }
-        )
+        with deadline_scope(request.deadline_ms):
+            result_data = await ai_service.analyze_sentiment(request.text, request.model, request.routing, request.quality)
+            return await store_task_response("sentiment", request, result_data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Sentiment analysis failed: {str(e)}")
 
 @app.post("/api/ai/insights", response_model=TextProcessResponse)
-async def generate_insights(request: TextProcessRequest):
+async def generate_insights(request: TextProcessRequest, job: bool = False, priority: int = JOB_PRIORITY, callback_url: Optional[str] = None):
     """Generate personal insights from journal entry with model selection"""
+    if job:
+        return await submit_job("insights", request, priority, callback_url)
     try:
-        result_data = await ai_service.generate_insights(request.text, request.model)
-        
-        return TextProcessResponse(
-            result=result_data["result"],
-            task_type="insights",
-            confidence=result_data["confidence"],
-            metadata={
-                "word_count": len(request.text.split()),
-                "themes": result_data.get("themes", []),
-                "model": result_data.get("model", request.model),
-                "timestamp": datetime.now().isoformat()
-            }
-        )
+        with deadline_scope(request.deadline_ms):
+            result_data = await ai_service.generate_insights(request.text, request.model, request.routing, request.quality)
+            return await store_task_response("insights", request, result_data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Insights generation failed: {str(e)}")
 
 @app.post("/api/ai/summarize", response_model=TextProcessResponse)
-async def summarize_text(request: TextProcessRequest):
+async def summarize_text(request: TextProcessRequest, job: bool = False, priority: int = JOB_PRIORITY, callback_url: Optional[str] = None):
     """Summarize journal entry with model selection"""
+    if job:
+        return await submit_job("summarize", request, priority, callback_url)
     try:
-        result_data = await ai_service.summarize_text(request.text, request.model)
-        
-        return TextProcessResponse(
-            result=result_data["result"],
-            task_type="summarize",
-            confidence=result_data["confidence"],
-            metadata={
-                "original_length": result_data.get("original_length", 0),
-                "summary_length": result_data.get("summary_length", 0),
-                "model": result_data.get("model", request.model),
-                "timestamp": datetime.now().isoformat()
-            }
-        )
+        with deadline_scope(request.deadline_ms):
+            result_data = await ai_service.summarize_text(request.text, request.model, request.routing, request.quality)
+            return await store_task_response("summarize", request, result_data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Summarization failed: {str(e)}")
 
+@app.post("/api/ai/analyze", response_model=CombinedAnalysisResponse)
+async def analyze_entry(request: AnalyzeRequest, job: bool = False, priority: int = JOB_PRIORITY, callback_url: Optional[str] = None):
+    """Sentiment, insights and summary for one entry from a single LLM call"""
+    if job:
+        return await submit_job("analyze", request, priority, callback_url)
+    try:
+        with deadline_scope(request.deadline_ms) as deadline:
+            analysis = await ai_service.analyze_all(request.text, request.model, request.quality)
+            
+            response = CombinedAnalysisResponse(
+                sentiment=build_task_response("sentiment", request.text, analysis["sentiment"], request.model),
+                insights=build_task_response("insights", request.text, analysis["insights"], request.model),
+                summarize=build_task_response("summarize", request.text, analysis["summarize"], request.model),
+                metadata={
+                    "combined": analysis["combined"],
+                    "cached": analysis.get("cached", False),
+                    "model": request.model,
+                    "timestamp": datetime.now().isoformat()
+                }
+            )
+            if deadline is not None:
+                degraded = any(analysis[task_type].get("deadline_exceeded") for task_type in TASK_TYPES)
+                response.metadata["deadline"] = deadline.report(degraded)
+            return response
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Combined analysis failed: {str(e)}")
+
+async def stream_task_events(task_type: str, request: TextProcessRequest):
+    """Relay service stream events as Server-Sent Events"""
+    with deadline_scope(request.deadline_ms):
+        async for event in ai_service.stream_task(task_type, request.text, request.model, request.quality):
+            data = event["data"]
+            if event["event"] == "result":
+                data = build_task_response(task_type, request.text, data, request.model).model_dump()
+            yield f"event: {event['event']}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/api/ai/{task_type}/stream")
+async def stream_task(task_type: str, request: TextProcessRequest):
+    """Stream a sentiment, insights or summarize result token by token (SSE)"""
+    if task_type not in TASK_TYPES:
+        raise HTTPException(status_code=404, detail=f"Unknown task type: {task_type}")
+    return StreamingResponse(
+        stream_task_events(task_type, request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+BATCH_MAX_ENTRIES = int(os.getenv("BATCH_MAX_ENTRIES", 5000))
+
+async def run_batch_entry(index: int, entry: BatchEntry, request: BatchRequest) -> dict:
+    """All requested tasks for one batch entry, with errors reported per task"""
+    outcomes = await asyncio.gather(
+        *(ai_service.run_batch_task(task_type, entry.text, request.model) for task_type in request.task_types),
+        return_exceptions=True
+    )
+    results, errors = {}, {}
+    for task_type, outcome in zip(request.task_types, outcomes):
+        if isinstance(outcome, Exception):
+            errors[task_type] = str(outcome) or type(outcome).__name__
+        else:
+            results[task_type] = build_task_response(task_type, entry.text, outcome, request.model).model_dump()
+    return {"index": index, "id": entry.id, "results": results, "errors": errors}
+
+async def stream_batch(request: BatchRequest):
+    """Yield NDJSON lines in completion order; each line carries its input index"""
+    with deadline_scope(request.deadline_ms):  # each task keeps a copy of the deadline context
+        tasks = [asyncio.create_task(run_batch_entry(i, entry, request)) for i, entry in enumerate(request.entries)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield json.dumps(await next_done) + "\n"
+    finally:
+        for task in tasks:
+            task.cancel()
+
+@app.post("/api/ai/batch")
+async def analyze_batch(request: BatchRequest, job: bool = False, priority: int = JOB_PRIORITY, callback_url: Optional[str] = None):
+    """Analyze many journal entries with bounded per-provider concurrency"""
+    unknown_tasks = [task_type for task_type in request.task_types if task_type not in TASK_TYPES]
+    if unknown_tasks:
+        raise HTTPException(status_code=400, detail=f"Unknown task types: {', '.join(unknown_tasks)}")
+    if len(request.entries) > BATCH_MAX_ENTRIES:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {BATCH_MAX_ENTRIES} entries")
+    if job:
+        return await submit_job("batch", request, priority, callback_url)
+    
+    if request.stream:
+        return StreamingResponse(stream_batch(request), media_type="application/x-ndjson")
+    
+    with deadline_scope(request.deadline_ms):
+        items = await asyncio.gather(
+            *(run_batch_entry(i, entry, request) for i, entry in enumerate(request.entries))
+        )
+    return {
+        "results": items,
+        "metadata": {
+            "count": len(items),
+            "failed": sum(1 for item in items if item["errors"]),
+            "task_types": request.task_types,
+            "model": request.model,
+            "timestamp": datetime.now().isoformat()
+        }
+    }
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str, wait: float = 0):
+    """Job status and, once done, its result; wait=N long-polls up to N seconds for it to finish"""
+    job = await job_queue.wait(job_id, min(max(wait, 0), JOB_MAX_WAIT_SECONDS))
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+@app.delete("/api/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a job that has not started yet"""
+    if job_queue.cancel(job_id):
+        return job_queue.get(job_id)
+    if job_queue.get(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    raise HTTPException(status_code=409, detail=f"Job {job_id} has already started")
+
+@app.post("/api/ai/sentiment/lexicon")
+async def score_sentiment_lexicon(request: LexiconBatchRequest):
+    """Score many entries with the local lexicon engine in one vectorized pass (no model calls)"""
+    if len(request.entries) > BATCH_MAX_ENTRIES:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {BATCH_MAX_ENTRIES} entries")
+    
+    # Large batches take tens of milliseconds; keep them off the event loop
+    scores = await asyncio.to_thread(ai_service.lexicon.score_batch, [entry.text for entry in request.entries])
+    return {
+        "results": [
+            {"index": i, "id": entry.id, **score}
+            for i, (entry, score) in enumerate(zip(request.entries, scores))
+        ],
+        "metadata": {
+            "count": len(scores),
+            "model": "lexicon",
+            "timestamp": datetime.now().isoformat()
+        }
+    }
+
+@app.post("/api/ai/themes")
+async def extract_themes(request: ThemeBatchRequest):
+    """Ranked themes for many entries from the local theme index (bulk backfills, no model calls)"""
+    if len(request.entries) > BATCH_MAX_ENTRIES:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {BATCH_MAX_ENTRIES} entries")
+    
+    matches = await asyncio.to_thread(
+        ai_service.theme_index.extract_batch, [entry.text for entry in request.entries], request.top_k)
+    return {
+        "results": [
+            {"index": i, "id": entry.id, "themes": entry_matches}
+            for i, (entry, entry_matches) in enumerate(zip(request.entries, matches))
+        ],
+        "metadata": {
+            "count": len(matches),
+            "taxonomy": ai_service.theme_index.themes,
+            "timestamp": datetime.now().isoformat()
+        }
+    }
+
+def require_entry(entry: Optional[dict], entry_id: int) -> dict:
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"Journal entry {entry_id} not found")
+    return entry
+
+@app.post("/api/journal/entries", status_code=201)
+async def create_journal_entry(request: JournalEntryCreate):
+    """Store a journal entry; analyze it with POST /api/journal/entries/{id}/analyze"""
+    entry = await asyncio.to_thread(journal_store.create, request.text, request.title, request.created_at)
+    await asyncio.to_thread(similarity_index.add, entry["id"], entry["text"])
+    return entry
+
+@app.get("/api/journal/entries")
+async def list_journal_entries(limit: int = 20, before_id: Optional[int] = None):
+    """Newest entries first with their stored analyses; page with before_id=<last id>"""
+    limit = min(max(limit, 1), 100)
+    entries = await asyncio.to_thread(journal_store.list_entries, limit, before_id)
+    return {
+        "entries": entries,
+        "next_before_id": entries[-1]["id"] if len(entries) == limit else None
+    }
+
+@app.get("/api/journal/search")
+async def search_journal_entries(q: str, limit: int = 20):
+    """Full-text search over entry titles and text, best match first"""
+    entries = await asyncio.to_thread(journal_store.search, q, min(max(limit, 1), 100))
+    return {"query": q, "count": len(entries), "entries": entries}
+
+@app.get("/api/journal/entries/{entry_id}")
+async def get_journal_entry(entry_id: int):
+    return require_entry(await asyncio.to_thread(journal_store.get, entry_id), entry_id)
+
+@app.put("/api/journal/entries/{entry_id}")
+async def update_journal_entry(entry_id: int, request: JournalEntryUpdate):
+    """Edit an entry; changing its text drops the stored analyses"""
+    entry = require_entry(await asyncio.to_thread(journal_store.update, entry_id, request.text, request.title), entry_id)
+    if request.text is not None:
+        await asyncio.to_thread(similarity_index.add, entry_id, entry["text"])
+    return entry
+
+@app.delete("/api/journal/entries/{entry_id}", status_code=204)
+async def delete_journal_entry(entry_id: int):
+    if not await asyncio.to_thread(journal_store.delete, entry_id):
+        raise HTTPException(status_code=404, detail=f"Journal entry {entry_id} not found")
+    await asyncio.to_thread(similarity_index.remove, entry_id)
+
+@app.get("/api/journal/entries/{entry_id}/related")
+async def get_related_entries(entry_id: int, k: int = 5):
+    """Stored entries most similar to this one"""
+    entry = require_entry(await asyncio.to_thread(journal_store.get, entry_id), entry_id)
+    related = await asyncio.to_thread(find_related, entry["text"], min(max(k, 1), 50), entry_id)
+    return {"entry_id": entry_id, "related": related}
+
+@app.post("/api/journal/entries/{entry_id}/analyze")
+async def analyze_journal_entry(entry_id: int, model: str = "groq-llama3-8b", refresh: bool = False):
+    """Sentiment, insights and summary for a stored entry, reusing stored results unless refresh=true"""
+    entry = require_entry(await asyncio.to_thread(journal_store.get, entry_id), entry_id)
+    if not refresh and all(task in entry["analysis"] for task in TASK_TYPES):
+        return entry
+    analysis = await ai_service.analyze_all(entry["text"], model)
+    for task in TASK_TYPES:
+        if not is_fallback(analysis[task]):
+            response = build_task_response(task, entry["text"], analysis[task], model)
+            await asyncio.to_thread(journal_store.save_analysis, entry_id, task, entry["text"], response.model_dump())
+    entry = require_entry(await asyncio.to_thread(journal_store.get, entry_id), entry_id)
+    # Unstored (fallback) results are still returned, just not persisted
+    for task in TASK_TYPES:
+        entry["analysis"].setdefault(task, build_task_response(task, entry["text"], analysis[task], model).model_dump())
+    return entry
+
+@app.get("/api/journal/summaries/{level}")
+async def get_period_summary(level: str, key: Optional[str] = None, day: Optional[date] = None):
+    """Rolling summary of a day, week, month or year of entries.
+    
+    Pick the period by key (2026-10-17, 2026-W42, 2026-10, 2026) or by any
+    date inside it; defaults to the current period. Only periods whose
+    entries changed since the last read are re-summarized.
+    """
+    if level not in SUMMARY_LEVELS:
+        raise HTTPException(status_code=404, detail=f"Unknown summary level: {level}")
+    key = key or period_key(level, day or date.today())
+    try:
+        node = await summary_tree.node(level, key)
+    except ValueError:
+        raise HTTPException(status_code=422, detail=f"Invalid {level} key: {key}")
+    if node is None:
+        raise HTTPException(status_code=404, detail=f"No journal entries in {level} {key}")
+    return {
+        "level": level,
+        "key": key,
+        "summary": node["summary"],
+        "model": node["model"],
+        "children": node["children"],
+        "updated_at": node["updated_at"]
+    }
+
+@app.post("/api/ai/related")
+async def related_entries(request: RelatedRequest):
+    """Stored journal entries most similar to a piece of text (cosine over hashed TF-IDF vectors)"""
+    related = await asyncio.to_thread(find_related, request.text, request.k, request.exclude_id)
+    return {"related": related, "metadata": {"count": len(related), "timestamp": datetime.now().isoformat()}}
+
 # Add new endpoint to get available models
 @app.get("/api/ai/models")
 async def get_available_models():
     """Get list of available AI models"""
     return {
-        "models": ai_service.models,
+        "models": {
+            name: {**info, "circuit": ai_service.breakers[name].stats(), "router": ai_service.router.scores[name].stats()}
+            for name, info in ai_service.models.items()
+        },
+        "auto": {
+            "description": "Fastest healthy model at or above the requested quality tier",
+            "quality_tiers": list(QUALITY_TIERS),
+            "router": ai_service.router.scoreboard()
+        },
+        "huggingface_cold_starts": {
+            "models": ai_service.cold_starts.stats(),
+            "keep_warm": ai_service.warmer.stats()
+        },
         "default": "groq-llama3-8b",
         "groq_connected": bool(ai_service.groq_api_key),
         "hf_connected": bool(ai_service.hf_api_key)
     }
 
-# Railway entry point
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus text exposition of request, model, fallback and token metrics (all workers merged)"""
+    if shared_metrics is not None:
+        return PlainTextResponse(shared_metrics.exposition(), media_type="text/plain; version=0.0.4")
+    return PlainTextResponse(metrics.exposition(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/admin/http-pool")
+async def get_http_pool_stats():
+    """Connection pool usage per provider, for sizing the pool limits"""
+    return {
+        "pools": ai_service.pool_stats(),
+        "http2_available": HTTP2_AVAILABLE,
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/api/admin/rate-limits")
+async def get_rate_limit_state():
+    """Token bucket levels, queueing and 429 counters per provider model"""
+    return {
+        "limiters": ai_service.rate_limiter.stats(),
+        "settings": ai_service.rate_limiter.provider_settings,
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/api/admin/jobs")
+async def get_job_stats():
+    """Job queue counters and jobs by status"""
+    return {"jobs": job_queue.stats(), "timestamp": datetime.now().isoformat()}
+
+@app.get("/api/admin/journal")
+async def get_journal_store_stats():
+    """Journal store size, journal mode and connection pool usage"""
+    return {
+        "store": await asyncio.to_thread(journal_store.stats),
+        "summary_tree": summary_tree.counters,
+        "similarity_index": similarity_index.stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/api/admin/cache")
+async def get_cache_stats():
+    """Result cache hit/miss counters, occupancy and in-flight coalescing"""
+    return {
+        "cache": ai_service.cache.stats(),
+        "coalescing": ai_service.inflight.stats(),
+        "prompt_version": PROMPT_VERSION,
+        "timestamp": datetime.now().isoformat()
+    }
+
+# Railway entry point; API_WORKERS=N (or "auto", one per CPU) runs N worker processes
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 8000))
+    workers = worker_count(os.getenv("API_WORKERS"))
+    prepare_workers(workers)
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
         port=port,
-        reload=False
+        reload=False,
+        workers=workers,
+        timeout_graceful_shutdown=SHUTDOWN_DRAIN_SECONDS
     )
@@ -0,0 +1,300 @@
+# Minimal Prometheus-style metrics - counters, gauges and histograms in text exposition format
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 45.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+    # How worker processes' samples combine (see SharedMetrics): "sum", or "max" for states
+    aggregate = "sum"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> Dict[LabelValues, float]:
+        return {}
+
+    def collect(self, samples: Optional[Dict[LabelValues, Any]] = None) -> List[str]:
+        """Exposition lines for this process's samples, or for `samples` merged from several"""
+        samples = self.samples() if samples is None else samples
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in sorted(samples.items())
+        ]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def samples(self) -> Dict[LabelValues, float]:
+        return dict(self._values)
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels: str, value: float):
+        self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelValues, list] = {}
+
+    def observe(self, *labels: str, value: float):
+        series = self._series.get(labels)
+        if series is None:
+            # per-bucket counts (+Inf last), then sum
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return sum(series[:-1]) if series else 0
+
+    def samples(self) -> Dict[LabelValues, list]:
+        return {labels: list(series) for labels, series in self._series.items()}
+
+    def collect(self, samples: Optional[Dict[LabelValues, Any]] = None) -> List[str]:
+        lines = self.header()
+        for labels, series in sorted((self.samples() if samples is None else samples).items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += bucket_count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class CallbackMetric(_Metric):
+    """Gauge or counter whose samples are read from a callback at scrape time"""
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str], callback: Callable[[], Dict[LabelValues, float]],
+        kind: str = "gauge", aggregate: str = "sum"
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+        self.kind = kind
+        self.aggregate = aggregate
+
+    def samples(self) -> Dict[LabelValues, float]:
+        return self.callback()
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name: str, documentation: str, labelnames: Sequence[str], callback, kind: str = "gauge", aggregate: str = "sum") -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, labelnames, callback, kind, aggregate))
+
+    def snapshot(self) -> Dict[str, list]:
+        """Every metric's samples as JSON-serializable [labels, value] pairs"""
+        return {metric.name: [[list(labels), value] for labels, value in metric.samples().items()] for metric in self._metrics}
+
+    def exposition(self, snapshots: Optional[List[Dict[str, list]]] = None) -> str:
+        """Text exposition of this process's metrics, or of several processes' snapshots merged"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect() if snapshots is None else metric.collect(_merge(metric, snapshots)))
+        return "\n".join(lines) + "\n"
+
+
+def _merge(metric: _Metric, snapshots: List[Dict[str, list]]) -> Dict[LabelValues, Any]:
+    merged: Dict[LabelValues, Any] = {}
+    for snapshot in snapshots:
+        for labels, value in snapshot.get(metric.name, []):
+            labels = tuple(labels)
+            current = merged.get(labels)
+            if current is None:
+                merged[labels] = value
+            elif isinstance(value, list):
+                merged[labels] = [a + b for a, b in zip(current, value)]
+            else:
+                merged[labels] = max(current, value) if metric.aggregate == "max" else current + value
+    return merged
+
+
+class SharedMetrics:
+    """Metrics for a server of several worker processes, merged through SQLite.
+
+    Each worker publishes a snapshot of its registry every `interval`
+    seconds (and whenever it serves a scrape); a scrape merges the
+    snapshots of every worker seen within `stale_after` seconds, so
+    whichever worker answers /metrics reports the whole server. Snapshots
+    of workers that stopped publishing are dropped, which Prometheus reads
+    as a counter reset.
+    """
+
+    def __init__(self, registry: MetricsRegistry, path: str, interval: float = 5.0, stale_after: float = 30.0):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self.stale_after = stale_after
+        self.worker = os.getpid()
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls, registry: MetricsRegistry) -> Optional["SharedMetrics"]:
+        """Shared metrics when METRICS_SHARED_PATH is set, else None (metrics stay per process)"""
+        path = os.getenv("METRICS_SHARED_PATH")
+        if not path:
+            return None
+        return cls(registry, path, interval=float(os.getenv("METRICS_PUBLISH_SECONDS", 5)))
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._db is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS worker_metrics ("
+                "worker INTEGER PRIMARY KEY, snapshot TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+        return self._db
+
+    def publish(self):
+        snapshot = json.dumps(self.registry.snapshot())
+        now = time.time()
+        with self._lock:
+            db = self._connection()
+            db.execute(
+                "INSERT OR REPLACE INTO worker_metrics (worker, snapshot, updated_at) VALUES (?, ?, ?)",
+                (self.worker, snapshot, now)
+            )
+            db.execute("DELETE FROM worker_metrics WHERE updated_at < ?", (now - self.stale_after, ))
+
+    def exposition(self) -> str:
+        """This worker's snapshot, published now, merged with every live worker's"""
+        self.publish()
+        with self._lock:
+            rows = self._connection().execute("SELECT snapshot FROM worker_metrics ORDER BY worker").fetchall()
+        return self.registry.exposition([json.loads(snapshot) for (snapshot, ) in rows])
+
+    def workers(self) -> int:
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(*) FROM worker_metrics").fetchone()[0]
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Stop publishing and withdraw this worker's snapshot"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        with self._lock:
+            if self._db is not None:
+                self._db.execute("DELETE FROM worker_metrics WHERE worker = ?", (self.worker, ))
+                self._db.close()
+                self._db = None
+
+    async def _run(self):
+        while True:
+            self.publish()
+            await asyncio.sleep(self.interval)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request counts, latency and in-flight requests per route"""
+
+    def __init__(self, app, requests: Counter, latency: Histogram, in_flight: Gauge):
+        self.app = app
+        self.requests = requests
+        self.latency = latency
+        self.in_flight = in_flight
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        self.in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.in_flight.dec()
+            route = scope.get("route")
+            endpoint = getattr(route, "path", "unmatched")
+            self.requests.inc(endpoint, scope["method"], str(status["code"]))
+            self.latency.observe(endpoint, value=time.perf_counter() - started)
@@ -0,0 +1,122 @@
+# Adaptive model routing - pick the fastest healthy model from live latency, error and queue stats
+import os
+import time
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional
+
+# Quality tiers a request can ask for; a model serves its own tier and every tier below it
+QUALITY_TIERS = {"standard": 1, "high": 2, "best": 3}
+
+
+class ModelScore:
+    """Exponentially weighted latency and error rate plus current queue depth for one model"""
+
+    def __init__(self, prior_latency: float):
+        self.latency = prior_latency
+        self.error_rate = 0.0
+        self.in_flight = 0
+        self.samples = 0
+        self.last_used = 0.0
+
+    def stats(self) -> dict:
+        return {
+            "ewma_latency_seconds": round(self.latency, 3),
+            "ewma_error_rate": round(self.error_rate, 3),
+            "in_flight": self.in_flight,
+            "samples": self.samples
+        }
+
+
+class AdaptiveRouter:
+    """Scores models by expected time to a good answer and picks the lowest.
+
+    expected cost = EWMA latency x (1 + queued calls / concurrency)
+                    + EWMA error rate x error_penalty
+
+    Models without samples start from an optimistic prior latency so they get
+    tried. A model whose error rate reaches `max_error_rate` is skipped until
+    its EWMA recovers; to let that happen, a skipped model that has not been
+    used for `explore_seconds` is occasionally chosen again if it is otherwise
+    eligible (its circuit is not open).
+    """
+
+    def __init__(
+        self,
+        model_names: List[str],
+        alpha: float = 0.2,
+        prior_latency: float = 1.0,
+        error_penalty: float = 10.0,
+        max_error_rate: float = 0.5,
+        concurrency: int = 8,
+        explore_seconds: float = 60.0
+    ):
+        self.alpha = alpha
+        self.error_penalty = error_penalty
+        self.max_error_rate = max_error_rate
+        self.concurrency = concurrency
+        self.explore_seconds = explore_seconds
+        self.scores: Dict[str, ModelScore] = {name: ModelScore(prior_latency) for name in model_names}
+        self.decisions: Deque[dict] = deque(maxlen=20)
+
+    @classmethod
+    def from_env(cls, model_names: List[str]) -> "AdaptiveRouter":
+        return cls(
+            model_names,
+            alpha=float(os.getenv("ROUTER_EWMA_ALPHA", 0.2)),
+            prior_latency=float(os.getenv("ROUTER_PRIOR_LATENCY_SECONDS", 1.0)),
+            error_penalty=float(os.getenv("ROUTER_ERROR_PENALTY_SECONDS", 10.0)),
+            max_error_rate=float(os.getenv("ROUTER_MAX_ERROR_RATE", 0.5)),
+            concurrency=int(os.getenv("ROUTER_CONCURRENCY", 8)),
+            explore_seconds=float(os.getenv("ROUTER_EXPLORE_SECONDS", 60))
+        )
+
+    def cost(self, model: str) -> float:
+        score = self.scores[model]
+        return score.latency * (1 + score.in_flight / self.concurrency) + score.error_rate * self.error_penalty
+
+    def started(self, model: str):
+        score = self.scores[model]
+        score.in_flight += 1
+        score.last_used = time.monotonic()
+
+    def finished(self, model: str):
+        self.scores[model].in_flight -= 1
+
+    def record(self, model: str, latency: float, ok: bool):
+        """Fold one completed call into the model's EWMAs (latency only from good answers)"""
+        score = self.scores[model]
+        if ok:
+            score.latency = latency if score.samples == 0 else score.latency + self.alpha * (latency - score.latency)
+        score.error_rate += self.alpha * ((0.0 if ok else 1.0) - score.error_rate)
+        score.samples += 1
+
+    def choose(self, candidates: List[str], task_type: str, tier: str) -> Optional[str]:
+        """Lowest-cost healthy candidate; logs the decision for the scoreboard"""
+        if not candidates:
+            return None
+        healthy = [name for name in candidates if self.scores[name].error_rate < self.max_error_rate]
+        now = time.monotonic()
+        stale = [name for name in candidates if name not in healthy and now - self.scores[name].last_used >= self.explore_seconds]
+        if stale:
+            chosen, reason = stale[0], "explore"
+        elif healthy:
+            chosen, reason = min(healthy, key=self.cost), "lowest_cost"
+        else:
+            chosen, reason = min(candidates, key=self.cost), "all_degraded"
+
+        self.decisions.append({
+            "task": task_type,
+            "tier": tier,
+            "chosen": chosen,
+            "reason": reason,
+            "costs": {name: round(self.cost(name), 3) for name in candidates},
+            "at": datetime.now().isoformat()
+        })
+        return chosen
+
+    def scoreboard(self) -> dict:
+        return {
+            "models": {name: {**score.stats(), "expected_cost": round(self.cost(name), 3)} for name, score in self.scores.items()},
+            "recent_decisions": list(self.decisions)
+        }
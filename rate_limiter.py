@@ -0,0 +1,232 @@
+# Per-provider, per-model rate limiting for outbound AI calls
+import asyncio
+import os
+import re
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Dict, Mapping, Optional, Tuple
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a call would have to queue longer than the allowed wait"""
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parse rate-limit reset values such as '7.66s', '2m59.56s', '1h2m' or '120ms'"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", value)
+    if not parts:
+        return None
+    scale = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+    return sum(float(number) * scale[unit] for number, unit in parts)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After as delta-seconds or an HTTP date"""
+    if not value:
+        return None
+    seconds = parse_duration(value)
+    if seconds is not None:
+        return max(seconds, 0.0)
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Continuously refilling bucket sized for a per-minute budget (0 = unlimited)"""
+
+    def __init__(self, per_minute: float):
+        self.per_minute = per_minute
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.per_minute <= 0
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated
+        self.updated = now
+        self.level = min(self.capacity, self.level + elapsed * self.per_minute / 60.0)
+
+    def available(self, now: float) -> float:
+        self._refill(now)
+        return self.level
+
+    def delay_for(self, amount: float, now: float) -> float:
+        """Seconds until `amount` units are available"""
+        if self.unlimited:
+            return 0.0
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) * 60.0 / self.per_minute
+
+    def consume(self, amount: float):
+        if not self.unlimited:
+            self.level = min(self.capacity, self.level - amount)
+
+    def cap(self, remaining: float):
+        """Never believe we have more budget than the provider says remains"""
+        if not self.unlimited:
+            self.level = min(self.level, remaining)
+
+
+class ModelLimiter:
+    """Request and token buckets plus a concurrency semaphore for one provider model"""
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float, max_concurrency: int, max_wait: float):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.max_wait = max_wait
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.blocked_until = 0.0
+        self.in_flight = 0
+        self.waiting = 0
+        self.counters = {
+            "requests": 0,
+            "queued": 0,
+            "throttled": 0,
+            "rejected": 0,
+            "wait_seconds": 0.0
+        }
+
+    @asynccontextmanager
+    async def slot(self, estimated_tokens: int = 0, max_wait: Optional[float] = None):
+        """Hold a concurrency slot, waiting (up to max_wait, or the caller's shorter max_wait) for bucket budget"""
+        started = time.monotonic()
+        wait = self.max_wait if max_wait is None else min(self.max_wait, max_wait)
+        deadline = started + wait
+        self.waiting += 1
+        try:
+            try:
+                await asyncio.wait_for(self.semaphore.acquire(), timeout=wait)
+            except asyncio.TimeoutError:
+                self.counters["rejected"] += 1
+                raise RateLimitExceeded("no free concurrency slot within the allowed wait")
+            try:
+                while True:
+                    now = time.monotonic()
+                    delay = max(
+                        self.blocked_until - now,
+                        self.requests.delay_for(1, now),
+                        self.tokens.delay_for(estimated_tokens, now)
+                    )
+                    if delay <= 0:
+                        break
+                    if now + delay > deadline:
+                        self.counters["rejected"] += 1
+                        raise RateLimitExceeded(f"rate limit budget frees up in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+            except BaseException:
+                self.semaphore.release()
+                raise
+        finally:
+            self.waiting -= 1
+
+        waited = time.monotonic() - started
+        if waited > 0.001:
+            self.counters["queued"] += 1
+            self.counters["wait_seconds"] += waited
+        self.requests.consume(1)
+        self.tokens.consume(estimated_tokens)
+        self.counters["requests"] += 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self.semaphore.release()
+
+    def observe(self, status_code: int, headers: Mapping[str, str]):
+        """Adapt to Retry-After and x-ratelimit-* headers from an upstream response"""
+        now = time.monotonic()
+        if status_code == 429:
+            self.counters["throttled"] += 1
+            retry_after = parse_retry_after(headers.get("retry-after"))
+            self.blocked_until = max(self.blocked_until, now + (retry_after if retry_after is not None else 1.0))
+
+        for kind, bucket in (("requests", self.requests), ("tokens", self.tokens)):
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            if remaining is None:
+                continue
+            try:
+                remaining_value = float(remaining)
+            except ValueError:
+                continue
+            bucket.cap(remaining_value)
+            reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+            if remaining_value <= 0 and reset is not None:
+                self.blocked_until = max(self.blocked_until, now + reset)
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: int):
+        """Correct the token bucket once the real usage is known"""
+        self.tokens.consume(actual_tokens - estimated_tokens)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            **self.counters,
+            "wait_seconds": round(self.counters["wait_seconds"], 3),
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "requests_available": None if self.requests.unlimited else round(self.requests.available(now), 2),
+            "tokens_available": None if self.tokens.unlimited else round(self.tokens.available(now), 1),
+            "requests_per_minute": self.requests.per_minute,
+            "tokens_per_minute": self.tokens.per_minute,
+            "blocked_for_seconds": round(max(self.blocked_until - now, 0.0), 3)
+        }
+
+
+class RateLimiter:
+    """Registry of ModelLimiters keyed by (provider, model)"""
+
+    def __init__(self, provider_settings: Dict[str, dict]):
+        self.provider_settings = provider_settings
+        self._limiters: Dict[Tuple[str, str], ModelLimiter] = {}
+
+    @classmethod
+    def from_env(cls, workers: int = 1) -> "RateLimiter":
+        """Provider budgets from the environment; they are per server, so each of `workers` processes gets an even share"""
+        max_wait = float(os.getenv("RATE_LIMIT_MAX_WAIT", 10.0))
+        return cls({
+            "groq": {
+                "requests_per_minute": float(os.getenv("GROQ_RPM", 30)) / workers,
+                "tokens_per_minute": float(os.getenv("GROQ_TPM", 14400)) / workers,
+                "max_concurrency": max(int(os.getenv("GROQ_MAX_CONCURRENCY", 8)) // workers, 1),
+                "max_wait": max_wait
+            },
+            "huggingface": {
+                "requests_per_minute": float(os.getenv("HF_RPM", 60)) / workers,
+                "tokens_per_minute": float(os.getenv("HF_TPM", 0)) / workers,
+                "max_concurrency": max(int(os.getenv("HF_MAX_CONCURRENCY", 4)) // workers, 1),
+                "max_wait": max_wait
+            }
+        })
+
+    def for_model(self, provider: str, model: str) -> ModelLimiter:
+        key = (provider, model)
+        limiter = self._limiters.get(key)
+        if limiter is None:
+            limiter = ModelLimiter(**self.provider_settings[provider])
+            self._limiters[key] = limiter
+        return limiter
+
+    def stats(self) -> dict:
+        return {
+            f"{provider}/{model}": limiter.stats()
+            for (provider, model), limiter in sorted(self._limiters.items())
+        }
@@ -0,0 +1,217 @@
+# Result cache for AI task responses - in-memory LRU/TTL with optional SQLite tier
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+def cache_key(task_type: str, text: str, model: str, prompt_version: str) -> str:
+    """Stable key from a hash of the entry text plus task, model and prompt version"""
+    text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return f"{prompt_version}:{task_type}:{model}:{text_hash}"
+
+
+class ResultCache:
+    """Bounded LRU cache with per-entry TTL and an optional on-disk SQLite tier.
+
+    Values are stored as JSON so every hit returns a fresh copy that callers
+    can safely mutate.
+
+    Worker processes sharing one SQLite file share its entries, and `claim`
+    lets one process compute a missing key while the others wait for its
+    result instead of computing the same thing.
+
+    SQLite calls block, so async callers should make them from a worker
+    thread when `persistent` (the memory tier alone never waits on disk).
+    Expired rows are pruned by `put` every `prune_seconds`.
+    """
+
+    def __init__(
+        self, max_entries: int = 1024, ttl_seconds: float = 3600.0, sqlite_path: Optional[str] = None,
+        claim_seconds: float = 90.0, prune_seconds: float = 300.0
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.sqlite_path = sqlite_path
+        self.claim_seconds = claim_seconds
+        self.prune_seconds = prune_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # Separate locks so memory lookups never queue behind a disk write
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._next_prune = 0.0
+        self.counters = {
+            "hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expired": 0,
+            "claims": 0,
+            "claim_waits": 0,
+            "pruned": 0
+        }
+        if sqlite_path:
+            self._open_db(sqlite_path)
+
+    @classmethod
+    def from_env(cls) -> "ResultCache":
+        return cls(
+            max_entries=int(os.getenv("AI_CACHE_MAX_ENTRIES", 1024)),
+            ttl_seconds=float(os.getenv("CACHE_TTL", 3600)),
+            sqlite_path=os.getenv("AI_CACHE_SQLITE_PATH") or None,
+            claim_seconds=float(os.getenv("AI_CACHE_CLAIM_SECONDS", 90)),
+            prune_seconds=float(os.getenv("AI_CACHE_PRUNE_SECONDS", 300))
+        )
+
+    def _open_db(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS ai_result_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS ai_result_claims ("
+            "key TEXT PRIMARY KEY, owner INTEGER NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._prune(time.time())
+
+    @property
+    def persistent(self) -> bool:
+        """Whether lookups and stores may touch the SQLite tier"""
+        return self._db is not None
+
+    def get(self, key: str, memory_only: bool = False) -> Optional[dict]:
+        """Cached value for `key`; with memory_only, a memory miss returns None without reading disk or counting a miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at >= now:
+                    self._entries.move_to_end(key)
+                    self.counters["hits"] += 1
+                    return json.loads(value)
+                del self._entries[key]
+                self.counters["expired"] += 1
+        if memory_only and self._db is not None:
+            return None
+
+        if self._db is not None:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM ai_result_cache WHERE key = ?", (key,)
+                ).fetchone()
+            if row is not None and row[1] >= now:
+                with self._lock:
+                    self._remember(key, row[0], row[1])
+                    self.counters["disk_hits"] += 1
+                return json.loads(row[0])
+
+        with self._lock:
+            self.counters["misses"] += 1
+        return None
+
+    def put(self, key: str, value: dict):
+        serialized = json.dumps(value)
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        with self._lock:
+            self._remember(key, serialized, expires_at)
+            self.counters["stores"] += 1
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO ai_result_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, serialized, expires_at)
+                )
+            if now >= self._next_prune:
+                self._prune(now)
+
+    def _prune(self, now: float):
+        """Delete expired cache rows and claims from the SQLite tier"""
+        self._next_prune = now + self.prune_seconds
+        with self._db_lock:
+            pruned = self._db.execute("DELETE FROM ai_result_cache WHERE expires_at < ?", (now,)).rowcount
+            self._db.execute("DELETE FROM ai_result_claims WHERE expires_at < ?", (now,))
+        self.counters["pruned"] += pruned
+
+    def claim(self, key: str) -> bool:
+        """Take the cross-process claim to compute `key` for claim_seconds; False while another process holds it.
+
+        Claims expire on their own, so a worker that dies mid-call only
+        delays the others. Without the SQLite tier every claim succeeds.
+        """
+        if self._db is None:
+            return True
+        now = time.time()
+        owner = os.getpid()
+        with self._db_lock:
+            self._db.execute("DELETE FROM ai_result_claims WHERE key = ? AND expires_at < ?", (key, now))
+            self._db.execute(
+                "INSERT OR IGNORE INTO ai_result_claims (key, owner, expires_at) VALUES (?, ?, ?)",
+                (key, owner, now + self.claim_seconds)
+            )
+            row = self._db.execute("SELECT owner FROM ai_result_claims WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[0] == owner:
+                self.counters["claims"] += 1
+                return True
+            self.counters["claim_waits"] += 1
+            return False
+
+    def claimed(self, key: str) -> bool:
+        """Another process holds a live claim on `key`"""
+        if self._db is None:
+            return False
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT 1 FROM ai_result_claims WHERE key = ? AND owner != ? AND expires_at >= ?",
+                (key, os.getpid(), time.time())
+            ).fetchone()
+        return row is not None
+
+    def release(self, key: str):
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM ai_result_claims WHERE key = ? AND owner = ?", (key, os.getpid()))
+
+    def _remember(self, key: str, serialized: str, expires_at: float):
+        self._entries[key] = (serialized, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM ai_result_cache")
+
+    def close(self):
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def stats(self) -> dict:
+        lookups = self.counters["hits"] + self.counters["disk_hits"] + self.counters["misses"]
+        hits = self.counters["hits"] + self.counters["disk_hits"]
+        return {
+            **self.counters,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "sqlite_path": self.sqlite_path
+        }
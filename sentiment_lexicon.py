@@ -0,0 +1,161 @@
+# Lexicon sentiment engine - weighted valence with negation and intensifiers, scored in NumPy batches
+import re
+from itertools import repeat
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+# Valence on a -4..+4 scale, tuned for first-person journal writing
+VALENCE: Dict[str, float] = {
+    # positive
+    "happy": 2.7, "happier": 2.6, "happiest": 3.0, "happiness": 2.6, "glad": 2.0, "joy": 2.8, "joyful": 2.9,
+    "love": 3.2, "loved": 2.9, "loving": 2.9, "lovely": 2.8, "good": 1.9, "better": 1.9, "best": 3.2,
+    "great": 3.1, "excellent": 3.2, "amazing": 2.8, "awesome": 3.1, "wonderful": 2.7, "fantastic": 2.6,
+    "beautiful": 2.9, "excited": 2.4, "exciting": 2.2, "thrilled": 2.8, "grateful": 2.7, "thankful": 2.6,
+    "proud": 2.1, "calm": 1.3, "peaceful": 2.2, "relaxed": 2.2, "relieved": 1.9, "relief": 1.6,
+    "hopeful": 2.2, "hope": 1.9, "optimistic": 2.2, "confident": 2.2, "content": 1.6, "satisfied": 1.8,
+    "fun": 2.3, "enjoy": 2.2, "enjoyed": 2.3, "laugh": 2.2, "laughed": 2.0, "smile": 1.5, "smiled": 1.7,
+    "success": 2.7, "successful": 2.8, "accomplished": 2.3, "achieved": 1.9, "win": 2.8, "won": 2.7,
+    "motivated": 1.8, "inspired": 2.2, "energized": 2.0, "energetic": 1.8, "productive": 1.6, "progress": 1.5,
+    "blessed": 2.9, "kind": 2.4, "friendly": 2.2, "support": 1.7, "supported": 1.9, "safe": 1.9,
+    "comfortable": 1.5, "nice": 1.8, "pleasant": 2.3, "delighted": 3.1, "cheerful": 2.5, "fine": 0.8,
+    "okay": 0.9, "ok": 0.9, "healthy": 1.7, "rested": 1.2, "strong": 1.3, "brave": 2.4, "free": 1.5,
+    # negative
+    "sad": -2.1, "sadness": -1.9, "unhappy": -1.8, "depressed": -2.3, "depressing": -2.0, "down": -0.8,
+    "bad": -2.5, "worse": -2.1, "worst": -3.1, "terrible": -2.5, "awful": -2.0, "horrible": -2.5,
+    "hate": -2.7, "hated": -3.2, "angry": -2.3, "anger": -2.7, "mad": -2.2, "furious": -2.7,
+    "frustrated": -2.4, "frustrating": -1.9, "annoyed": -1.6, "annoying": -1.7, "irritated": -1.8,
+    "disappointed": -1.9, "disappointing": -2.2, "upset": -1.6, "hurt": -2.4, "pain": -2.3, "painful": -2.4,
+    "anxious": -1.0, "anxiety": -0.7, "worried": -1.2, "worry": -1.9, "nervous": -1.1, "scared": -2.2,
+    "afraid": -2.2, "fear": -2.2, "stressed": -1.4, "stress": -1.8, "stressful": -1.7, "overwhelmed": -1.5,
+    "tired": -1.2, "exhausted": -1.5, "drained": -1.5, "lonely": -1.5, "alone": -1.0, "lost": -1.3,
+    "cry": -2.1, "cried": -1.6, "crying": -2.1, "miserable": -2.2, "hopeless": -2.0, "helpless": -2.0,
+    "guilty": -1.8, "ashamed": -2.1, "embarrassed": -1.5, "regret": -1.8, "failed": -2.3, "failure": -2.4,
+    "fail": -2.5, "sick": -1.7, "ill": -1.8, "broken": -2.2, "bored": -1.1, "boring": -1.3, "confused": -1.3,
+    "jealous": -2.0, "bitter": -1.8, "grief": -2.2, "mourning": -1.9, "lose": -1.3, "struggle": -1.3,
+    "struggled": -1.4, "struggling": -1.4, "difficult": -1.5, "hard": -0.4, "rough": -0.7, "problem": -1.7,
+    "problems": -1.7, "wrong": -2.1, "mess": -1.5, "ugly": -2.3, "unfair": -2.1, "rejected": -2.2
+}
+
+# Words that flip the valence of the next few words in the same clause
+NEGATIONS = frozenset({
+    "not", "no", "never", "none", "nobody", "nothing", "neither", "nor", "nowhere", "without", "hardly",
+    "barely", "cannot", "cant", "can't", "don't", "dont", "doesn't", "doesnt", "didn't", "didnt",
+    "isn't", "isnt", "wasn't", "wasnt", "aren't", "arent", "weren't", "werent", "won't", "wont",
+    "wouldn't", "wouldnt", "shouldn't", "shouldnt", "couldn't", "couldnt", "haven't", "havent",
+    "hasn't", "hasnt", "hadn't", "hadnt", "ain't", "aint"
+})
+
+# Multipliers applied to the word that immediately follows
+INTENSIFIERS: Dict[str, float] = {
+    "very": 1.3, "really": 1.3, "so": 1.25, "extremely": 1.5, "incredibly": 1.5, "super": 1.35,
+    "totally": 1.3, "completely": 1.35, "absolutely": 1.4, "deeply": 1.4, "truly": 1.3, "quite": 1.15,
+    "too": 1.2, "especially": 1.2, "utterly": 1.45, "highly": 1.3,
+    "slightly": 0.6, "somewhat": 0.75, "kinda": 0.75, "little": 0.7, "bit": 0.7,
+    "mildly": 0.6, "fairly": 0.85, "pretty": 1.1, "almost": 0.8
+}
+
+# Clause boundaries end a negation's scope
+BOUNDARIES = frozenset({".", "!", "?", ";", "but"})
+
+TOKEN_PATTERN = re.compile(r"[a-z]+(?:'[a-z]+)?|[.!?;]")
+
+NEGATION_SCALE = -0.74
+NEGATION_WINDOW = 3
+NORMALIZATION_ALPHA = 15.0
+NEUTRAL_BAND = 0.05
+
+
+class LexiconSentiment:
+    """Vectorized lexicon sentiment scorer.
+
+    Every known token (valence words, negations, intensifiers, boundaries) gets
+    an integer id; per-id lookup tables hold its valence, intensifier boost and
+    flags. A batch is tokenized once into a flat id array and scored with array
+    operations, so scoring cost is one regex pass plus a few NumPy ops per batch.
+    """
+
+    def __init__(
+        self,
+        valence: Dict[str, float] = VALENCE,
+        negations: Iterable[str] = NEGATIONS,
+        intensifiers: Dict[str, float] = INTENSIFIERS,
+        boundaries: Iterable[str] = BOUNDARIES
+    ):
+        vocabulary = sorted(set(valence) | set(negations) | set(intensifiers) | set(boundaries))
+        self.ids = {word: i for i, word in enumerate(vocabulary)}
+        self.unknown = len(vocabulary)
+
+        size = len(vocabulary) + 1
+        self.valence = np.zeros(size, dtype=np.float64)
+        self.boost = np.ones(size, dtype=np.float64)
+        self.is_negation = np.zeros(size, dtype=bool)
+        self.is_boundary = np.zeros(size, dtype=bool)
+        for word, value in valence.items():
+            self.valence[self.ids[word]] = value
+        for word, value in intensifiers.items():
+            self.boost[self.ids[word]] = value
+        self.is_negation[[self.ids[word] for word in negations]] = True
+        self.is_boundary[[self.ids[word] for word in boundaries]] = True
+
+    def _token_ids(self, texts: List[str]):
+        ids: List[int] = []
+        lengths = np.empty(len(texts), dtype=np.int64)
+        lookup, unknown = self.ids.get, self.unknown
+        for i, text in enumerate(texts):
+            start = len(ids)
+            ids.extend(map(lookup, TOKEN_PATTERN.findall(text.lower()), repeat(unknown)))
+            lengths[i] = len(ids) - start
+        return np.array(ids, dtype=np.int64), lengths
+
+    def score_batch(self, texts: List[str]) -> List[dict]:
+        """Score many texts in one vectorized pass"""
+        if not texts:
+            return []
+        ids, lengths = self._token_ids(texts)
+        count = len(texts)
+        doc = np.repeat(np.arange(count), lengths)
+        positions = np.arange(len(ids))
+        doc_start = np.zeros(len(ids), dtype=bool)
+        doc_start[(np.cumsum(lengths) - lengths)[lengths > 0]] = True
+
+        # Negation scope: a negator within NEGATION_WINDOW tokens before, with no
+        # clause boundary or document start in between
+        last_negation = np.maximum.accumulate(np.where(self.is_negation[ids], positions, -1))
+        previous_negation = np.full(len(ids), -1, dtype=np.int64)
+        previous_negation[1:] = last_negation[:-1]
+        last_boundary = np.maximum.accumulate(np.where(self.is_boundary[ids] | doc_start, positions, -1))
+        negated = (previous_negation >= last_boundary) & (positions - previous_negation <= NEGATION_WINDOW)
+
+        # Intensifier: boost from the immediately preceding token of the same document
+        boost = np.ones(len(ids))
+        boost[1:] = self.boost[ids[:-1]]
+        boost[doc_start] = 1.0
+
+        valence = self.valence[ids]
+        contributions = valence * boost * np.where(negated, NEGATION_SCALE, 1.0)
+        totals = np.bincount(doc, weights=contributions, minlength=count)
+        positive = np.bincount(doc, weights=np.clip(contributions, 0, None), minlength=count)
+        negative = np.bincount(doc, weights=np.clip(-contributions, 0, None), minlength=count)
+        matches = np.bincount(doc, weights=valence != 0, minlength=count)
+
+        scores = totals / np.sqrt(totals * totals + NORMALIZATION_ALPHA)
+        # Confidence grows with the strength of the score and with lexicon coverage
+        coverage = matches / (matches + 2.0)
+        confidence = 0.5 + 0.45 * np.where(np.abs(scores) < NEUTRAL_BAND, 1.0 - np.abs(scores), np.abs(scores)) * coverage
+        labels = np.where(scores >= NEUTRAL_BAND, "positive", np.where(scores <= -NEUTRAL_BAND, "negative", "neutral"))
+
+        return [
+            {
+                "sentiment": str(labels[i]),
+                "score": round(float(scores[i]), 4),
+                "confidence": round(float(confidence[i]), 3),
+                "positive": round(float(positive[i]), 3),
+                "negative": round(float(negative[i]), 3),
+                "matches": int(matches[i])
+            }
+            for i in range(count)
+        ]
+
+    def score(self, text: str) -> dict:
+        return self.score_batch([text])[0]
@@ -0,0 +1,46 @@
+# Serving configuration - uvicorn worker count and the shared state a multi-worker server needs
+import os
+from typing import MutableMapping, Optional
+
+# State every worker must reach for multi-worker mode to behave like one server: the
+# result cache (so workers don't re-analyze the same entries), merged metrics, and
+# jobs (a job submitted to one worker can be polled through any other)
+SHARED_STATE_DEFAULTS = {
+    "AI_CACHE_SQLITE_PATH": "./data/ai_cache.db",
+    "METRICS_SHARED_PATH": "./data/metrics.db",
+    "JOB_SQLITE_PATH": "./data/jobs.db"
+}
+
+
+def available_cpus() -> int:
+    """CPUs this process may run on (respects affinity masks and container cpusets)"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+
+def worker_count(setting: Optional[str]) -> int:
+    """Worker processes for an API_WORKERS setting: a number, or "auto" for one per available CPU"""
+    if not setting:
+        return 1
+    if setting.strip().lower() == "auto":
+        return available_cpus()
+    return max(int(setting), 1)
+
+
+def configured_workers() -> int:
+    """Worker count this server runs with (set for every worker by `prepare_workers`)"""
+    return max(int(os.getenv("SERVER_WORKERS", 1)), 1)
+
+
+def prepare_workers(workers: int, environ: MutableMapping[str, str] = os.environ):
+    """Record the worker count and point unset shared-state paths at SQLite files before the workers start.
+
+    Worker processes inherit this environment, so each one sees the same
+    paths and can split per-server budgets (see `configured_workers`).
+    """
+    environ["SERVER_WORKERS"] = str(workers)
+    if workers > 1:
+        for name, default in SHARED_STATE_DEFAULTS.items():
+            if not environ.get(name):
+                environ[name] = default
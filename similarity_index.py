@@ -0,0 +1,245 @@
+# Related-entry search - hashed TF-IDF vectors in memory-mapped NumPy arrays with top-k cosine queries
+import json
+import os
+import threading
+import zlib
+from collections import Counter
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from extractive_summary import STOPWORDS, TOKEN_PATTERN
+from theme_index import stem
+
+# Document frequencies are kept per hashed term in a table of this many slots
+DF_SLOTS = 1 << 20
+REBUILD_BATCH = 4096
+
+
+def term_hashes(text: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Stable 32-bit hashes of the entry's distinct stemmed terms and their counts"""
+    counts = Counter(stem(token) for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS)
+    hashes = np.fromiter((zlib.crc32(term.encode("utf-8")) for term in counts), dtype=np.uint32, count=len(counts))
+    tf = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+    return hashes, tf
+
+
+class SimilarityIndex:
+    """Top-k cosine search over entries embedded as hashed TF-IDF vectors.
+
+    Each entry becomes a `dim`-wide float32 vector: sublinear term frequency
+    times IDF, folded into `dim` buckets with a sign bit from the term hash
+    (the hashing trick), then L2-normalized, so a query is one matrix-vector
+    product and an argpartition. Rows and document frequencies live in
+    memory-mapped .npy files under `directory` (in memory when None), opened
+    on first use.
+
+    IDF is taken at insert time, and edits or deletions do not take terms
+    back out of the document frequencies; both drift slightly until the next
+    `rebuild`, which recomputes everything from the stored entries in
+    vectorized batches.
+    """
+
+    def __init__(self, directory: Optional[str] = None, dim: int = 512, capacity: int = 1024):
+        self.directory = directory
+        self.dim = dim
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._ready = False
+        self.count = 0
+        self.documents = 0
+        self.fingerprint: Optional[str] = None
+        self.rows = {}
+
+    @classmethod
+    def from_env(cls, workers: int = 1) -> "SimilarityIndex":
+        """Configured index; with several worker processes each keeps its own in memory (the files allow one writer)"""
+        return cls(
+            directory=(os.getenv("SIMILARITY_INDEX_DIR", "./data/similarity") or None) if workers == 1 else None,
+            dim=int(os.getenv("SIMILARITY_DIM", 512))
+        )
+
+    def _ensure_open(self):
+        """Load the saved arrays, or start empty; called with the lock held"""
+        if self._ready:
+            return
+        if not (self.directory and self._load()):
+            self._allocate(self.capacity)
+        self._ready = True
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _array(self, name: str, shape: tuple, dtype) -> np.ndarray:
+        if self.directory is None:
+            return np.zeros(shape, dtype=dtype)
+        return np.lib.format.open_memmap(self._path(f"{name}.tmp.npy"), mode="w+", dtype=dtype, shape=shape)
+
+    def _commit(self, name: str, array: np.ndarray) -> np.ndarray:
+        """Move a freshly written array file into place and reopen it"""
+        if self.directory is None:
+            return array
+        array.flush()
+        del array
+        os.replace(self._path(f"{name}.tmp.npy"), self._path(f"{name}.npy"))
+        return np.load(self._path(f"{name}.npy"), mmap_mode="r+")
+
+    def _allocate(self, capacity: int):
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+        self.vectors = self._commit("vectors", self._array("vectors", (capacity, self.dim), np.float32))
+        self.ids = self._commit("ids", self._array("ids", (capacity, ), np.int64))
+        self.df = self._commit("df", self._array("df", (DF_SLOTS, ), np.int32))
+        self.count = 0
+        self.documents = 0
+        self.rows = {}
+
+    def _load(self) -> bool:
+        try:
+            with open(self._path("meta.json")) as meta_file:
+                meta = json.load(meta_file)
+            if meta["dim"] != self.dim:
+                return False
+            self.vectors = np.load(self._path("vectors.npy"), mmap_mode="r+")
+            self.ids = np.load(self._path("ids.npy"), mmap_mode="r+")
+            self.df = np.load(self._path("df.npy"), mmap_mode="r+")
+        except (OSError, ValueError, KeyError):
+            return False
+        self.count = meta["count"]
+        self.documents = meta["documents"]
+        self.fingerprint = meta.get("fingerprint")
+        self.rows = {int(entry_id): row for row, entry_id in enumerate(self.ids[:self.count]) if entry_id >= 0}
+        return True
+
+    def save(self, fingerprint: Optional[str] = None):
+        """Flush the arrays and record which store state they reflect (see `is_current`)"""
+        with self._lock:
+            self._ensure_open()
+            self.fingerprint = fingerprint
+            if self.directory is None:
+                return
+            for array in (self.vectors, self.ids, self.df):
+                array.flush()
+            meta = {"dim": self.dim, "count": self.count, "documents": self.documents, "fingerprint": fingerprint}
+            with open(self._path("meta.json.tmp"), "w") as meta_file:
+                json.dump(meta, meta_file)
+            os.replace(self._path("meta.json.tmp"), self._path("meta.json"))
+
+    def is_current(self, fingerprint: str) -> bool:
+        with self._lock:
+            self._ensure_open()
+            return self.fingerprint is not None and self.fingerprint == fingerprint
+
+    def _invalidate(self):
+        """Forget the saved fingerprint so a crash before the next save forces a rebuild"""
+        if self.fingerprint is not None:
+            self.fingerprint = None
+            if self.directory is not None and os.path.exists(self._path("meta.json")):
+                os.remove(self._path("meta.json"))
+
+    def _weights(self, hashes: np.ndarray, tf: np.ndarray, documents: int) -> np.ndarray:
+        df = self.df[hashes % DF_SLOTS]
+        return (1.0 + np.log(tf)) * (np.log((1.0 + documents) / (1.0 + df)) + 1.0)
+
+    def _embed(self, hashes: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        signs = np.where(hashes & 0x80000000, -1.0, 1.0)
+        vector = np.bincount(hashes % self.dim, weights=weights * signs, minlength=self.dim).astype(np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def vectorize(self, text: str) -> np.ndarray:
+        hashes, tf = term_hashes(text)
+        with self._lock:
+            self._ensure_open()
+            return self._embed(hashes, self._weights(hashes, tf, self.documents))
+
+    def _grow(self):
+        capacity = max(len(self.ids) * 2, 1)
+        vectors = self._array("vectors", (capacity, self.dim), np.float32)
+        vectors[:self.count] = self.vectors[:self.count]
+        ids = self._array("ids", (capacity, ), np.int64)
+        ids[:self.count] = self.ids[:self.count]
+        self.vectors = self._commit("vectors", vectors)
+        self.ids = self._commit("ids", ids)
+
+    def add(self, entry_id: int, text: str):
+        """Insert or replace one entry's vector"""
+        hashes, tf = term_hashes(text)
+        with self._lock:
+            self._ensure_open()
+            self._invalidate()
+            row = self.rows.get(entry_id)
+            if row is None:
+                np.add.at(self.df, hashes % DF_SLOTS, 1)
+                self.documents += 1
+                if self.count == len(self.ids):
+                    self._grow()
+                row = self.count
+                self.count += 1
+                self.rows[entry_id] = row
+                self.ids[row] = entry_id
+            self.vectors[row] = self._embed(hashes, self._weights(hashes, tf, self.documents))
+
+    def remove(self, entry_id: int):
+        with self._lock:
+            self._ensure_open()
+            row = self.rows.pop(entry_id, None)
+            if row is not None:
+                self._invalidate()
+                self.ids[row] = -1
+                self.vectors[row] = 0.0
+
+    def query(self, text: str, k: int = 5, exclude: Optional[int] = None) -> List[dict]:
+        """The k entries most similar to `text`: [{"id", "score"}], best first; only positive scores"""
+        vector = self.vectorize(text)
+        with self._lock:
+            if self.count == 0 or not vector.any():
+                return []
+            scores = self.vectors[:self.count] @ vector
+            ids = np.array(self.ids[:self.count])
+        scores[ids < 0] = -1.0
+        if exclude is not None:
+            scores[ids == exclude] = -1.0
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [{"id": int(ids[row]), "score": round(float(scores[row]), 4)} for row in top if scores[row] > 0]
+
+    def rebuild(self, entries: Iterable[Tuple[int, str]], fingerprint: Optional[str] = None):
+        """Recompute every vector and document frequency from (id, text) pairs"""
+        entries = list(entries)
+        features = [term_hashes(text) for _, text in entries]
+        with self._lock:
+            self._invalidate()
+            self._allocate(max(len(entries), self.capacity))
+            self._ready = True
+            all_hashes = np.concatenate([hashes for hashes, _ in features]) if features else np.zeros(0, np.uint32)
+            self.df[:] = np.bincount(all_hashes % DF_SLOTS, minlength=DF_SLOTS)
+            self.documents = len(entries)
+            for start in range(0, len(entries), REBUILD_BATCH):
+                batch = features[start:start + REBUILD_BATCH]
+                lengths = np.fromiter((len(hashes) for hashes, _ in batch), dtype=np.int64, count=len(batch))
+                hashes = np.concatenate([hashes for hashes, _ in batch])
+                tf = np.concatenate([tf for _, tf in batch])
+                doc = np.repeat(np.arange(len(batch)), lengths)
+                signs = np.where(hashes & 0x80000000, -1.0, 1.0)
+                weights = self._weights(hashes, tf, self.documents) * signs
+                block = np.bincount(
+                    doc * self.dim + hashes % self.dim, weights=weights, minlength=len(batch) * self.dim
+                ).reshape(len(batch), self.dim)
+                norms = np.linalg.norm(block, axis=1, keepdims=True)
+                self.vectors[start:start + len(batch)] = np.divide(block, norms, out=np.zeros_like(block), where=norms > 0)
+            self.ids[:len(entries)] = [entry_id for entry_id, _ in entries]
+            self.count = len(entries)
+            self.rows = {entry_id: row for row, (entry_id, _) in enumerate(entries)}
+        self.save(fingerprint)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.rows),
+            "rows": self.count,
+            "capacity": len(self.ids) if self._ready else self.capacity,
+            "dim": self.dim,
+            "directory": self.directory,
+            "fingerprint": self.fingerprint
+        }
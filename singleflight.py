@@ -0,0 +1,54 @@
+# In-flight request coalescing - identical concurrent calls share one upstream call
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Run at most one call per key at a time; concurrent callers await the same result.
+
+    Each caller waits on the shared task through asyncio.shield, so a caller
+    that disconnects (is cancelled) never cancels the call for the others.
+    The shared call is only cancelled once every caller has gone away.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Dict[Hashable, int] = {}
+        self.counters = {"leaders": 0, "coalesced": 0, "abandoned": 0}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.create_task(fn())
+            self._calls[key] = task
+            self._waiters[key] = 0
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self.counters["leaders"] += 1
+        else:
+            self.counters["coalesced"] += 1
+
+        self._waiters[key] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and self._waiters.get(key) == 1:
+                self.counters["abandoned"] += 1
+                task.cancel()
+            raise
+        finally:
+            if self._calls.get(key) is task:
+                self._waiters[key] -= 1
+
+    def running(self, key: Hashable) -> bool:
+        """Whether a call for `key` is in flight (a do() now would join it)"""
+        return key in self._calls
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+            del self._waiters[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved; callers re-raise it themselves
+
+    def stats(self) -> dict:
+        return {**self.counters, "in_flight": len(self._calls)}
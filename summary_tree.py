@@ -0,0 +1,155 @@
+# Rolling summary tree - entry summaries roll up into day, week, month and year summaries
+import asyncio
+import hashlib
+from datetime import date, datetime, timedelta
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+LEVELS = ("day", "week", "month", "year")
+
+# Decorations the summarize task puts in front of the summary text
+SUMMARY_PREFIXES = ("📝 ", "📄 Summary: ")
+
+
+def period_key(level: str, day: date) -> str:
+    """Key of the period at `level` containing `day`: 2026-10-17, 2026-W42, 2026-10 or 2026"""
+    if level == "day":
+        return day.isoformat()
+    if level == "week":
+        year, week, _ = day.isocalendar()
+        return f"{year}-W{week:02d}"
+    if level == "month":
+        return f"{day.year}-{day.month:02d}"
+    return str(day.year)
+
+
+def period_range(level: str, key: str) -> Tuple[date, date]:
+    """[start, end) dates of a period key; ValueError if the key is malformed"""
+    if level == "day":
+        start = date.fromisoformat(key)
+        return start, start + timedelta(days=1)
+    if level == "week":
+        year, week = key.split("-W")
+        start = date.fromisocalendar(int(year), int(week), 1)
+        return start, start + timedelta(days=7)
+    if level == "month":
+        year, month = (int(part) for part in key.split("-"))
+        start = date(year, month, 1)
+        return start, date(year + month // 12, month % 12 + 1, 1)
+    if level == "year":
+        start = date(int(key), 1, 1)
+        return start, date(start.year + 1, 1, 1)
+    raise ValueError(f"Unknown summary level: {level}")
+
+
+def ancestors(day: date) -> List[Tuple[str, str]]:
+    """Every node an entry written on `day` rolls up into"""
+    return [(level, period_key(level, day)) for level in LEVELS]
+
+
+def summary_body(result: str) -> str:
+    for prefix in SUMMARY_PREFIXES:
+        if result.startswith(prefix):
+            return result[len(prefix):]
+    return result
+
+
+class SummaryTree:
+    """Day, week, month and year summaries built from the summaries below them.
+
+    A day node summarizes its entries' stored summaries; week and month
+    nodes summarize their days, and a year node its months. Writes to an
+    entry only mark its four ancestor nodes dirty (see JournalStore). A read
+    recomputes dirty nodes bottom-up; clean children are plain lookups, and
+    a node whose children's summaries hash the same as last time is not
+    re-summarized at all. A node with a single child reuses that child's
+    summary without a model call.
+
+    `summarize` takes text and returns a summarize task response
+    ({"result", "metadata": {"model", ...}}). Results from `fallback_model`
+    are served but not trusted as final: their nodes are reused for
+    `fallback_retry_seconds`, then recomputed on the next read so a model
+    answer can replace them (without rebuilding every period on every read
+    while no model is reachable).
+
+    Children are built concurrently, with at most `concurrency` summarize
+    calls in flight at once.
+    """
+
+    def __init__(
+        self, store, summarize: Callable[[str], Awaitable[dict]], fallback_model: str, concurrency: int = 4,
+        fallback_retry_seconds: float = 300.0
+    ):
+        self.store = store
+        self.summarize = summarize
+        self.fallback_model = fallback_model
+        self.fallback_retry_seconds = fallback_retry_seconds
+        self.concurrency = concurrency
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.counters = {"lookups": 0, "recomputed": 0, "unchanged": 0, "summarize_calls": 0}
+
+    async def node(self, level: str, key: str) -> Optional[dict]:
+        """Summary node for a period, recomputing it (and dirty descendants) if needed; None if it has no entries"""
+        start, end = period_range(level, key)
+        stored = await self._run(self.store.summary_node, level, key)
+        if stored is not None and not stored["dirty"] and self._settled(stored):
+            self.counters["lookups"] += 1
+            return stored
+        version = stored["version"] if stored is not None else 0
+
+        children = await self._children(level, start, end)
+        if not children:
+            await self._run(self.store.save_summary_node, level, key, version, None)
+            return None
+        source = "\n\n".join(f"{label}: {summary}" for label, summary, _ in children)
+        source_hash = hashlib.sha256(source.encode("utf-8")).hexdigest()
+        if stored is not None and stored["source_hash"] == source_hash and stored["model"] != self.fallback_model:
+            self.counters["unchanged"] += 1
+            node = {"summary": stored["summary"], "model": stored["model"]}
+        elif len(children) == 1:
+            self.counters["recomputed"] += 1
+            node = {"summary": children[0][1], "model": children[0][2]}
+        else:
+            self.counters["recomputed"] += 1
+            response = await self._summarize(source)
+            node = {"summary": summary_body(response["result"]), "model": response["metadata"]["model"]}
+        node.update(source_hash=source_hash, children=len(children))
+        return await self._run(self.store.save_summary_node, level, key, version, node)
+
+    def _settled(self, stored: dict) -> bool:
+        """Model-built nodes are final; fallback-built ones only until they are fallback_retry_seconds old"""
+        if stored["model"] != self.fallback_model:
+            return True
+        age = datetime.now() - datetime.fromisoformat(stored["updated_at"])
+        return age.total_seconds() < self.fallback_retry_seconds
+
+    async def _children(self, level: str, start: date, end: date) -> List[Tuple[str, str, str]]:
+        """(label, summary, model) for each child of a period, oldest first"""
+        if level == "day":
+            entries = await self._run(self.store.entries_between, start.isoformat(), end.isoformat())
+            return list(await asyncio.gather(*(self._entry_summary(entry) for entry in entries)))
+        days = await self._run(self.store.entry_days, start.isoformat(), end.isoformat())
+        if level == "year":
+            child_level, keys = "month", sorted({day[:7] for day in days})
+        else:
+            child_level, keys = "day", days
+        nodes = await asyncio.gather(*(self.node(child_level, key) for key in keys))
+        return [(key, node["summary"], node["model"]) for key, node in zip(keys, nodes) if node is not None]
+
+    async def _entry_summary(self, entry: dict) -> Tuple[str, str, str]:
+        label = entry["title"] or entry["created_at"][11:16]
+        response = entry["analysis"].get("summarize")
+        if response is None:
+            response = await self._summarize(entry["text"])
+            if response["metadata"]["model"] != self.fallback_model:
+                await self._run(self.store.save_analysis, entry["id"], "summarize", entry["text"], response)
+        return label, summary_body(response["result"]), response["metadata"]["model"]
+
+    async def _summarize(self, text: str) -> dict:
+        async with self._semaphore:
+            self.counters["summarize_calls"] += 1
+            return await self.summarize(text)
+
+    @staticmethod
+    async def _run(function, *args):
+        """Blocking store call in a worker thread"""
+        return await asyncio.to_thread(function, *args)
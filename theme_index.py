@@ -0,0 +1,199 @@
+# Theme taxonomy index - ranked life themes from journal text, with synonyms, stems and batch scoring
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# theme -> (synonyms and related terms, insight sentence). Multi-word terms match consecutive words.
+TAXONOMY: Dict[str, Tuple[List[str], str]] = {
+    "career": (
+        ["work", "job", "career", "office", "boss", "manager", "colleague", "coworker", "project", "deadline",
+         "meeting", "promotion", "interview", "client", "shift", "salary", "business", "team", "presentation"],
+        "Work is taking up real space in your thoughts; notice which parts of it energize you and which drain you"
+    ),
+    "relationships": (
+        ["friend", "partner", "boyfriend", "girlfriend", "husband", "wife", "relationship", "date", "dating",
+         "love", "breakup", "conversation", "argument", "fight", "together", "lonely", "social", "party"],
+        "The people around you shape how your day feels; consider which connections you want to invest in"
+    ),
+    "family": (
+        ["family", "mom", "mother", "dad", "father", "parent", "sister", "brother", "sibling", "son", "daughter",
+         "kid", "child", "children", "grandma", "grandpa", "baby", "home"],
+        "Family shows up as an important thread here; reflect on what you need from and can give to them"
+    ),
+    "health": (
+        ["health", "sick", "ill", "doctor", "pain", "headache", "exercise", "workout", "gym", "run", "walk",
+         "yoga", "diet", "eat", "food", "body", "energy", "medication", "therapy"],
+        "Your body and physical health are part of this story; small, consistent habits may matter most"
+    ),
+    "self-care": (
+        ["self care", "rest", "relax", "sleep", "nap", "bath", "break", "day off", "meditate", "meditation",
+         "boundary", "recharge", "tired", "exhausted", "burnout", "slow down", "quiet"],
+        "You seem to be weighing rest against demands; protecting time to recharge is worth planning for"
+    ),
+    "emotions": (
+        ["feel", "feeling", "emotion", "happy", "sad", "angry", "anxious", "anxiety", "stress", "worry",
+         "fear", "cry", "overwhelm", "frustrate", "upset", "calm", "mood", "nervous", "joy"],
+        "Your emotions are close to the surface in this entry; naming them clearly is already a step toward handling them"
+    ),
+    "growth": (
+        ["learn", "grow", "growth", "improve", "progress", "change", "better", "lesson", "realize", "skill",
+         "practice", "habit", "develop", "challenge myself", "comfort zone", "course", "study"],
+        "There is a clear thread of learning and growth; note what helped you move forward so you can repeat it"
+    ),
+    "goals": (
+        ["goal", "plan", "dream", "ambition", "target", "achieve", "accomplish", "finish", "complete", "resolution",
+         "priority", "future", "next step", "decide", "decision", "focus"],
+        "You are thinking about where you're headed; breaking the next goal into one concrete step could help"
+    ),
+    "challenges": (
+        ["problem", "struggle", "difficult", "hard", "challenge", "obstacle", "setback", "fail", "failure",
+         "mistake", "conflict", "pressure", "crisis", "stuck", "overwhelm"],
+        "You're facing real difficulties; separating what you can influence from what you can't may ease the load"
+    ),
+    "gratitude": (
+        ["grateful", "gratitude", "thankful", "thank", "appreciate", "blessed", "lucky", "fortunate"],
+        "Gratitude comes through in your words; holding onto these moments can buffer harder days"
+    ),
+    "creativity": (
+        ["write", "writing", "paint", "draw", "music", "song", "guitar", "piano", "art", "create", "creative",
+         "design", "photography", "craft", "idea", "poem", "story"],
+        "Creative work seems meaningful to you; making regular room for it could be a source of energy"
+    ),
+    "finances": (
+        ["money", "budget", "rent", "bill", "debt", "loan", "save", "saving", "spend", "expense", "pay", "paycheck",
+         "afford", "invest", "bank"],
+        "Money is on your mind; a clear picture of the numbers usually reduces the worry around them"
+    ),
+    "reflection": (
+        ["reflect", "reflection", "think", "thought", "wonder", "journal", "remember", "memory", "meaning",
+         "purpose", "myself", "understand", "insight", "question"],
+        "Your writing shows self-awareness and introspection; keep following the questions you keep returning to"
+    )
+}
+
+TOKEN_PATTERN = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+# Longest suffixes first; a stem keeps at least MIN_STEM characters
+SUFFIXES = ("ations", "ation", "ments", "ment", "ness", "ings", "ing", "ies", "ied", "ed", "er", "s")
+MIN_STEM = 3
+
+
+@lru_cache(maxsize=65536)
+def stem(word: str) -> str:
+    """Light suffix-stripping stemmer (work/works/worked/working -> work, family/families -> famili).
+
+    Only needs to map a word and its inflections to the same key; taxonomy
+    terms go through the same function, so stems need not be real words.
+    """
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM:
+            if suffix == "s" and word.endswith("ss"):
+                break
+            base = word[:-len(suffix)]
+            if suffix in ("ies", "ied"):
+                return base + "i"
+            # running -> run, planned -> plan
+            if suffix in ("ing", "ed", "er") and len(base) > MIN_STEM and base[-1] == base[-2] and base[-1] not in "lsz":
+                base = base[:-1]
+            word = base
+            break
+    if len(word) > MIN_STEM and word[-1] in "ey":
+        return word[:-1] + ("i" if word[-1] == "y" else "")
+    return word
+
+
+class ThemeIndex:
+    """Precompiled term -> theme index.
+
+    Taxonomy terms are stemmed once into a term vocabulary (single words and
+    two-word phrases). Extraction is one regex pass over the text plus dict
+    lookups of each stem and each adjacent stem pair; batch scoring turns
+    per-entry term counts into theme scores with one matrix product.
+    """
+
+    def __init__(self, taxonomy: Dict[str, Tuple[List[str], str]] = TAXONOMY):
+        self.themes = list(taxonomy)
+        self.insights = {theme: insight for theme, (_, insight) in taxonomy.items()}
+        self.term_ids: Dict[str, int] = {}
+        self.terms: List[str] = []
+        # First stems of multi-word terms; only these start a phrase lookup
+        self.phrase_heads = set()
+        assignments = []
+        for theme_id, (terms, _) in enumerate(taxonomy.values()):
+            for term in terms:
+                words = [stem(word) for word in term.lower().split()]
+                key = " ".join(words)
+                if len(words) > 1:
+                    self.phrase_heads.add(words[0])
+                if key not in self.term_ids:
+                    self.term_ids[key] = len(self.terms)
+                    self.terms.append(term)
+                assignments.append((self.term_ids[key], theme_id))
+
+        # term x theme membership; a term shared by several themes counts for each
+        self.membership = np.zeros((len(self.terms), len(self.themes)))
+        self.term_themes: List[set] = [set() for _ in self.terms]
+        for term_id, theme_id in assignments:
+            self.membership[term_id, theme_id] = 1.0
+            self.term_themes[term_id].add(theme_id)
+
+    def _term_ids(self, text: str) -> List[int]:
+        stems = [stem(token) for token in TOKEN_PATTERN.findall(text.lower())]
+        lookup = self.term_ids.get
+        ids = [term_id for term_id in map(lookup, stems) if term_id is not None]
+        heads = self.phrase_heads
+        for first, second in zip(stems, stems[1:]):
+            if first in heads:
+                term_id = lookup(f"{first} {second}")
+                if term_id is not None:
+                    ids.append(term_id)
+        return ids
+
+    def extract_batch(self, texts: List[str], top_k: int = 3) -> List[List[dict]]:
+        """Ranked themes for many texts: [{"theme", "score", "terms"}] per text, strongest first"""
+        if not texts:
+            return []
+        per_text = [self._term_ids(text) for text in texts]
+        lengths = np.fromiter(map(len, per_text), dtype=np.int64, count=len(texts))
+        flat = np.fromiter((term_id for ids in per_text for term_id in ids), dtype=np.int64, count=int(lengths.sum()))
+        doc = np.repeat(np.arange(len(texts)), lengths)
+
+        width = len(self.terms)
+        counts = np.bincount(doc * width + flat, minlength=len(texts) * width).reshape(len(texts), width)
+        scores = counts @ self.membership
+        # Stable ordering: ties keep taxonomy order
+        ranking = np.argsort(-scores, axis=1, kind="stable")[:, :top_k]
+
+        results = []
+        for i, order in enumerate(ranking):
+            # Evidence terms, most frequent first (ties keep first-seen order)
+            term_counts = Counter(per_text[i]).most_common()
+            matched = []
+            for theme_id in order:
+                if scores[i, theme_id] <= 0:
+                    break
+                matched.append({
+                    "theme": self.themes[theme_id],
+                    "score": int(scores[i, theme_id]),
+                    "terms": [self.terms[term_id] for term_id, _ in term_counts if theme_id in self.term_themes[term_id]][:5]
+                })
+            results.append(matched)
+        return results
+
+    def extract(self, text: str, top_k: int = 3) -> List[dict]:
+        return self.extract_batch([text], top_k)[0]
+
+    def insight_text(self, matches: List[dict]) -> str:
+        """Deterministic insight built from the entry's strongest themes"""
+        if not matches:
+            return ("Your writing shows self-awareness and introspection. "
+                    "Continue this reflective practice for deeper self-understanding.")
+        lead = matches[0]
+        parts = [f"Your entry centres on {lead['theme']} ({', '.join(lead['terms'][:3])})."]
+        parts.extend(f"{self.insights[match['theme']]}." for match in matches[:2])
+        if len(matches) > 2:
+            parts.append(f"It also touches on {matches[2]['theme']}.")
+        return " ".join(parts)
@@ -0,0 +1,55 @@
+# Token budget planning - local prompt token estimates and per-task output budgets
+import re
+from typing import Dict, Tuple
+
+# Words, digit groups and single symbols; roughly how BPE tokenizers split English text
+PIECE_PATTERN = re.compile(r"[^\W\d_]+|\d{1,3}|[^\w\s]|_")
+
+# task -> (minimum, extra tokens per input token, maximum) output tokens
+OUTPUT_BUDGETS: Dict[str, Tuple[int, float, int]] = {
+    "sentiment": (120, 0.5, 300),
+    "insights": (150, 0.6, 350),
+    "summarize": (60, 0.3, 200),
+    "analyze": (400, 1.0, 850)
+}
+
+# Headroom left in the context window for estimate error and chat formatting tokens
+SAFETY_TOKENS = 256
+
+
+def count_tokens(text: str) -> int:
+    """Estimate the token count of text without a tokenizer.
+
+    A word costs one token per started six characters and every digit group
+    or symbol costs one, so common English words count as one token and
+    long or rare words as more. It errs on the high side, which is the safe
+    direction for fitting a context window.
+    """
+    return sum((len(piece) + 5) // 6 for piece in PIECE_PATTERN.findall(text))
+
+
+def output_budget(task_type: str, input_tokens: int) -> int:
+    """Reply tokens to request for a task, growing with the entry up to the task maximum"""
+    minimum, per_input, maximum = OUTPUT_BUDGETS[task_type]
+    return min(maximum, int(minimum + per_input * input_tokens))
+
+
+def plan_request(task_type: str, input_tokens: int, prompt_tokens: int, context_tokens: int) -> dict:
+    """Output budget for one call, trimmed to the room left in the context window.
+
+    `fits` is False when not even the task's minimum reply would fit next to
+    the prompt; such a call would only come back truncated or rejected.
+    """
+    available = context_tokens - prompt_tokens - SAFETY_TOKENS
+    max_output = min(output_budget(task_type, input_tokens), available)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "max_output_tokens": max(max_output, 0),
+        "context_tokens": context_tokens,
+        "fits": max_output >= OUTPUT_BUDGETS[task_type][0]
+    }
+
+
+def input_capacity(task_type: str, prompt_overhead: int, context_tokens: int) -> int:
+    """Largest entry (in tokens) that still leaves room for the task's full output budget"""
+    return context_tokens - prompt_overhead - OUTPUT_BUDGETS[task_type][2] - SAFETY_TOKENS